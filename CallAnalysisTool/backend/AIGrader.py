@@ -8,28 +8,40 @@
 # Usage: python AIGrader.py <path\transcript.json>
 
 import sys
-import pandas as pd
-import os
+import json
+import re
 from JSONTranscriptionParser import json_to_text
-from detect_naturecode import run_detection
-import ollama
+from question_catalog import get_catalog
+from detect_naturecode import detect_nature_codes, DetectionResult
+from llm_client import get_default_client
 
-# Function for gathering nature codes and cleaning up file structure afterwards
+# Bump whenever build_grading_prompt changes, cached grades from older prompts are then ignored
+PROMPT_VERSION = "1"
 
-# Input: path to a transcript, transcript text
-# Output: nature codes
+# Grade codes that don't affect the numerical grade (N/A, Recorded Correctly)
+EXCLUDED_CODES = {"5", "RC"}
+
+# Grade codes that count as a missed question (Not Asked, Asked Incorrectly)
+MISSED_CODES = {"2", "3"}
+
+# Grade codes calculate_final_grade knows; anything else is treated as Not Asked
+KNOWN_CODES = {"1", "2", "3", "4", "5", "6", "RC"}
+
+# Function for gathering nature codes without writing anything to disk
+
+# Input: path to a transcript (unused, kept for compatibility), transcript text
+# Output: DetectionResult
 def detect_nature_codes_in_memory(transcript_path, transcript_text):
-    temp_path = run_detection(transcript_path, transcript_text)
-    with open(temp_path, 'r') as f:
-        nature_codes = f.read()
-    os.remove(temp_path)
-    return nature_codes
+    return detect_nature_codes(transcript_text)
 
 # Function for extracting nature codes and sorting by confidence
 
-# Input: nature codes text
+# Input: DetectionResult (or nature codes log text)
 # Output: array of nature code from most to least confident
 def extract_all_nature_codes(text):
+    if isinstance(text, DetectionResult):
+        return text.as_tuples()
+
     nature_codes = []
     lines = text.strip().split('\n')
     
@@ -56,22 +68,9 @@ def extract_all_nature_codes(text):
 # Output: dict of questions from given nature code
 def load_nature_code_questions(nature_code):
     try:
-        df = pd.read_csv("data/EMSQA.csv")
-        nature_questions = df[df['NatureCode'] == nature_code]
-        
-        questions_dict = {}
-        for _, row in nature_questions.iterrows():
-            qid = str(row['Question_ID'])
-            question_text = row['Question_Text']
-            if pd.notna(question_text):
-                # Add prefix based on nature code for easy separation in output
-                if nature_code == "Case Entry":
-                    prefixed_qid = f"CE_{qid}"
-                else:
-                    prefixed_qid = f"NC_{qid}"
-                questions_dict[prefixed_qid] = question_text
-            
-        return questions_dict
+        # Questions come from the shared catalog, EMSQA.csv is only parsed when it changes
+        # (IDs are prefixed CE_/NC_ for easy separation in output)
+        return get_catalog().prefixed_questions(nature_code)
     
     # Error handling
     except FileNotFoundError:
@@ -108,7 +107,7 @@ def calculate_final_grade(grades, questions_dict):
             continue
             
         # Skip questions that don't affect the numerical grade
-        if grade == "5" or grade == "RC":
+        if grade in EXCLUDED_CODES:
             continue
             
         graded_questions += 1
@@ -140,11 +139,18 @@ def calculate_final_grade(grades, questions_dict):
 
     return final_percentage
 
-# Function for grading a transcript using ollama's AI
+# Function for checking whether a grade counts as a missed question
 
-# Input: Plain text transcription for grading and list of questions to be asked
-# Output AI's grade for the given transcription based on given questions
-def ai_grade_transcript(transcript_text, questions_dict, nature_code):
+# Input: grade code
+# Output: True for Not Asked / Asked Incorrectly (and unknown codes, which are graded as Not Asked)
+def is_missed(grade):
+    return grade in MISSED_CODES or grade not in KNOWN_CODES
+
+# Function for building the grading prompt
+
+# Input: Plain text transcription for grading, list of questions to be asked, nature code
+# Output: prompt text for the AI
+def build_grading_prompt(transcript_text, questions_dict, nature_code):
     # Prompt for the AI
     # NOTE: asking for a JSON submission is more reliable than plain text because the model is familiar with the format
     # Therefore, we are more likely to receive coherent grades in JSON format rather than a paragraph
@@ -184,21 +190,135 @@ def ai_grade_transcript(transcript_text, questions_dict, nature_code):
       obvious is an appropriate grade, grading is meant to be strict so obvious should only be used when the question has been BEYOND A DOUBT obviously answered)
     """
     
+    return prompt
+
+# Function for splitting questions into groups that are graded with separate prompts
+
+# Input: dict of (prefixed) questions, grouping mode and maximum group size for "chunk"
+#        "single" - one group with every question (default, one prompt per transcript)
+#        "nature" - Case Entry (CE_) questions and nature code (NC_) questions separately
+#        "chunk"  - like "nature", with each group cut into chunks of at most chunk_size questions
+# Output: list of question dicts (question order is kept, empty groups are dropped)
+def split_question_groups(questions_dict, mode="single", chunk_size=10):
+    if mode == "single":
+        return [dict(questions_dict)] if questions_dict else []
+    if mode not in ("nature", "chunk"):
+        raise ValueError(f"Unknown question grouping: {mode}")
+
+    case_entry = {qid: q for qid, q in questions_dict.items() if qid.startswith("CE_")}
+    nature_code = {qid: q for qid, q in questions_dict.items() if not qid.startswith("CE_")}
+    groups = [group for group in (case_entry, nature_code) if group]
+
+    if mode == "chunk":
+        size = max(1, int(chunk_size))
+        chunks = []
+        for group in groups:
+            items = list(group.items())
+            chunks.extend(dict(items[i:i + size]) for i in range(0, len(items), size))
+        groups = chunks
+
+    return groups
+
+# Function for pulling the grades out of the AI's response
+
+# Input: raw response text from the AI
+# Output: dict of question ID -> grade code (empty if no JSON was found)
+def parse_grades(response_text):
+    # Find JSON in the response
+    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group())
+
+    # If unable to access grades in json, send error message
+    print("Could not parse AI response as JSON")
+    return {}
+
+# Incremental parser for a streamed grades JSON object
+
+# Feed it chunks of the AI's response as they arrive; it returns each
+# "question_id": "code" pair as soon as the pair is complete
+class GradeStreamParser:
+    # One complete pair, followed by the ',' or '}' that ends it
+    PAIR_RE = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*(?:"((?:[^"\\]|\\.)*)"|([^\s,}"]+))\s*(?=[,}])')
+
+    def __init__(self):
+        self.text = ""         # everything received so far
+        self._pos = None       # parse position inside the object (None until '{' is seen)
+        self.done = False
+
+    # Input: next chunk of response text
+    # Output: list of (question_id, code) pairs completed by this chunk
+    def feed(self, chunk):
+        self.text += chunk
+        pairs = []
+        if self.done:
+            return pairs
+
+        if self._pos is None:
+            start = self.text.find("{")
+            if start == -1:
+                return pairs
+            self._pos = start + 1
+
+        while True:
+            match = self.PAIR_RE.match(self.text, self._pos)
+            if not match:
+                break
+            value = match.group(2) if match.group(2) is not None else match.group(3)
+            pairs.append((json.loads(f'"{match.group(1)}"'), json.loads(f'"{value}"')))
+            self._pos = match.end()
+
+            # Skip the separator; '}' ends the object
+            separator = self.text[self._pos]
+            self._pos += 1
+            if separator == "}":
+                self.done = True
+                break
+        return pairs
+
+# Function for streaming grades from ollama's AI as they are generated
+
+# Input: Plain text transcription, list of questions to be asked, nature code,
+#        optional LLMClient and optional dict that receives the client's timings
+# Output: generator of (question_id, code) pairs in the order the AI produces them
+def stream_grade_transcript(transcript_text, questions_dict, nature_code, client=None, stats=None):
+    prompt = build_grading_prompt(transcript_text, questions_dict, nature_code)
+    client = client or get_default_client()
+
+    parser = GradeStreamParser()
+    seen = set()
+    for chunk in client.stream_generate(prompt, timings=stats):
+        for qid, code in parser.feed(chunk):
+            seen.add(qid)
+            yield qid, code
+
+    # Anything the incremental parser couldn't follow is recovered from the full response
     try:
-        response = ollama.generate(model='llama3.1:8b', prompt=prompt)
+        leftovers = parse_grades(parser.text)
+    except ValueError:
+        leftovers = {}
+    for qid, code in leftovers.items():
+        if qid not in seen:
+            yield qid, str(code)
+
+# Function for grading a transcript using ollama's AI
+
+# Input: Plain text transcription for grading, list of questions to be asked, nature code,
+#        optional LLMClient (defaults to the shared client) and optional dict that receives
+#        the client's timings (queue_wait_s, generation_s)
+# Output AI's grade for the given transcription based on given questions
+def ai_grade_transcript(transcript_text, questions_dict, nature_code, client=None, stats=None):
+    prompt = build_grading_prompt(transcript_text, questions_dict, nature_code)
+    client = client or get_default_client()
+
+    try:
+        response = client.generate(prompt)
+        if stats is not None:
+            stats["queue_wait_s"] = response["queue_wait_s"]
+            stats["generation_s"] = response["generation_s"]
+
         # Extract JSON from response
-        import json
-        import re
-        
-        # Find JSON in the response
-        json_match = re.search(r'\{.*\}', response['response'], re.DOTALL)
-        if json_match:
-            grades = json.loads(json_match.group())
-            return grades
-        else:
-            # If unable to access grades in json, send error message
-            print("Could not parse AI response as JSON")
-            return {}
+        return parse_grades(response['response'])
             
     except Exception as e:
         print(f"AI grading failed: {e}")
@@ -228,13 +348,12 @@ def main():
         sys.exit(1)
 
     # Get nature codes
-    nature_codes_text = detect_nature_codes_in_memory(sys.argv[1], transcript)
-    if not nature_codes_text:
+    detection = detect_nature_codes(transcript)
+    nature_codes = extract_all_nature_codes(detection)
+    if not nature_codes:
         print(f"Error: Could not determine nature codes")
         sys.exit(1)
 
-    nature_codes = extract_all_nature_codes(nature_codes_text)
-
     # Grade based on nature code with highest confidence
     primary_nature_code = nature_codes[0][0]
 
@@ -1,15 +1,78 @@
 # Jaiden Sizemore
 # CS4273 Group G
 # Last Updated 10/16/2025: Adjusted timestamp format
+# Formatting works on in-memory data too (transcript_to_text / segments_to_text)
 
 # Usage: python JSONTranscriptionParser.py <filepath.json>
 
 import json
+import re
 import sys
 import os
 
-# Function for parsing Json transcription into the following format:
-# [Timestamp][Speaker]: Text
+# One line written by format_segment
+SEGMENT_LINE_RE = re.compile(r"^\[(\d+):(\d+(?:\.\d+)?)–(\d+):(\d+(?:\.\d+)?)\] (.*?): (.*)$")
+
+# Function for formatting a single segment into the following format:
+# [Starting timestamp–Ending timestamp] Speaker: Text
+
+# Input: segment dict with start, end, speaker and text
+# Output: one formatted line (with trailing newline)
+def format_segment(segment):
+    # Extract the required fields
+    start_time = segment.get('start', 0.0)              # Get Starting Timestamp component, "0.0" if missing
+    end_time = segment.get('end', 0.0)                  # Get Ending Timestamp component, "0.0" if missing
+    speaker = segment.get('speaker', 'UNKNOWN')         # Get Speaker component, "UNKNOWN" if missing
+    transcript_text = segment.get('text', '').strip()   # Get Text component, empty string if missing
+
+    # Convert seconds to MM:SS format
+    start_minutes = int(start_time // 60)
+    start_seconds = start_time % 60
+    end_minutes = int(end_time // 60)
+    end_seconds = end_time % 60
+
+    start_timestamp = f"{start_minutes:02d}:{start_seconds:04.1f}"
+    end_timestamp = f"{end_minutes:02d}:{end_seconds:04.1f}"
+
+    return f"[{start_timestamp}–{end_timestamp}] {speaker}: {transcript_text}\n"
+
+# Function for reading a formatted line back into its parts
+
+# Input: one line in the format above
+# Output: dict with start, end (seconds), speaker and text, None if the line isn't a segment
+def parse_segment_line(line):
+    match = SEGMENT_LINE_RE.match(line.strip())
+    if not match:
+        return None
+    start_minutes, start_seconds, end_minutes, end_seconds, speaker, text = match.groups()
+    return {
+        'start': round(int(start_minutes) * 60 + float(start_seconds), 1),
+        'end': round(int(end_minutes) * 60 + float(end_seconds), 1),
+        'speaker': speaker,
+        'text': text,
+    }
+
+# Function for formatting segments in a single pass
+
+# Input: any iterable of segment dicts (list, generator, stream parser...)
+# Output: Plain text with one formatted line per segment
+def segments_to_text(segments):
+    return "".join(format_segment(segment) for segment in segments)
+
+# Function for parsing already loaded Json transcription data
+
+# Input: transcript dict with a 'segments' array
+# Output: Plain text in the format above, empty string if the structure is unexpected
+def transcript_to_text(data):
+    # Check if the JSON has the expected structure
+    if isinstance(data, dict) and isinstance(data.get('segments'), list):
+        return segments_to_text(data['segments'])
+
+    # Incorrect structure
+    print("Error: JSON file does not contain 'segments' array or has unexpected structure.")
+    return ""
+
+# Function for parsing Json transcription file into the format above
 
 # Input: Path to json file
 # Output: Plain text in above format
@@ -33,38 +96,8 @@ def json_to_text(file_path):
         print(f"Error reading file: {e}")
         return ""
     
-    # Initialize string variable for storing output
-    text_output = ""
-    
-    # Check if the JSON has the expected structure
-    if 'segments' in data and isinstance(data['segments'], list):
-        # For each message entry...
-        for segment in data['segments']:
-            # Extract the required fields
-            start_time = segment.get('start', 0.0)              # Get Starting Timestamp component, "0.0" if missing
-            end_time = segment.get('end', 0.0)                  # Get Ending Timestamp component, "0.0" if missing
-            speaker = segment.get('speaker', 'UNKNOWN')         # Get Speaker component, "UNKNOWN" if missing
-            transcript_text = segment.get('text', '').strip()   # Get Text component, empty string if missing
-            
-            # Format the line: "[Starting timestamp - Ending timestamp][Speaker]: Text"
-            # Convert seconds to MM:SS format
-            start_minutes = int(start_time // 60)
-            start_seconds = start_time % 60
-            end_minutes = int(end_time // 60)
-            end_seconds = end_time % 60
-
-            start_timestamp = f"{start_minutes:02d}:{start_seconds:04.1f}"
-            end_timestamp = f"{end_minutes:02d}:{end_seconds:04.1f}"
-            
-            # Add the entry to the text output and move to the next line
-            text_output += f"[{start_timestamp}–{end_timestamp}] {speaker}: {transcript_text}\n"
-    else:
-        # Incorrect structure
-        print("Error: JSON file does not contain 'segments' array or has unexpected structure.")
-        return ""
-    
     # Return fully parsed transcript as a string
-    return text_output
+    return transcript_to_text(data)
 
 # Main method
 def main():
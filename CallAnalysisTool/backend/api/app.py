@@ -16,9 +16,18 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from api.routes.grading import grading_bp
 from api.routes.health import health_bp
+from api.routes.jobs import jobs_bp
+from api.routes.results import results_bp
+from api.routes.analytics import analytics_bp
 
-def create_app():
-    """Application factory pattern"""
+def create_app(warm_up=None):
+    """
+    Application factory pattern
+    
+    Heavy resources (embedding model, keyword index, question catalog) are loaded
+    lazily on the first grading request. Pass warm_up=True (or set EMS_WARMUP=1)
+    to load them here instead, before the app starts serving.
+    """
     app = Flask(__name__)
     
     # CORS configuration - allow frontend to connect
@@ -40,6 +49,15 @@ def create_app():
     # Register blueprints
     app.register_blueprint(health_bp, url_prefix='/api')
     app.register_blueprint(grading_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(results_bp, url_prefix='/api')
+    app.register_blueprint(analytics_bp, url_prefix='/api')
+    
+    if warm_up is None:
+        warm_up = os.environ.get('EMS_WARMUP', '0') == '1'
+    if warm_up:
+        from api.services.ai_grader import warm_up_models
+        warm_up_models()
     
     return app
 
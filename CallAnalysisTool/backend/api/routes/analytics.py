@@ -0,0 +1,98 @@
+"""
+QA analytics endpoints
+Served from rollup tables kept up to date as results are saved (no scans of stored results)
+"""
+
+from flask import Blueprint, jsonify, request
+from api.services.results_store import get_results_store
+
+analytics_bp = Blueprint('analytics', __name__)
+
+
+def store_or_error():
+    """Shared results store, or an error response when storing is disabled"""
+    store = get_results_store()
+    if store is None:
+        return None, (jsonify({'error': 'Results store is disabled'}), 503)
+    return store, None
+
+
+@analytics_bp.route('/analytics/nature-codes', methods=['GET'])
+def nature_code_stats():
+    """
+    Per nature code: number of graded calls, average grade percentage and
+    question miss rate (codes 2/3 out of graded questions, 5/RC excluded)
+    """
+    store, error = store_or_error()
+    if error:
+        return error
+    return jsonify({'nature_codes': store.nature_code_stats()}), 200
+
+
+@analytics_bp.route('/analytics/questions', methods=['GET'])
+def question_stats():
+    """
+    Per question miss rates, most missed first
+
+    Optional query params:
+        ?nature_code=Falls  - Only this nature code's questions ("Case Entry" for CE_ questions)
+        ?limit=50           - Maximum number of questions (max 500)
+        ?min_graded=1       - Ignore questions graded fewer times than this
+    """
+    store, error = store_or_error()
+    if error:
+        return error
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        min_graded = max(int(request.args.get('min_graded', 1)), 1)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid query parameter', 'message': str(e)}), 400
+
+    questions = store.question_stats(
+        nature_code=request.args.get('nature_code'),
+        limit=limit,
+        min_graded=min_graded
+    )
+    return jsonify({'questions': questions}), 200
+
+
+@analytics_bp.route('/analytics/case-entry/most-missed', methods=['GET'])
+def most_missed_case_entry():
+    """
+    Most missed Case Entry questions
+
+    Optional query params:
+        ?limit=10       - Number of questions (max 500)
+        ?min_graded=1   - Ignore questions graded fewer times than this
+    """
+    store, error = store_or_error()
+    if error:
+        return error
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 500)
+        min_graded = max(int(request.args.get('min_graded', 1)), 1)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid query parameter', 'message': str(e)}), 400
+
+    questions = store.question_stats(nature_code='Case Entry', limit=limit, min_graded=min_graded)
+    return jsonify({'questions': questions}), 200
+
+
+@analytics_bp.route('/analytics/grades-over-time', methods=['GET'])
+def grades_over_time():
+    """
+    Average grade percentage per day (UTC)
+
+    Optional query params:
+        ?nature_code=Falls               - Only calls with this detected nature code
+        ?since=2025-10-01&until=2025-10-31 - Day range (inclusive)
+    """
+    store, error = store_or_error()
+    if error:
+        return error
+    trend = store.grade_trend(
+        nature_code=request.args.get('nature_code'),
+        since=request.args.get('since'),
+        until=request.args.get('until')
+    )
+    return jsonify({'days': trend}), 200
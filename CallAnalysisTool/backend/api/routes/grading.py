@@ -2,13 +2,20 @@
 Grading endpoints for transcript analysis
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for
 from datetime import datetime
 from werkzeug.utils import secure_filename
+import json
 import os
-import tempfile
+import zipfile
+import zlib
 from api.services.ai_grader import AIGraderService
+from api.services.job_queue import get_job_queue, is_local_callback_url, QueueFullError
+from api.services.results_store import get_results_store
 from api.services.question_loader import QuestionLoader
+from api.services.transcript_upload import (
+    InvalidUploadError, TranscriptStreamParser, UploadTooLargeError, open_transcript_upload, upload_limits
+)
 
 grading_bp = Blueprint('grading', __name__)
 
@@ -22,6 +29,195 @@ def allowed_file(filename):
 # Initialize loaders and graders
 question_loader = QuestionLoader()  # Loads questions from EMSQA.csv
 
+
+def build_grading_response(ai_grader, result, transcript_data, filename=None):
+    """
+    Build the API response for a graded transcript
+    
+    Args:
+        ai_grader: AIGraderService that produced the result
+        result: GradingResult from AIGraderService.grade()
+        transcript_data: The transcript that was graded
+        filename: Uploaded file name (only for /upload)
+    
+    Returns:
+        Response dict (same format for /grade, /upload and jobs)
+    """
+    grades = result.grades
+    primary_nature_code = result.nature_code
+    
+    # Calculate percentage score
+    percentage = ai_grader.calculate_percentage(grades, result.questions)
+    
+    # Count questions by type
+    total_questions = len(grades)
+    case_entry_count = sum(1 for q_id in grades.keys() if q_id.startswith('CE_'))
+    nature_code_count = sum(1 for q_id in grades.keys() if q_id.startswith('NC_'))
+    
+    # Count correct answers (codes "1" and "6")
+    questions_asked_correctly = sum(
+        1 for g in grades.values() if g.get('code') in ['1', '6']
+    )
+    questions_missed = total_questions - questions_asked_correctly
+    
+    # Uploads are formatted while they are parsed and only carry the segment count
+    segment_count = transcript_data.get('segment_count', len(transcript_data.get('segments', [])))
+    
+    # Build response
+    response = {}
+    if filename is not None:
+        response['filename'] = filename
+    response.update({
+        'grader_type': 'ai',
+        'grade_percentage': percentage,
+        'detected_nature_code': primary_nature_code,
+        'total_questions': total_questions,
+        'case_entry_questions': case_entry_count,
+        'nature_code_questions': nature_code_count,
+        'questions_asked_correctly': questions_asked_correctly,
+        'questions_missed': questions_missed,
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'grades': grades,
+        'metadata': {
+            'language': transcript_data.get('language', 'unknown'),
+            'segment_count': segment_count,
+            'grader_version': '2.0.0',
+            'model': ai_grader.llm_client.model,
+            'questions_source': f'EMSQA.csv (Case Entry + {primary_nature_code})',
+            'nature_code_detection': 'keyword + embedding model',
+            **result.metadata
+        }
+    })
+    
+    # Multi-code mode: one entry per graded nature code (Case Entry grades are shared)
+    if result.breakdown:
+        response['nature_codes'] = result.breakdown
+        response['metadata']['questions_source'] = 'EMSQA.csv (Case Entry + {})'.format(
+            ', '.join(entry['nature_code'] for entry in result.breakdown)
+        )
+    return response
+
+
+def store_result(response):
+    """
+    Persist a grading response so it can be re-opened via GET /api/results/<id>
+    Sets response['result_id']; a failing store never fails the grading itself
+    
+    Returns:
+        The response
+    """
+    store = get_results_store()
+    if store is not None:
+        try:
+            store.save(response)
+        except Exception as e:
+            print(f"Could not store grading result: {e}")
+    return response
+
+
+def run_grading(transcript_data, show_evidence=False, filename=None, error_label='Grading failed',
+                transcript_text=None):
+    """
+    Grade a transcript and build the response, mapping failures to error responses
+    
+    Shared by the synchronous endpoints and the job queue workers; transcript_text is
+    passed when the transcript was already formatted (uploads)
+    
+    Returns:
+        Tuple of (response_body, http_status)
+    """
+    try:
+        # Initialize AI grader (questions now loaded dynamically based on nature codes)
+        ai_grader = AIGraderService()
+        
+        # Grade the transcript using AI with nature code detection
+        result = ai_grader.grade(transcript_data, show_evidence=show_evidence, transcript_text=transcript_text)
+        
+        return store_result(build_grading_response(ai_grader, result, transcript_data, filename)), 200
+    
+    except Exception as e:
+        return grading_error_response(e, error_label)
+
+
+def grading_error_response(error, error_label='Grading failed'):
+    """
+    Map a grading exception to an error response body and HTTP status
+    
+    Returns:
+        Tuple of (response_body, http_status)
+    """
+    if isinstance(error, ConnectionError):
+        return {
+            'error': 'Ollama connection failed',
+            'message': 'Please ensure Ollama is installed and running (ollama serve)',
+            'details': str(error)
+        }, 503
+    
+    if isinstance(error, ValueError):
+        return {
+            'error': 'Invalid transcript data',
+            'message': str(error)
+        }, 400
+    
+    if isinstance(error, RuntimeError):
+        return {
+            'error': 'AI grading failed',
+            'message': str(error),
+            'suggestion': 'Check if llama3.1:8b model is downloaded (ollama pull llama3.1:8b)'
+        }, 500
+    
+    return {
+        'error': f'{error_label}: {str(error)}'
+    }, 500
+
+
+def wants_evidence():
+    """Whether the request asked for evidence segments (?show_evidence=true)"""
+    return request.args.get('show_evidence', 'false').lower() == 'true'
+
+
+def wants_async():
+    """Check if the client asked for job-submission mode (?async=true)"""
+    return request.args.get('async', 'false').lower() == 'true'
+
+
+def submit_grading_job(transcript_data, show_evidence=False, filename=None, error_label='Grading failed',
+                       transcript_text=None):
+    """
+    Queue a transcript for grading and return 202 with the job ID right away
+    
+    Optional query params:
+        ?callback_url=http://localhost:<port>/...  - local webhook POSTed the finished job
+    
+    Returns:
+        Flask response tuple
+    """
+    callback_url = request.args.get('callback_url')
+    if callback_url and not is_local_callback_url(callback_url):
+        return jsonify({
+            'error': 'Invalid callback_url',
+            'message': 'Callbacks must be http(s) URLs on localhost'
+        }), 400
+    
+    try:
+        job = get_job_queue().submit(
+            lambda: run_grading(transcript_data, show_evidence, filename, error_label, transcript_text),
+            callback_url=callback_url
+        )
+    except QueueFullError as e:
+        return jsonify({
+            'error': 'Grading queue is full',
+            'message': str(e)
+        }), 503, {'Retry-After': '30'}
+    
+    status_url = url_for('jobs.get_job', job_id=job['job_id'])
+    return jsonify({
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': status_url
+    }), 202, {'Location': status_url}
+
+
 @grading_bp.route('/grade', methods=['POST'])
 def grade_transcript():
     """
@@ -43,10 +239,12 @@ def grade_transcript():
         }
     
     Optional query params:
-        ?show_evidence=true  - Include evidence in response (not used by AI)
+        ?show_evidence=true  - Attach the best-matching transcript segments (with timestamps) to every grade
+        ?async=true          - Return a job ID right away, poll GET /api/jobs/<id>
+        ?callback_url=...    - With async, local URL that receives the finished job
     
     Returns:
-        JSON response with AI grading results
+        JSON response with AI grading results (or 202 with a job ID)
     """
     try:
         # Get JSON data from request
@@ -63,76 +261,14 @@ def grade_transcript():
                 'error': 'Missing required field: segments'
             }), 400
         
-        # Check if evidence should be included (not used by AI, but kept for API compatibility)
-        show_evidence = request.args.get('show_evidence', 'false').lower() == 'true'
-        
-        # Initialize AI grader (questions now loaded dynamically based on nature codes)
-        ai_grader = AIGraderService()
-        
-        # Grade the transcript using AI with nature code detection
-        # Returns: (grades, primary_nature_code, all_questions)
-        grades, primary_nature_code, questions = ai_grader.grade_transcript(
-            transcript_data, 
-            show_evidence=show_evidence
-        )
-        
-        # Calculate percentage score
-        percentage = ai_grader.calculate_percentage(grades, questions)
+        # Check if evidence should be included
+        show_evidence = wants_evidence()
         
-        # Count questions by type
-        total_questions = len(grades)
-        case_entry_count = sum(1 for q_id in grades.keys() if q_id.startswith('CE_'))
-        nature_code_count = sum(1 for q_id in grades.keys() if q_id.startswith('NC_'))
+        if wants_async():
+            return submit_grading_job(transcript_data, show_evidence=show_evidence)
         
-        # Count correct answers (codes "1" and "6")
-        questions_asked_correctly = sum(
-            1 for g in grades.values() if g.get('code') in ['1', '6']
-        )
-        questions_missed = total_questions - questions_asked_correctly
-        
-        # Build response
-        response = {
-            'grader_type': 'ai',
-            'grade_percentage': percentage,
-            'detected_nature_code': primary_nature_code,
-            'total_questions': total_questions,
-            'case_entry_questions': case_entry_count,
-            'nature_code_questions': nature_code_count,
-            'questions_asked_correctly': questions_asked_correctly,
-            'questions_missed': questions_missed,
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'grades': grades,
-            'metadata': {
-                'language': transcript_data.get('language', 'unknown'),
-                'segment_count': len(transcript_data.get('segments', [])),
-                'grader_version': '2.0.0',
-                'model': 'llama3.1:8b',
-                'questions_source': f'EMSQA.csv (Case Entry + {primary_nature_code})',
-                'nature_code_detection': 'keyword + embedding model'
-            }
-        }
-        
-        return jsonify(response), 200
-    
-    except ConnectionError as e:
-        return jsonify({
-            'error': 'Ollama connection failed',
-            'message': 'Please ensure Ollama is installed and running (ollama serve)',
-            'details': str(e)
-        }), 503
-    
-    except ValueError as e:
-        return jsonify({
-            'error': 'Invalid transcript data',
-            'message': str(e)
-        }), 400
-    
-    except RuntimeError as e:
-        return jsonify({
-            'error': 'AI grading failed',
-            'message': str(e),
-            'suggestion': 'Check if llama3.1:8b model is downloaded (ollama pull llama3.1:8b)'
-        }), 500
+        body, status = run_grading(transcript_data, show_evidence=show_evidence)
+        return jsonify(body), status
     
     except Exception as e:
         return jsonify({
@@ -156,22 +292,30 @@ def upload_and_grade():
     
     For Camden's frontend: Upload .json transcript file, get grading results
     
+    The file is parsed while it is received (incremental JSON parser, no temp file);
+    only the fields the grader uses are kept from each segment.
+    
     Request: multipart/form-data with 'file' field
+             (or the .json file as the raw body, named with ?filename=...)
+    Optional query params: ?show_evidence=true, ?async=true and ?callback_url=... (same as /api/grade)
     Response: Same format as /api/grade
+              413 if the upload is over EMS_UPLOAD_MAX_BYTES (default 50 MB) or has more
+              than EMS_UPLOAD_MAX_SEGMENTS segments (default 20000)
     """
     try:
+        max_bytes, max_segments = upload_limits()
+        file_name, stream = open_transcript_upload(request, max_bytes)
+        
         # Check if file is present
-        if 'file' not in request.files:
+        if file_name is None:
             return jsonify({'error': 'No file provided'}), 400
         
-        file = request.files['file']
-        
-        # Check if filename is empty
-        if file.filename == '':
+        # Check if filename is empty (raw JSON bodies don't need one)
+        if file_name == '' and request.mimetype == 'multipart/form-data':
             return jsonify({'error': 'No file selected'}), 400
         
         # Validate file extension
-        if not allowed_file(file.filename):
+        if file_name and not allowed_file(file_name):
             return jsonify({
                 'error': 'Invalid file type',
                 'message': 'Only .json files are supported',
@@ -179,105 +323,273 @@ def upload_and_grade():
             }), 400
         
         # Create secure filename
-        filename = secure_filename(file.filename)
+        filename = secure_filename(file_name) if file_name else None
         
-        # Save to temporary directory
-        with tempfile.NamedTemporaryFile(mode='wb', suffix='.json', delete=False) as tmp_file:
-            file.save(tmp_file.name)
-            temp_path = tmp_file.name
+        # Parse the JSON as it streams in, each segment goes straight into the formatter
+        parser = TranscriptStreamParser(stream, max_segments)
+        transcript_text = parser.to_text()
         
-        try:
-            # Read the JSON file
-            import json
-            with open(temp_path, 'r') as f:
-                transcript_data = json.load(f)
-            
-            # Validate JSON structure
-            if 'segments' not in transcript_data:
-                return jsonify({'error': 'Invalid transcript format: missing "segments" field'}), 400
-            
-            # Initialize AI grader
-            ai_grader = AIGraderService()
-            
-            # Grade the transcript using AI with nature code detection
-            grades, primary_nature_code, questions = ai_grader.grade_transcript(
-                transcript_data, 
-                show_evidence=False
-            )
-            
-            # Calculate percentage score
-            percentage = ai_grader.calculate_percentage(grades, questions)
-            
-            # Count questions by type
-            total_questions = len(grades)
-            case_entry_count = sum(1 for q_id in grades.keys() if q_id.startswith('CE_'))
-            nature_code_count = sum(1 for q_id in grades.keys() if q_id.startswith('NC_'))
-            
-            questions_asked_correctly = sum(
-                1 for g in grades.values() if g.get('code') in ['1', '6']
+        # Validate JSON structure
+        if not parser.has_segments:
+            return jsonify({'error': 'Invalid transcript format: missing "segments" field'}), 400
+        
+        # Only the top-level fields (language...) and the segment count are kept for the response
+        transcript_data = {**parser.fields, 'segment_count': parser.segment_count}
+        
+        if wants_async():
+            return submit_grading_job(
+                transcript_data,
+                show_evidence=wants_evidence(),
+                filename=filename,
+                error_label='Upload and grading failed',
+                transcript_text=transcript_text
             )
-            questions_missed = total_questions - questions_asked_correctly
-            
-            # Build response
-            response = {
-                'filename': filename,
-                'grader_type': 'ai',
-                'grade_percentage': percentage,
-                'detected_nature_code': primary_nature_code,
-                'total_questions': total_questions,
-                'case_entry_questions': case_entry_count,
-                'nature_code_questions': nature_code_count,
-                'questions_asked_correctly': questions_asked_correctly,
-                'questions_missed': questions_missed,
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'grades': grades,
-                'metadata': {
-                    'language': transcript_data.get('language', 'unknown'),
-                    'segment_count': len(transcript_data.get('segments', [])),
-                    'grader_version': '2.0.0',
-                    'model': 'llama3.1:8b',
-                    'questions_source': f'EMSQA.csv (Case Entry + {primary_nature_code})',
-                    'nature_code_detection': 'keyword + embedding model'
-                }
-            }
-            
-            return jsonify(response), 200
         
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        body, status = run_grading(
+            transcript_data,
+            show_evidence=wants_evidence(),
+            filename=filename,
+            error_label='Upload and grading failed',
+            transcript_text=transcript_text
+        )
+        return jsonify(body), status
     
-    except json.JSONDecodeError as e:
+    except UploadTooLargeError as e:
+        return jsonify({
+            'error': 'Upload too large',
+            'message': str(e)
+        }), 413
+    
+    except InvalidUploadError as e:
         return jsonify({
             'error': 'Invalid JSON file',
             'message': str(e)
         }), 400
     
-    except ConnectionError as e:
+    except Exception as e:
         return jsonify({
-            'error': 'Ollama connection failed',
-            'message': 'Please ensure Ollama is installed and running (ollama serve)',
-            'details': str(e)
-        }), 503
+            'error': f'Upload and grading failed: {str(e)}'
+        }), 500
+
+
+def batch_limits():
+    """
+    Batch limits from the environment
+    
+    Returns:
+        Tuple of (max_transcripts, max_bytes): EMS_BATCH_MAX_TRANSCRIPTS (default 500) and
+        EMS_BATCH_MAX_BYTES (default 200 MB), which caps the request body as well as the
+        total uncompressed size of a zip's .json files
+    """
+    max_transcripts = int(os.environ.get('EMS_BATCH_MAX_TRANSCRIPTS', '500'))
+    max_bytes = int(os.environ.get('EMS_BATCH_MAX_BYTES', str(200 * 1024 * 1024)))
+    return max_transcripts, max_bytes
+
+
+def read_batch_transcripts():
+    """
+    Read the transcripts of a batch request
+    
+    Accepts either a JSON array of transcripts or a multipart 'file' field
+    holding a .zip of .json transcript files
+    
+    Zip entries are counted and sized from the archive's directory before anything is
+    decompressed; a .json file bigger than EMS_UPLOAD_MAX_BYTES is reported on its own
+    (413) without being read. The caller checks that the request has a Content-Length.
     
+    Returns:
+        List of (filename or None, transcript_data, error or None);
+        error is a (http_status, body) tuple for files that can't be graded
+    
+    Raises:
+        ValueError: if the request body is not a supported batch
+        UploadTooLargeError: if the body, the number of transcripts or their total size is over the limits
+    """
+    max_transcripts, max_bytes = batch_limits()
+    
+    # The body is only read (or spooled by request.files) once its size is known to be acceptable
+    if request.content_length > max_bytes:
+        raise UploadTooLargeError(f'Batch is larger than {max_bytes} bytes')
+    
+    if request.is_json:
+        transcripts = request.get_json()
+        if not isinstance(transcripts, list):
+            raise ValueError('Request body must be a JSON array of transcripts')
+        return [(None, transcript_data, None) for transcript_data in transcripts]
+    
+    file = request.files.get('file')
+    if file is None or not file.filename.lower().endswith('.zip'):
+        raise ValueError('Send a JSON array of transcripts or a .zip of .json files in the "file" field')
+    
+    try:
+        archive = zipfile.ZipFile(file.stream)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f'Invalid zip file: {e}')
+    
+    max_file_bytes = upload_limits()[0]
+    with archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and allowed_file(info.filename) and not info.filename.startswith('__MACOSX/')
+        ]
+        if len(entries) > max_transcripts:
+            raise UploadTooLargeError(f'At most {max_transcripts} transcripts per batch')
+        total_bytes = sum(info.file_size for info in entries if info.file_size <= max_file_bytes)
+        if total_bytes > max_bytes:
+            raise UploadTooLargeError(f'Zip holds more than {max_bytes} bytes of transcripts')
+        
+        items = []
+        for info in entries:
+            filename = secure_filename(os.path.basename(info.filename))
+            if info.file_size > max_file_bytes:
+                items.append((filename, None, (413, {
+                    'error': 'Upload too large',
+                    'message': f'File is larger than {max_file_bytes} bytes'
+                })))
+                continue
+            try:
+                # Decompression stops at the file_size checked above
+                items.append((filename, json.loads(archive.read(info)), None))
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                # Bad files are reported per transcript instead of failing the batch
+                items.append((filename, None, (400, {'error': 'Invalid JSON file', 'message': str(e)})))
+            except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError) as e:
+                # Corrupt (CRC, header, compressed data), encrypted or unsupported-compression entries
+                items.append((filename, None, (400, {'error': 'Unreadable zip entry', 'message': str(e)})))
+    return items
+
+
+@grading_bp.route('/grade/batch', methods=['POST'])
+def grade_batch():
+    """
+    Grade many transcripts in one request
+    
+    Request:
+        application/json - array of transcripts (Group B's format), or
+        multipart/form-data - 'file' field with a .zip of .json transcript files
+    
+    Segment embeddings for nature code detection are computed in shared batches
+    across all transcripts, and the LLM stage runs with bounded concurrency
+    (EMS_BATCH_LLM_CONCURRENCY, default 2).
+    
+    Returns:
+        application/x-ndjson stream, one line per transcript as soon as it is graded:
+        {"index": 0, "filename": "...", "http_status": 200, "result": {...}}
+        "result" has the same format as /api/grade (or an error body)
+    """
+    if request.content_length is None:
+        return jsonify({
+            'error': 'Length required',
+            'message': 'Batch requests need a Content-Length header'
+        }), 411
+    
+    try:
+        items = read_batch_transcripts()
+    except UploadTooLargeError as e:
+        return jsonify({'error': 'Batch too large', 'message': str(e)}), 413
     except ValueError as e:
+        return jsonify({'error': 'Invalid batch', 'message': str(e)}), 400
+    
+    if not items:
+        return jsonify({'error': 'Invalid batch', 'message': 'No transcripts provided'}), 400
+    
+    max_transcripts, _ = batch_limits()
+    if len(items) > max_transcripts:
         return jsonify({
-            'error': 'Invalid transcript data',
-            'message': str(e)
-        }), 400
+            'error': 'Batch too large',
+            'message': f'At most {max_transcripts} transcripts per batch'
+        }), 413
     
-    except RuntimeError as e:
+    show_evidence = wants_evidence()
+    max_concurrency = int(os.environ.get('EMS_BATCH_LLM_CONCURRENCY', '2'))
+    
+    def line(index, status, body):
+        return json.dumps({
+            'index': index,
+            'filename': items[index][0],
+            'http_status': status,
+            'result': body
+        }) + '\n'
+    
+    def generate():
+        # Files that weren't valid JSON (or were too large) are reported first
+        valid = []
+        for index, (_, transcript_data, error) in enumerate(items):
+            if error is None:
+                valid.append(index)
+            else:
+                status, body = error
+                yield line(index, status, body)
+        
+        ai_grader = AIGraderService()
+        results = ai_grader.grade_batch(
+            [items[index][1] for index in valid],
+            show_evidence=show_evidence,
+            max_concurrency=max_concurrency
+        )
+        for position, result, error in results:
+            index = valid[position]
+            filename, transcript_data, _ = items[index]
+            if error is None:
+                body, status = store_result(build_grading_response(ai_grader, result, transcript_data, filename)), 200
+            else:
+                body, status = grading_error_response(error)
+            yield line(index, status, body)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@grading_bp.route('/grade/stream', methods=['POST'])
+def grade_stream():
+    """
+    Grade a transcript and stream the grades as server-sent events
+    
+    Request body: same JSON transcript as /api/grade
+    Optional query params: ?show_evidence=true (evidence on every grade event)
+    
+    Returns:
+        text/event-stream with events:
+        nature_code - detected nature code and number of questions
+        grade       - one per question as soon as the LLM has produced it
+                      {"question_id": "CE_1", "code": "1", "label": "...", "status": "..."}
+        final       - full response (same format as /api/grade, incl. grade_percentage)
+        error       - error body (same format as /api/grade errors) with http_status
+    """
+    if not request.is_json:
         return jsonify({
-            'error': 'AI grading failed',
-            'message': str(e),
-            'suggestion': 'Check if llama3.1:8b model is downloaded (ollama pull llama3.1:8b)'
-        }), 500
+            'error': 'Content-Type must be application/json'
+        }), 400
     
-    except Exception as e:
+    transcript_data = request.get_json()
+    
+    if 'segments' not in transcript_data:
         return jsonify({
-            'error': f'Upload and grading failed: {str(e)}'
-        }), 500
+            'error': 'Missing required field: segments'
+        }), 400
+    
+    show_evidence = wants_evidence()
+    
+    def generate():
+        ai_grader = AIGraderService()
+        try:
+            for event, data in ai_grader.stream_grade(transcript_data, show_evidence=show_evidence):
+                if event == 'result':
+                    yield sse_event('final', store_result(build_grading_response(ai_grader, data, transcript_data)))
+                else:
+                    yield sse_event(event, data)
+        except Exception as e:
+            body, status = grading_error_response(e)
+            yield sse_event('error', {**body, 'http_status': status})
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 
 @grading_bp.route('/grade/all', methods=['POST'])
@@ -292,4 +604,3 @@ def grade_all():
         'message': 'Use /api/grade/rule for rule-based grading',
         'status': 'coming_soon'
     }), 501
-
@@ -2,7 +2,7 @@
 Health check endpoint
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 
 health_bp = Blueprint('health', __name__)
 
@@ -12,11 +12,49 @@ def health_check():
     Health check endpoint to verify API is running
     
     Returns:
-        JSON response with status
+        JSON response with status (models_loaded is false until the
+        embedding model and question catalog have been loaded)
     """
+    from api.services.ai_grader import models_loaded
+    
     return jsonify({
         'status': 'healthy',
         'service': 'EMS Call Analysis API',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'models_loaded': models_loaded()
     }), 200
 
+
+
+@health_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Grading cache statistics
+    
+    Returns:
+        JSON with stored entries and hit/miss counts + hit rate per namespace
+        ("grades", "detection") since the process started
+    """
+    from api.services.grading_cache import get_grading_cache
+    
+    cache = get_grading_cache()
+    if cache is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **cache.stats()}), 200
+
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Pipeline metrics in the Prometheus text format
+    
+    Returns:
+        Per-stage timing histograms (ems_grading_stage_seconds), end-to-end grading
+        histograms, gradings/stages in flight, LLM queue wait and generation histograms,
+        plus LLM client and grading cache totals; added up over all worker processes
+        when PROMETHEUS_MULTIPROC_DIR is set
+    """
+    from api.services.metrics import render
+    
+    body, content_type = render()
+    return Response(body, content_type=content_type)
@@ -0,0 +1,25 @@
+"""
+Grading job status endpoints
+"""
+
+from flask import Blueprint, jsonify
+from api.services.job_queue import get_job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status of a grading job submitted with ?async=true
+
+    Returns:
+        JSON with job_id, status (queued, running, completed, failed),
+        timestamps and, once finished, the grading result
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'job_id': job_id}), 404
+
+    job.pop('callback_url', None)
+    return jsonify(job), 200
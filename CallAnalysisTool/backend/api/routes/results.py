@@ -0,0 +1,84 @@
+"""
+Stored grading result endpoints
+Reading results never re-runs grading
+"""
+
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from api.services.results_store import get_results_store, InvalidCursorError
+
+results_bp = Blueprint('results', __name__)
+
+# Page size limits for GET /results
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+def parse_time(value):
+    """Accept unix seconds or an ISO 8601 timestamp, return unix seconds"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+@results_bp.route('/results/<result_id>', methods=['GET'])
+def get_result(result_id):
+    """
+    Get a stored grading result
+
+    Returns:
+        The response body returned when the transcript was graded (incl. result_id)
+    """
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'Results store is disabled'}), 503
+
+    result = store.get(result_id)
+    if result is None:
+        return jsonify({'error': 'Result not found', 'result_id': result_id}), 404
+    return jsonify(result), 200
+
+
+@results_bp.route('/results', methods=['GET'])
+def list_results():
+    """
+    List stored grading results, newest first
+
+    Optional query params:
+        ?limit=20              - Page size (max 200)
+        ?cursor=...            - next_cursor from the previous page
+        ?nature_code=Falls     - Detected nature code
+        ?filename=call.json    - Uploaded file name
+        ?min_grade=50&max_grade=90  - Grade percentage range
+        ?since=...&until=...   - Time range (unix seconds or ISO 8601)
+
+    Returns:
+        JSON with 'results' (summaries) and 'next_cursor' (null on the last page)
+    """
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'Results store is disabled'}), 503
+
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        min_grade = request.args.get('min_grade')
+        max_grade = request.args.get('max_grade')
+        since = request.args.get('since')
+        until = request.args.get('until')
+        page = store.list(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            nature_code=request.args.get('nature_code'),
+            filename=request.args.get('filename'),
+            min_grade=float(min_grade) if min_grade is not None else None,
+            max_grade=float(max_grade) if max_grade is not None else None,
+            since=parse_time(since) if since is not None else None,
+            until=parse_time(until) if until is not None else None
+        )
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'error': 'Invalid query parameter', 'message': str(e)}), 400
+
+    return jsonify(page), 200
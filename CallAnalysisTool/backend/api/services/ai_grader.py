@@ -3,27 +3,87 @@ AI-based grading service with nature code detection
 Wraps AIGrader.py and detect_naturecode.py to work with the Flask API
 """
 
-import json
-import tempfile
-from typing import Dict, Any, Tuple
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 from pathlib import Path
-import sys
+import base64
 import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
 
 # Add parent backend directory to path for module imports
 backend_path = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 # Import core grading and nature code detection modules
-from JSONTranscriptionParser import json_to_text
+from JSONTranscriptionParser import transcript_to_text
+import detect_naturecode
+from detect_naturecode import detect_nature_codes, detect_nature_codes_batch, keyword_version, DetectionResult
+from question_catalog import get_catalog
+from llm_client import LLMClient, get_default_client
+from api.services.grading_cache import GradingCache, content_key, get_grading_cache
+from transcript_retrieval import prune_transcript, estimate_tokens, question_evidence, split_segments, catalog_question_embeddings
+from transcript_windows import split_windows, reduce_window_grades
+from JSONTranscriptionParser import parse_segment_line
+from fast_path_grader import fast_path_grade
+from api.services.metrics import STAGE_SECONDS, StageTimer, observe_llm_call, stage_timings_enabled, track_grading
 from AIGrader import (
-    detect_nature_codes_in_memory,
-    extract_all_nature_codes,
     load_nature_code_questions,
     ai_grade_transcript,
+    build_grading_prompt,
+    stream_grade_transcript,
+    split_question_groups,
+    PROMPT_VERSION,
     calculate_final_grade
 )
 
+@dataclass
+class GradingResult:
+    """
+    Everything produced by grading one transcript
+    """
+    grades: Dict[str, Dict[str, Any]]
+    nature_code: str
+    questions: Dict[str, str]
+    detection: Optional[Any] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Per nature code results when several nature codes were graded (multi-code mode)
+    breakdown: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def warm_up_models():
+    """
+    Load the embedding model, keyword index, question catalog and the catalog's
+    question embeddings up front
+    Called by create_app(warm_up=True) so the first request doesn't pay for it
+    """
+    detect_naturecode.warm_up()
+    get_catalog().snapshot()
+    catalog_question_embeddings()
+
+
+def embeddings_to_json(embeddings: np.ndarray) -> Dict[str, Any]:
+    """Embedding matrix as a JSON-serializable dict (float32 bytes, base64)"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return {'shape': list(embeddings.shape), 'data': base64.b64encode(embeddings.tobytes()).decode('ascii')}
+
+
+def embeddings_from_json(data: Dict[str, Any]) -> np.ndarray:
+    """Inverse of embeddings_to_json()"""
+    return np.frombuffer(base64.b64decode(data['data']), dtype=np.float32).reshape(data['shape'])
+
+
+def models_loaded() -> bool:
+    """Whether the heavy grading resources have been loaded in this process"""
+    return detect_naturecode.model_loaded() and get_catalog().loaded
+
+
 class AIGraderService:
     """
     AI-based transcript grader using Ollama (llama3.1:8b model)
@@ -41,12 +101,74 @@ class AIGraderService:
         "RC": "Recorded Correctly"
     }
     
-    def __init__(self):
+    def __init__(self, llm_client: Optional[LLMClient] = None, cache: Optional[GradingCache] = None,
+                 question_grouping: Optional[str] = None, chunk_size: Optional[int] = None,
+                 retrieval: Optional[bool] = None, retrieval_top_k: Optional[int] = None,
+                 retrieval_window: Optional[int] = None, fast_path: Optional[bool] = None,
+                 max_nature_codes: Optional[int] = None, min_confidence: Optional[float] = None,
+                 stage_timings: Optional[bool] = None, long_transcript_tokens: Optional[int] = None,
+                 window_seconds: Optional[float] = None, window_overlap_seconds: Optional[float] = None):
         """
         Initialize AI grader
         Questions are now loaded dynamically based on detected nature codes
+        
+        Args:
+            llm_client: LLMClient used for generations (defaults to the shared,
+                        environment-configured client)
+            cache: GradingCache for grades and detection results (defaults to the
+                   shared cache, None if EMS_CACHE_ENABLED=0)
+            question_grouping: "single" (one prompt), "nature" (Case Entry and nature code
+                               questions in separate prompts) or "chunk" (fixed-size groups);
+                               groups are graded concurrently. Defaults to EMS_QUESTION_GROUPING
+            chunk_size: Questions per group for "chunk" (defaults to EMS_QUESTION_CHUNK_SIZE)
+            retrieval: Only send each question group the transcript segments most similar to
+                       its questions (defaults to EMS_RETRIEVAL, off unless set to 1)
+            retrieval_top_k: Segments kept per question (defaults to EMS_RETRIEVAL_TOP_K)
+            retrieval_window: Neighbouring segments kept around each one (defaults to EMS_RETRIEVAL_WINDOW)
+            fast_path: Grade questions the dispatcher read out verbatim as "1" without the LLM
+                       (defaults to EMS_FAST_PATH, off unless set to 1)
+            max_nature_codes: Grade up to this many triggered nature codes concurrently, sharing
+                              one Case Entry grading (defaults to EMS_MAX_NATURE_CODES, 1 = primary only)
+            min_confidence: Only grade secondary nature codes at or above this detection confidence
+                            (defaults to EMS_NATURE_CODE_MIN_CONFIDENCE)
+            stage_timings: Add per-stage timings (parse, detection, questions, fast_path, retrieval,
+                           llm, format) to the result metadata (defaults to EMS_STAGE_TIMINGS, off unless set to 1);
+                           stage times are exported on /api/metrics either way
+            long_transcript_tokens: Prompts estimated above this many tokens are graded in
+                                    overlapping time windows, concurrently, and the window grades
+                                    reduced per question. Defaults to the LLM client's
+                                    prompt_token_budget(), i.e. what fits the num_ctx context
+                                    Ollama is asked for (EMS_LLM_NUM_CTX), so no prompt is
+                                    truncated; EMS_LONG_TRANSCRIPT_TOKENS can only lower it, 0 = off
+            window_seconds: Length of a long-transcript window (defaults to EMS_LONG_TRANSCRIPT_WINDOW_S)
+            window_overlap_seconds: Overlap between neighbouring windows (defaults to EMS_LONG_TRANSCRIPT_OVERLAP_S)
         """
-        pass
+        self.llm_client = llm_client or get_default_client()
+        self.cache = cache if cache is not None else get_grading_cache()
+        self.question_grouping = question_grouping or os.environ.get('EMS_QUESTION_GROUPING', 'single')
+        self.chunk_size = chunk_size or int(os.environ.get('EMS_QUESTION_CHUNK_SIZE', '10'))
+        self.retrieval = retrieval if retrieval is not None else os.environ.get('EMS_RETRIEVAL', '0') == '1'
+        self.retrieval_top_k = retrieval_top_k or int(os.environ.get('EMS_RETRIEVAL_TOP_K', '3'))
+        self.retrieval_window = retrieval_window if retrieval_window is not None else int(os.environ.get('EMS_RETRIEVAL_WINDOW', '1'))
+        self.fast_path = fast_path if fast_path is not None else os.environ.get('EMS_FAST_PATH', '0') == '1'
+        self.max_nature_codes = max_nature_codes or int(os.environ.get('EMS_MAX_NATURE_CODES', '1'))
+        if min_confidence is None and os.environ.get('EMS_NATURE_CODE_MIN_CONFIDENCE'):
+            min_confidence = float(os.environ['EMS_NATURE_CODE_MIN_CONFIDENCE'])
+        self.min_confidence = min_confidence
+        self.stage_timings = stage_timings if stage_timings is not None else stage_timings_enabled()
+        if long_transcript_tokens is None:
+            budget = self.llm_client.prompt_token_budget()
+            long_transcript_tokens = min(int(os.environ.get('EMS_LONG_TRANSCRIPT_TOKENS', str(budget))), budget)
+        self.long_transcript_tokens = long_transcript_tokens
+        self.window_seconds = window_seconds or float(os.environ.get('EMS_LONG_TRANSCRIPT_WINDOW_S', '240'))
+        self.window_overlap_seconds = window_overlap_seconds if window_overlap_seconds is not None else float(os.environ.get('EMS_LONG_TRANSCRIPT_OVERLAP_S', '30'))
+        
+        # Cache keys whose segment embeddings are stored (see segment_embeddings)
+        self._stored_segment_embeddings = set()
+        self._segment_embeddings_lock = threading.Lock()
+        
+        # Fail at startup rather than on the first request
+        split_question_groups({}, self.question_grouping, self.chunk_size)
     
     def grade_transcript(self, transcript_data: Dict[str, Any], show_evidence: bool = False) -> Tuple[Dict[str, Any], str, Dict[str, str]]:
         """
@@ -54,7 +176,7 @@ class AIGraderService:
         
         Args:
             transcript_data: Group B's JSON format with 'segments' array
-            show_evidence: Whether to include evidence (not used currently)
+            show_evidence: Attach the best-matching transcript segments to every grade
         
         Returns:
             Tuple of (formatted_grades, primary_nature_code, all_questions)
@@ -65,62 +187,853 @@ class AIGraderService:
                 ...
             }
         """
-        # JSONTranscriptionParser expects a file path, so create a temp file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp:
-            json.dump(transcript_data, tmp)
-            tmp_path = tmp.name
+        result = self.grade(transcript_data, show_evidence=show_evidence)
+        return result.grades, result.nature_code, result.questions
+    
+    def grade(self, transcript_data: Dict[str, Any], show_evidence: bool = False,
+              transcript_text: Optional[str] = None) -> GradingResult:
+        """
+        Grade a transcript and return the full GradingResult
+        
+        Args:
+            transcript_data: Group B's JSON format with 'segments' array
+            show_evidence: Attach the best-matching transcript segments to every grade
+            transcript_text: Already formatted transcript (e.g. formatted while an upload was
+                             parsed); transcript_data then doesn't need its segments
         
-        try:
+        Returns:
+            GradingResult (formatted grades, primary nature code, questions, detection)
+        """
+        timer = StageTimer()
+        with track_grading('grade'):
             # Step 1: Convert JSON to text format
-            transcript_text = json_to_text(tmp_path)
-            if not transcript_text:
-                raise ValueError("Failed to parse transcript data")
-            
-            # Step 2: Detect nature codes
-            nature_codes_text = detect_nature_codes_in_memory(tmp_path, transcript_text)
-            if not nature_codes_text:
-                raise RuntimeError("Failed to detect nature codes")
-            
-            # Step 3: Extract and sort nature codes by confidence
-            nature_codes = extract_all_nature_codes(nature_codes_text)
-            if not nature_codes:
-                raise RuntimeError("No nature codes detected in transcript")
-            
-            # Step 4: Get primary nature code (highest confidence)
-            primary_nature_code = nature_codes[0][0]
-            
-            # Step 5: Load questions for Case Entry AND primary nature code
-            case_entry_questions = load_nature_code_questions("Case Entry")
-            nature_code_questions = load_nature_code_questions(primary_nature_code)
-            
-            # Combine into one dict
-            all_questions = {**case_entry_questions, **nature_code_questions}
+            with timer.stage('parse'):
+                if transcript_text is None:
+                    transcript_text = self.format_transcript(transcript_data)
+                elif not transcript_text:
+                    raise ValueError("Failed to parse transcript data")
             
-            if not all_questions:
-                raise RuntimeError("Failed to load questions from EMSQA.csv")
+            # Step 2: Detect nature codes (sorted by confidence)
+            with timer.stage('detection'):
+                detection = self.detect(transcript_text)
             
-            # Step 6: Get AI grades
-            ai_grades = ai_grade_transcript(transcript_text, all_questions, primary_nature_code)
+            return self.grade_detected(transcript_data, transcript_text, detection, show_evidence=show_evidence, timer=timer)
+    
+    def format_transcript(self, transcript_data: Dict[str, Any]) -> str:
+        """
+        Convert a transcript to the text format used for detection and grading
+        (formatted in memory, no temp file)
+        
+        Raises:
+            ValueError: if the transcript can't be parsed
+        """
+        transcript_text = transcript_to_text(transcript_data)
+        if not transcript_text:
+            raise ValueError("Failed to parse transcript data")
+        return transcript_text
+    
+    def grade_detected(self, transcript_data: Dict[str, Any], transcript_text: str, detection: Any,
+                       show_evidence: bool = False, timer: Optional[StageTimer] = None) -> GradingResult:
+        """
+        Grade a transcript whose nature codes have already been detected
+        (questions + LLM stage of grade())
+        
+        Args:
+            transcript_data: Group B's JSON format with 'segments' array
+            transcript_text: Output of format_transcript()
+            detection: DetectionResult for transcript_text
+            show_evidence: Attach the best-matching transcript segments to every grade
+            timer: StageTimer that already holds the earlier stages (parse, detection)
+        
+        Returns:
+            GradingResult
+        """
+        if not detection.nature_codes:
+            raise RuntimeError("No nature codes detected in transcript")
+        timer = timer or StageTimer()
+        
+        nature_codes = self.select_nature_codes(detection)
+        if len(nature_codes) > 1:
+            return self.grade_multi(transcript_text, detection, nature_codes, show_evidence=show_evidence, timer=timer)
+        
+        # Steps 3-4: Primary nature code and its questions (plus Case Entry)
+        with timer.stage('questions'):
+            primary_nature_code, all_questions = self.load_questions(detection, nature_codes[0][0])
+        
+        # Steps 5-6: Fast path, then AI grades for the rest
+        graded = self.grade_questions(transcript_text, all_questions, primary_nature_code, detection, timer)
+        
+        # Step 7: Format grades to match API response structure
+        with timer.stage('format'):
+            formatted_grades = self.format_grades(graded['ai_grades'], all_questions, graded['fast_grades'])
+            if show_evidence:
+                self.attach_evidence(formatted_grades, transcript_text, all_questions, detection, graded['fast_grades'])
+        
+        return GradingResult(
+            grades=formatted_grades,
+            nature_code=primary_nature_code,
+            questions=all_questions,
+            detection=detection,
+            metadata={
+                'llm': graded['llm'],
+                'cache': self.cache_metadata(detection, graded['cache']),
+                **({'retrieval': graded['retrieval']} if graded['retrieval'] else {}),
+                **({'fast_path': self.fast_path_metadata(all_questions, graded['fast_grades'])} if self.fast_path else {}),
+                **({'timings': timer.metadata()} if self.stage_timings else {})
+            }
+        )
+    
+    def grade_questions(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                        detection: Optional[DetectionResult] = None, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """
+        Grade one set of questions: verbatim questions on the fast path, the rest by the LLM
+        
+        Returns:
+            Dict with 'ai_grades', 'fast_grades', 'llm' (timings), 'retrieval' (token counts)
+            and 'cache' (grades cache status)
+        
+        Raises:
+            RuntimeError: if the LLM returned no grades
+        """
+        timer = timer or StageTimer()
+        
+        # Questions asked verbatim are graded without the LLM
+        fast_grades = {}
+        if self.fast_path:
+            with timer.stage('fast_path'):
+                fast_grades = self.pre_grade(transcript_text, questions, nature_code)
+        llm_questions = {q_id: text for q_id, text in questions.items() if q_id not in fast_grades}
+        
+        # AI grades for the rest (queue wait and generation time are reported separately)
+        llm_stats = {}
+        retrieval_stats = {}
+        ai_grades = {}
+        grades_cache = 'skipped'
+        if llm_questions:
+            ai_grades, grades_cache = self.ai_grade(
+                transcript_text, llm_questions, nature_code, llm_stats,
+                detection=detection, retrieval_stats=retrieval_stats, timer=timer
+            )
             
             if not ai_grades:
                 raise RuntimeError("AI grading failed - empty response from Ollama")
-            
-            # Step 7: Format grades to match API response structure
-            formatted_grades = {}
-            for q_id, question_text in all_questions.items():
-                code = ai_grades.get(q_id, "2")  # Default to "Not Asked" if missing
-                formatted_grades[q_id] = {
-                    "code": code,
-                    "label": question_text,
-                    "status": self.KEY.get(code, "Unknown")
-                }
-            
-            return formatted_grades, primary_nature_code, all_questions
         
-        finally:
-            # Clean up temp file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        return {
+            'ai_grades': ai_grades,
+            'fast_grades': fast_grades,
+            'llm': llm_stats,
+            'retrieval': retrieval_stats,
+            'cache': grades_cache
+        }
+    
+    def select_nature_codes(self, detection: DetectionResult) -> List[Tuple[str, float]]:
+        """
+        Nature codes to grade: the primary one, plus further triggered codes up to
+        max_nature_codes that reach min_confidence (Case Entry is always graded separately)
+        
+        With max_nature_codes above 1 the primary is the top code other than Case Entry,
+        also when it is the only one selected
+        
+        Returns:
+            List of (nature_code, confidence), highest confidence first
+        """
+        codes = [(n.name, n.confidence) for n in detection.nature_codes if n.name != "Case Entry"]
+        if not codes or self.max_nature_codes <= 1:
+            return [(detection.primary.name, detection.primary.confidence)]
+        
+        selected = codes[:1] + [
+            (name, confidence) for name, confidence in codes[1:]
+            if self.min_confidence is None or confidence >= self.min_confidence
+        ]
+        return selected[:max(1, self.max_nature_codes)]
+    
+    def grade_multi(self, transcript_text: str, detection: DetectionResult, nature_codes: List[Tuple[str, float]],
+                    show_evidence: bool = False, timer: Optional[StageTimer] = None) -> GradingResult:
+        """
+        Grade several nature codes at once
+        
+        Case Entry and every nature code's questions are graded concurrently; Case Entry is
+        graded once and shared by all codes. The result's top-level grades are Case Entry +
+        the primary code (as in single-code mode), result.breakdown has one entry per code.
+        Stage timings of the concurrent jobs are summed per stage.
+        """
+        timer = timer or StageTimer()
+        with timer.stage('questions'):
+            case_entry_questions = load_nature_code_questions("Case Entry")
+            jobs = [("Case Entry", case_entry_questions)] + [
+                (code, load_nature_code_questions(code)) for code, _ in nature_codes
+            ]
+            jobs = [(code, questions) for code, questions in jobs if questions]
+        if not jobs:
+            raise RuntimeError("Failed to load questions from EMSQA.csv")
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='nature-code') as pool:
+            outcomes = dict(zip(
+                [code for code, _ in jobs],
+                pool.map(lambda job: self.grade_questions(transcript_text, job[1], job[0], detection, timer), jobs)
+            ))
+        wall_s = round(time.perf_counter() - started, 4)
+        
+        format_started = time.perf_counter()
+        shared = outcomes.get("Case Entry", {'ai_grades': {}, 'fast_grades': {}})
+        case_entry_grades = self.format_grades(shared['ai_grades'], case_entry_questions, shared['fast_grades'])
+        
+        breakdown = []
+        for code, confidence in nature_codes:
+            code_questions = load_nature_code_questions(code)
+            outcome = outcomes.get(code, {'ai_grades': {}, 'fast_grades': {}})
+            code_grades = self.format_grades(outcome['ai_grades'], code_questions, outcome['fast_grades'])
+            if show_evidence:
+                self.attach_evidence(code_grades, transcript_text, code_questions, detection, outcome['fast_grades'])
+            breakdown.append({
+                'nature_code': code,
+                'confidence': confidence,
+                'grade_percentage': self.calculate_percentage(
+                    {**case_entry_grades, **code_grades}, {**case_entry_questions, **code_questions}
+                ),
+                'questions': len(code_questions),
+                'grades': code_grades
+            })
+        
+        if show_evidence:
+            self.attach_evidence(case_entry_grades, transcript_text, case_entry_questions, detection, shared['fast_grades'])
+        
+        primary = breakdown[0]
+        all_questions = {**case_entry_questions, **load_nature_code_questions(primary['nature_code'])}
+        all_grades = {**case_entry_grades, **primary['grades']}
+        
+        question_count = sum(len(questions) for _, questions in jobs)
+        fast_graded = sum(len(outcome['fast_grades']) for outcome in outcomes.values())
+        fast_path_stats = {'questions': question_count, 'graded': fast_graded, 'sent_to_llm': question_count - fast_graded}
+        
+        cache_states = {outcome['cache'] for outcome in outcomes.values()} - {'skipped'}
+        grades_cache = cache_states.pop() if len(cache_states) == 1 else ('partial' if cache_states else 'skipped')
+        timer.add('format', time.perf_counter() - format_started)
+        
+        return GradingResult(
+            grades=all_grades,
+            nature_code=primary['nature_code'],
+            questions=all_questions,
+            detection=detection,
+            metadata={
+                'llm': {'wall_s': wall_s, 'jobs': {code: outcome['llm'] for code, outcome in outcomes.items()}},
+                'cache': self.cache_metadata(detection, grades_cache),
+                **({'retrieval': {code: outcome['retrieval'] for code, outcome in outcomes.items() if outcome['retrieval']}}
+                   if self.retrieval else {}),
+                **({'fast_path': fast_path_stats} if self.fast_path else {}),
+                **({'timings': timer.metadata()} if self.stage_timings else {})
+            },
+            breakdown=breakdown
+        )
+    
+    def attach_evidence(self, formatted_grades: Dict[str, Dict[str, Any]], transcript_text: str,
+                        questions: Dict[str, str], detection: Optional[DetectionResult] = None,
+                        fast_grades: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Add the evidence segments to every formatted grade (in place)"""
+        evidence = self.find_evidence(transcript_text, questions, detection, fast_grades)
+        for q_id, grade in formatted_grades.items():
+            grade['evidence'] = evidence.get(q_id, [])
+    
+    def pre_grade(self, transcript_text: str, questions: Dict[str, str], nature_code: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Fast-path grades for questions the dispatcher read out verbatim (empty if disabled)
+        
+        Returns:
+            Dict of question_id -> {"code": "1", "segment", "sentence", "fuzzy", "similarity"}
+        """
+        if not self.fast_path:
+            return {}
+        catalog = get_catalog()
+        alternatives = {**catalog.alternatives("Case Entry"), **catalog.alternatives(nature_code)}
+        return fast_path_grade(transcript_text, questions, alternatives)
+    
+    def find_evidence(self, transcript_text: str, questions: Dict[str, str], detection: Optional[DetectionResult] = None,
+                      fast_grades: Optional[Dict[str, Dict[str, Any]]] = None, top_n: int = 2) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Best-matching transcript segments per question, from a question x segment similarity
+        matrix (segment embeddings from detection or the cache are reused, no extra LLM call)
+        
+        Returns:
+            Dict of question_id -> [{"start", "end", "speaker", "text", "score"}, ...]
+            For fast-path grades the segment that was matched comes first
+        """
+        segment_embeddings = self.segment_embeddings(transcript_text, detection)
+        evidence = question_evidence(transcript_text, questions, segment_embeddings, top_n=top_n)
+        
+        if fast_grades:
+            segments = split_segments(transcript_text)
+            for q_id, match in fast_grades.items():
+                matched = parse_segment_line(segments[match["segment"]])
+                if matched is None:
+                    continue
+                others = [e for e in evidence.get(q_id, []) if (e["start"], e["end"]) != (matched["start"], matched["end"])]
+                evidence[q_id] = [{**matched, "score": match["similarity"]}] + others[:top_n - 1]
+        return evidence
+    
+    def fast_path_metadata(self, questions: Dict[str, str], fast_grades: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """How many questions the fast path graded and how many still went to the LLM"""
+        return {
+            'questions': len(questions),
+            'graded': len(fast_grades),
+            'sent_to_llm': len(questions) - len(fast_grades)
+        }
+    
+    def detect(self, transcript_text: str) -> DetectionResult:
+        """
+        Nature code detection, served from the cache when this transcript was seen before
+        (keyed on the transcript text and the keyword file/model version)
+        """
+        if self.cache is None:
+            return detect_nature_codes(transcript_text)
+        
+        key = content_key(transcript_text, keyword_version())
+        cached = self.cache.get('detection', key)
+        if cached is not None:
+            return DetectionResult.from_dict(cached, from_cache=True)
+        
+        detection = detect_nature_codes(transcript_text)
+        self.cache.put('detection', key, detection.to_dict())
+        return detection
+    
+    def detect_batch(self, transcript_texts: List[str], encode_batch_size: int = 128) -> List[DetectionResult]:
+        """
+        Nature code detection for many transcripts; cache misses are encoded together
+        """
+        if self.cache is None:
+            return detect_nature_codes_batch(transcript_texts, batch_size=encode_batch_size)
+        
+        version = keyword_version()
+        keys = [content_key(text, version) for text in transcript_texts]
+        detections: List[Optional[DetectionResult]] = []
+        for key in keys:
+            cached = self.cache.get('detection', key)
+            detections.append(DetectionResult.from_dict(cached, from_cache=True) if cached is not None else None)
+        
+        misses = [i for i, detection in enumerate(detections) if detection is None]
+        fresh = detect_nature_codes_batch([transcript_texts[i] for i in misses], batch_size=encode_batch_size)
+        for i, detection in zip(misses, fresh):
+            detections[i] = detection
+            self.cache.put('detection', keys[i], detection.to_dict())
+        return detections
+    
+    def segment_embeddings(self, transcript_text: str, detection: Optional[DetectionResult]) -> Optional[np.ndarray]:
+        """
+        Segment embeddings for retrieval and evidence
+        
+        Detection computes them, but a detection served from the cache has none. The first
+        time retrieval or evidence needs them they are cached as well ('segment_embeddings',
+        same key as the detection), so repeated requests don't encode the segments again.
+        
+        Returns:
+            Embeddings of split_segments(transcript_text), or None without a detection
+            or cache (the caller encodes)
+        """
+        if detection is None or self.cache is None:
+            return detection.segment_embeddings if detection is not None else None
+        
+        with self._segment_embeddings_lock:
+            key = content_key(transcript_text, keyword_version())
+            if detection.segment_embeddings is None:
+                cached = self.cache.get('segment_embeddings', key)
+                if cached is not None:
+                    detection.segment_embeddings = embeddings_from_json(cached)
+                    self._stored_segment_embeddings.add(key)
+                else:
+                    detection.segment_embeddings = detect_naturecode.encode(split_segments(transcript_text))
+            if key not in self._stored_segment_embeddings:
+                self.cache.put('segment_embeddings', key, embeddings_to_json(detection.segment_embeddings))
+                self._stored_segment_embeddings.add(key)
+        return detection.segment_embeddings
+    
+    def grades_cache_key(self, transcript_text: str, questions: Dict[str, str], nature_code: str) -> str:
+        """Cache key for LLM grades: transcript (as sent to the LLM), question set, nature code, model and prompt version"""
+        return content_key(transcript_text, questions, nature_code, self.llm_client.model, PROMPT_VERSION)
+    
+    def question_groups(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                        detection: Optional[DetectionResult] = None,
+                        retrieval_stats: Optional[Dict[str, Any]] = None) -> List[Tuple[Dict[str, str], str]]:
+        """
+        Split questions into the groups that get their own prompt, and pick the
+        transcript context each group is graded against
+        
+        With retrieval enabled the context only holds the segments most similar to the
+        group's questions; segment embeddings from detection are reused when present.
+        
+        Returns:
+            List of (questions, transcript context) per group
+        """
+        groups = split_question_groups(questions, self.question_grouping, self.chunk_size)
+        if not self.retrieval:
+            return [(group, transcript_text) for group in groups]
+        
+        segment_embeddings = self.segment_embeddings(transcript_text, detection)
+        contexts = []
+        tokens_before = tokens_after = 0
+        for group in groups:
+            context, kept, total = prune_transcript(
+                transcript_text, group, segment_embeddings,
+                top_k=self.retrieval_top_k, window=self.retrieval_window
+            )
+            contexts.append((group, context))
+            tokens_before += estimate_tokens(build_grading_prompt(transcript_text, group, nature_code))
+            tokens_after += estimate_tokens(build_grading_prompt(context, group, nature_code))
+            if retrieval_stats is not None:
+                retrieval_stats.setdefault('segments_kept', []).append(kept)
+                retrieval_stats['segments_total'] = total
+        
+        if retrieval_stats is not None:
+            retrieval_stats['prompt_tokens_before'] = tokens_before
+            retrieval_stats['prompt_tokens_after'] = tokens_after
+        return contexts
+    
+    def ai_grade(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                 llm_stats: Optional[Dict[str, Any]] = None, detection: Optional[DetectionResult] = None,
+                 retrieval_stats: Optional[Dict[str, Any]] = None,
+                 timer: Optional[StageTimer] = None) -> Tuple[Dict[str, str], str]:
+        """
+        LLM grading of all questions; with question grouping enabled every group is
+        graded by its own generation, concurrently, and the grades are merged
+        
+        Returns:
+            Tuple of (grades, cache status "hit", "miss" or "partial");
+            grades are empty if any group failed
+        """
+        timer = timer or StageTimer()
+        with timer.stage('retrieval') if self.retrieval else nullcontext():
+            groups = self.question_groups(transcript_text, questions, nature_code, detection, retrieval_stats)
+        if len(groups) == 1:
+            group, context = groups[0]
+            with timer.stage('llm'):
+                grades, cached = self.ai_grade_group(context, group, nature_code, llm_stats)
+            return grades, 'hit' if cached else 'miss'
+        
+        group_stats = [{} for _ in groups]
+        started = time.perf_counter()
+        with timer.stage('llm'), ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix='question-group') as pool:
+            results = list(pool.map(
+                lambda args: self.ai_grade_group(args[0][1], args[0][0], nature_code, args[1]),
+                zip(groups, group_stats)
+            ))
+        
+        if llm_stats is not None:
+            llm_stats['wall_s'] = round(time.perf_counter() - started, 4)
+            llm_stats['groups'] = [
+                {'questions': len(group), 'cache': 'hit' if cached else 'miss', **stats}
+                for (group, _), (_, cached), stats in zip(groups, results, group_stats)
+            ]
+        
+        # A failed group would otherwise show up as "Not Asked" for all of its questions
+        if not all(grades for grades, _ in results):
+            return {}, 'miss'
+        
+        merged = {}
+        for grades, _ in results:
+            merged.update(grades)
+        
+        hits = sum(1 for _, cached in results if cached)
+        return merged, 'hit' if hits == len(groups) else ('miss' if hits == 0 else 'partial')
+    
+    def ai_grade_group(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                       llm_stats: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], bool]:
+        """
+        Grade a group of questions: one LLM generation, or one per time window when the
+        prompt would be too long (see is_long_transcript)
+        
+        Returns:
+            Tuple of (grades for the questions in this group, served_from_cache)
+        """
+        if self.is_long_transcript(transcript_text, questions, nature_code):
+            return self.ai_grade_windows(transcript_text, questions, nature_code, llm_stats)
+        return self.ai_grade_prompt(transcript_text, questions, nature_code, llm_stats)
+    
+    def is_long_transcript(self, transcript_text: str, questions: Dict[str, str], nature_code: str) -> bool:
+        """Whether the grading prompt is estimated above long_transcript_tokens (map-reduce mode)"""
+        if not self.long_transcript_tokens:
+            return False
+        return estimate_tokens(build_grading_prompt(transcript_text, questions, nature_code)) > self.long_transcript_tokens
+    
+    def transcript_windows(self, transcript_text: str, questions: Dict[str, str], nature_code: str) -> List[Dict[str, Any]]:
+        """
+        Overlapping time windows of a long transcript; each window's text also stays under the
+        token budget left once the questions and instructions are in the prompt
+        
+        Returns:
+            List of {"start", "end", "segments", "text"}
+        """
+        prompt_tokens = estimate_tokens(build_grading_prompt('', questions, nature_code))
+        budget = max(self.long_transcript_tokens - prompt_tokens, self.long_transcript_tokens // 4)
+        return split_windows(transcript_text, self.window_seconds, self.window_overlap_seconds, max_tokens=budget)
+    
+    def ai_grade_windows(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                         llm_stats: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], bool]:
+        """
+        Map-reduce grading of a long transcript: every window is graded concurrently against
+        all of the questions (cached per window), then the grades are reduced per question
+        (asked in any window: best of 1 > 4 > 3, then 6, RC, 5 only if every window says 5, else 2)
+        
+        Returns:
+            Tuple of (reduced grades, every window served_from_cache);
+            grades are empty if any window failed
+        """
+        windows = self.transcript_windows(transcript_text, questions, nature_code)
+        window_stats = [{} for _ in windows]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, len(windows)), thread_name_prefix='transcript-window') as pool:
+            results = list(pool.map(
+                lambda args: self.ai_grade_prompt(args[0]['text'], questions, nature_code, args[1]),
+                zip(windows, window_stats)
+            ))
+        
+        if llm_stats is not None:
+            llm_stats['wall_s'] = round(time.perf_counter() - started, 4)
+            llm_stats['windows'] = [
+                {'start': window['start'], 'end': window['end'], 'segments': window['segments'],
+                 'cache': 'hit' if cached else 'miss', **stats}
+                for window, (_, cached), stats in zip(windows, results, window_stats)
+            ]
+        
+        # As with question groups, a failed window would turn its questions into "Not Asked"
+        if not all(grades for grades, _ in results):
+            return {}, False
+        return reduce_window_grades([grades for grades, _ in results], questions), all(cached for _, cached in results)
+    
+    def ai_grade_prompt(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                        llm_stats: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], bool]:
+        """
+        One LLM generation for a group of questions, with the content-addressed cache in front of it
+        
+        Returns:
+            Tuple of (grades for the questions in this group, served_from_cache)
+        """
+        key = None
+        if self.cache is not None:
+            key = self.grades_cache_key(transcript_text, questions, nature_code)
+            cached = self.cache.get('grades', key)
+            if cached is not None:
+                return cached, True
+        
+        llm_stats = llm_stats if llm_stats is not None else {}
+        ai_grades = ai_grade_transcript(
+            transcript_text, questions, nature_code,
+            client=self.llm_client, stats=llm_stats
+        )
+        observe_llm_call(llm_stats)
+        # IDs the model made up (or took from another group) are dropped
+        ai_grades = {q_id: str(code) for q_id, code in ai_grades.items() if q_id in questions}
+        
+        # Failed (empty) gradings are not cached
+        if key is not None and ai_grades:
+            self.cache.put('grades', key, ai_grades)
+        return ai_grades, False
+    
+    def cache_metadata(self, detection: DetectionResult, grades_cache: str) -> Dict[str, str]:
+        """Which stages were served from the cache (for the response metadata)"""
+        if self.cache is None:
+            return {'detection': 'disabled', 'grades': 'disabled'}
+        return {
+            'detection': 'hit' if detection.from_cache else 'miss',
+            'grades': grades_cache
+        }
+    
+    def load_questions(self, detection: Any, nature_code: Optional[str] = None) -> Tuple[str, Dict[str, str]]:
+        """
+        Pick the primary nature code and load its questions plus Case Entry
+        
+        Args:
+            detection: DetectionResult
+            nature_code: Nature code to grade (defaults to the highest-confidence detection)
+        
+        Returns:
+            Tuple of (primary_nature_code, all_questions)
+        """
+        if not detection.nature_codes:
+            raise RuntimeError("No nature codes detected in transcript")
+        
+        # Get primary nature code (highest confidence unless one was selected)
+        primary_nature_code = nature_code or detection.primary.name
+        
+        # Load questions for Case Entry AND primary nature code
+        case_entry_questions = load_nature_code_questions("Case Entry")
+        nature_code_questions = load_nature_code_questions(primary_nature_code)
+        
+        # Combine into one dict
+        all_questions = {**case_entry_questions, **nature_code_questions}
+        
+        if not all_questions:
+            raise RuntimeError("Failed to load questions from EMSQA.csv")
+        
+        return primary_nature_code, all_questions
+    
+    def format_grade(self, code: str, question_text: str, source: Optional[str] = None) -> Dict[str, Any]:
+        """Format one grade to match the API response structure"""
+        grade = {
+            "code": code,
+            "label": question_text,
+            "status": self.KEY.get(code, "Unknown")
+        }
+        if source is not None:
+            grade["source"] = source
+        return grade
+    
+    def format_grades(self, ai_grades: Dict[str, str], questions: Dict[str, str],
+                      fast_grades: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Format grades for every question, defaulting to "2" (Not Asked) if missing
+        
+        Each grade says where it came from: "fast_path", "llm" or "default" (missing from the LLM output)
+        """
+        fast_grades = fast_grades or {}
+        formatted = {}
+        for q_id, question_text in questions.items():
+            if q_id in fast_grades:
+                formatted[q_id] = self.format_grade(fast_grades[q_id]["code"], question_text, "fast_path")
+            elif q_id in ai_grades:
+                formatted[q_id] = self.format_grade(ai_grades[q_id], question_text, "llm")
+            else:
+                formatted[q_id] = self.format_grade("2", question_text, "default")
+        return formatted
+    
+    def stream_grade(self, transcript_data: Dict[str, Any], show_evidence: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Grade a transcript, yielding each grade as soon as the LLM has produced it
+        With show_evidence every grade carries its best-matching transcript segments
+        
+        Yields:
+            ("nature_code", {"nature_code": ..., "confidence": ..., "question_count": ...})
+            ("grade", {"question_id": ..., "code": ..., "label": ..., "status": ...}) per question
+            ("result", GradingResult) once generation is finished; questions the
+            LLM skipped are filled in as "2" (Not Asked)
+        """
+        with track_grading('stream'):
+            yield from self._stream_grade(transcript_data, show_evidence)
+    
+    def _stream_grade(self, transcript_data: Dict[str, Any], show_evidence: bool) -> Iterator[Tuple[str, Any]]:
+        """stream_grade() without the in-flight/outcome tracking"""
+        timer = StageTimer()
+        with timer.stage('parse'):
+            transcript_text = self.format_transcript(transcript_data)
+        with timer.stage('detection'):
+            detection = self.detect(transcript_text)
+        if not detection.nature_codes:
+            raise RuntimeError("No nature codes detected in transcript")
+        with timer.stage('questions'):
+            nature_code, confidence = self.select_nature_codes(detection)[0]
+            primary_nature_code, all_questions = self.load_questions(detection, nature_code)
+        
+        yield "nature_code", {
+            "nature_code": primary_nature_code,
+            "confidence": confidence,
+            "question_count": len(all_questions)
+        }
+        
+        # Verbatim questions are known right away
+        fast_grades = {}
+        if self.fast_path:
+            with timer.stage('fast_path'):
+                fast_grades = self.pre_grade(transcript_text, all_questions, primary_nature_code)
+        with timer.stage('format'):
+            evidence = self.find_evidence(transcript_text, all_questions, detection, fast_grades) if show_evidence else {}
+        
+        def grade_event(q_id, code, source):
+            grade = {"question_id": q_id, **self.format_grade(code, all_questions[q_id], source)}
+            if show_evidence:
+                grade["evidence"] = evidence.get(q_id, [])
+            return grade
+        
+        for q_id, match in fast_grades.items():
+            yield "grade", grade_event(q_id, match["code"], "fast_path")
+        llm_questions = {q_id: text for q_id, text in all_questions.items() if q_id not in fast_grades}
+        
+        llm_stats = {}
+        retrieval_stats = {}
+        with timer.stage('retrieval') if self.retrieval else nullcontext():
+            groups = self.question_groups(transcript_text, llm_questions, primary_nature_code, detection, retrieval_stats)
+        group_stats = [llm_stats] if len(groups) == 1 else [{} for _ in groups]
+        
+        # Cached groups are sent right away, the rest are generated (concurrently if grouped)
+        streams = []
+        cache_keys = {}
+        cached_groups = 0
+        for index, (group, context) in enumerate(groups):
+            if self.is_long_transcript(context, group, primary_nature_code):
+                # Window grades are only final once every window is reduced (cached per window)
+                streams.append((index, self._window_grade_stream(context, group, primary_nature_code, group_stats[index])))
+                continue
+            cached = None
+            if self.cache is not None:
+                cache_keys[index] = self.grades_cache_key(context, group, primary_nature_code)
+                cached = self.cache.get('grades', cache_keys[index])
+            if cached is not None:
+                cached_groups += 1
+                del cache_keys[index]
+                streams.append((index, iter(cached.items())))
+            else:
+                streams.append((index, stream_grade_transcript(
+                    context, group, primary_nature_code,
+                    client=self.llm_client, stats=group_stats[index]
+                )))
+        
+        # The llm stage includes the time the consumer takes for each grade event
+        started = time.perf_counter()
+        ai_grades = {}
+        group_grades = [{} for _ in groups]
+        with timer.stage('llm'):
+            for index, q_id, code in self._merge_streams(streams):
+                if q_id not in groups[index][0] or q_id in ai_grades:
+                    continue
+                ai_grades[q_id] = code
+                group_grades[index][q_id] = code
+                yield "grade", grade_event(q_id, code, "llm")
+        
+        if not all(group_grades):
+            raise RuntimeError("AI grading failed - empty response from Ollama")
+        for stats in group_stats:
+            observe_llm_call(stats)
+        
+        for index, key in cache_keys.items():
+            self.cache.put('grades', key, group_grades[index])
+        
+        if len(groups) > 1:
+            llm_stats['wall_s'] = round(time.perf_counter() - started, 4)
+            llm_stats['groups'] = [{'questions': len(group), **stats} for (group, _), stats in zip(groups, group_stats)]
+        
+        if not groups:
+            grades_cache = 'skipped'
+        elif cached_groups == len(groups):
+            grades_cache = 'hit'
+        else:
+            grades_cache = 'miss' if cached_groups == 0 else 'partial'
+        
+        with timer.stage('format'):
+            formatted_grades = self.format_grades(ai_grades, all_questions, fast_grades)
+            if show_evidence:
+                for q_id, grade in formatted_grades.items():
+                    grade['evidence'] = evidence.get(q_id, [])
+        
+        yield "result", GradingResult(
+            grades=formatted_grades,
+            nature_code=primary_nature_code,
+            questions=all_questions,
+            detection=detection,
+            metadata={
+                'llm': llm_stats,
+                'cache': self.cache_metadata(detection, grades_cache),
+                **({'retrieval': retrieval_stats} if retrieval_stats else {}),
+                **({'fast_path': self.fast_path_metadata(all_questions, fast_grades)} if self.fast_path else {}),
+                **({'timings': timer.metadata()} if self.stage_timings else {})
+            }
+        )
+    
+    def _window_grade_stream(self, transcript_text: str, questions: Dict[str, str], nature_code: str,
+                             llm_stats: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+        """Reduced map-reduce grades of a long transcript as a (question_id, code) stream"""
+        grades, _ = self.ai_grade_windows(transcript_text, questions, nature_code, llm_stats)
+        yield from grades.items()
+    
+    @staticmethod
+    def _merge_streams(streams: List[Tuple[int, Iterator[Tuple[str, str]]]]) -> Iterator[Tuple[int, str, str]]:
+        """
+        Interleave several (question_id, code) streams in arrival order
+        
+        A single stream is consumed directly; several are each drained on their own
+        thread so their generations run concurrently.
+        
+        Yields:
+            (stream index, question_id, code)
+        """
+        if len(streams) == 1:
+            index, pairs = streams[0]
+            for q_id, code in pairs:
+                yield index, q_id, code
+            return
+        
+        arrivals = queue.Queue()
+        done = object()
+        
+        def drain(index, pairs):
+            try:
+                for q_id, code in pairs:
+                    arrivals.put((index, q_id, code))
+            except Exception as e:
+                arrivals.put(e)
+            finally:
+                arrivals.put(done)
+        
+        for index, pairs in streams:
+            threading.Thread(target=drain, args=(index, pairs), name='question-group-stream', daemon=True).start()
+        
+        remaining = len(streams)
+        while remaining:
+            item = arrivals.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    
+    def grade_batch(self, transcripts: List[Dict[str, Any]], show_evidence: bool = False,
+                    max_concurrency: int = 2, encode_batch_size: int = 128
+                    ) -> Iterator[Tuple[int, Optional[GradingResult], Optional[Exception]]]:
+        """
+        Grade many transcripts, pipelining the stages across the whole batch
+        
+        All transcripts are formatted first, nature code detection encodes the segments of
+        every transcript in shared model.encode batches, then the LLM stage runs with at
+        most max_concurrency generations in flight.
+        
+        Args:
+            transcripts: List of transcripts in Group B's JSON format
+            show_evidence: Attach the best-matching transcript segments to every grade
+            max_concurrency: Number of transcripts graded by the LLM at the same time
+            encode_batch_size: Batch size for the shared embedding batches
+        
+        Yields:
+            (index, result, error) per transcript in completion order; exactly one of
+            result and error is set
+        """
+        # Stage 1: format every transcript, bad ones are reported right away
+        formatted = []
+        timers = {}
+        for index, transcript_data in enumerate(transcripts):
+            timers[index] = StageTimer()
+            try:
+                with timers[index].stage('parse'):
+                    formatted.append((index, transcript_data, self.format_transcript(transcript_data)))
+            except Exception as e:
+                yield index, None, e
+        
+        if not formatted:
+            return
+        
+        # Stage 2: nature code detection with shared embedding batches
+        # (observed once; every transcript's timings show the whole batch)
+        started = time.perf_counter()
+        detections = self.detect_batch(
+            [transcript_text for _, _, transcript_text in formatted],
+            encode_batch_size=encode_batch_size
+        )
+        detection_s = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage='detection').observe(detection_s)
+        for index, _, _ in formatted:
+            timers[index].add('detection', detection_s, observe=False)
+        
+        def grade_one(transcript_data, transcript_text, detection, timer):
+            with track_grading('batch'):
+                return self.grade_detected(transcript_data, transcript_text, detection, show_evidence, timer)
+        
+        # Stage 3: questions + LLM grading with bounded concurrency
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='batch-grade') as pool:
+            futures = {
+                pool.submit(grade_one, transcript_data, transcript_text, detection, timers[index]): index
+                for (index, transcript_data, transcript_text), detection in zip(formatted, detections)
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
     
     def calculate_percentage(self, grades: Dict[str, Any], questions: Dict[str, str]) -> float:
         """
@@ -0,0 +1,252 @@
+"""
+Grading Cache Service
+Content-addressed SQLite cache for LLM grades and nature code detection results
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from api.services.metrics import record_cache_lookup
+
+# Default location (next to the other backend data, ignored by git)
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent.parent / "data" / "cache" / "grading_cache.sqlite3"
+
+
+def content_key(*parts: Any) -> str:
+    """
+    Build a cache key from everything that determines a cached value
+    
+    Args:
+        parts: JSON-serializable values (transcript text, questions, model name, ...)
+    
+    Returns:
+        sha256 hex digest
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GradingCache:
+    """
+    Persistent key/value cache backed by SQLite
+    
+    Values live in namespaces ("grades", "detection", ...). Entries older than
+    max_age seconds are dropped, and once more than max_entries are stored, or
+    their values take more than max_bytes, the least recently used ones are
+    evicted. Hit/miss counts are kept per namespace.
+    Cache errors are logged and treated as misses so grading never fails because
+    of the cache.
+    """
+    
+    # Run eviction every N writes instead of on every write
+    EVICT_EVERY = 50
+    
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries: int = 5000, max_age: float = 30 * 24 * 3600,
+                 max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache
+        
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of entries across all namespaces
+            max_age: Seconds an entry stays valid
+            max_bytes: Maximum total size of the stored values (serialized JSON); the
+                       database file doesn't shrink below its largest size, freed pages are reused
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes = 0
+        self._schema_ready = False
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, so forked workers reconnect)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.executescript('''
+                    CREATE TABLE IF NOT EXISTS cache (
+                        namespace   TEXT NOT NULL,
+                        key         TEXT NOT NULL,
+                        value       TEXT NOT NULL,
+                        created_at  REAL NOT NULL,
+                        last_access REAL NOT NULL,
+                        size        INTEGER,
+                        PRIMARY KEY (namespace, key)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache (last_access);
+                    CREATE INDEX IF NOT EXISTS idx_cache_created_at ON cache (created_at);
+                ''')
+                # Caches created before value sizes were recorded
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(cache)')}
+                if 'size' not in columns:
+                    try:
+                        with conn:
+                            conn.execute('ALTER TABLE cache ADD COLUMN size INTEGER')
+                            conn.execute('UPDATE cache SET size = length(CAST(value AS BLOB))')
+                    except sqlite3.OperationalError:
+                        pass  # Added by another process in the meantime
+                self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Look up a cached value
+        
+        Returns:
+            The cached value, or None on a miss (or expired entry)
+        """
+        value = None
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] <= self.max_age:
+                with conn:
+                    conn.execute(
+                        'UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?',
+                        (now, namespace, key)
+                    )
+                value = json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Grading cache read failed: {e}")
+        
+        self._count(namespace, 'hits' if value is not None else 'misses')
+        record_cache_lookup(namespace, value is not None)
+        return value
+    
+    def put(self, namespace: str, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        now = time.time()
+        try:
+            payload = json.dumps(value)
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (namespace, key, value, created_at, last_access, size) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (namespace, key, payload, now, now, len(payload.encode('utf-8')))
+                )
+            with self._stats_lock:
+                self._writes += 1
+                evict = self._writes % self.EVICT_EVERY == 0
+            if evict:
+                self.evict()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Grading cache write failed: {e}")
+    
+    def evict(self) -> int:
+        """
+        Drop expired entries, then the least recently used ones above max_entries,
+        then the least recently used ones until the values fit in max_bytes
+        
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connection()
+        with conn:
+            removed = conn.execute(
+                'DELETE FROM cache WHERE created_at < ?', (time.time() - self.max_age,)
+            ).rowcount
+            count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self.max_entries:
+                removed += conn.execute(
+                    'DELETE FROM cache WHERE rowid IN '
+                    '(SELECT rowid FROM cache ORDER BY last_access ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                ).rowcount
+            # Keep the most recently used entries whose sizes add up to at most max_bytes
+            removed += conn.execute(
+                'DELETE FROM cache WHERE rowid IN (SELECT rowid FROM ('
+                '    SELECT rowid, SUM(size) OVER (ORDER BY last_access DESC, rowid DESC) AS kept FROM cache'
+                ') WHERE kept > ?)',
+                (self.max_bytes,)
+            ).rowcount
+        return removed
+    
+    def clear(self):
+        """Remove every entry and reset the hit/miss counters"""
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache')
+        with self._stats_lock:
+            self._stats = {}
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counts and hit rate per namespace (since process start),
+        plus the number of stored entries and the total size of their values
+        """
+        with self._stats_lock:
+            namespaces = {
+                namespace: {
+                    **counts,
+                    'hit_rate': round(counts['hits'] / (counts['hits'] + counts['misses']), 4)
+                    if counts['hits'] + counts['misses'] else 0.0
+                }
+                for namespace, counts in self._stats.items()
+            }
+        try:
+            entries, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'max_age_s': self.max_age,
+            'namespaces': namespaces
+        }
+    
+    def _count(self, namespace: str, outcome: str):
+        with self._stats_lock:
+            counts = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+
+_cache: Optional[GradingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_grading_cache() -> Optional[GradingCache]:
+    """
+    Shared cache for this process, or None when caching is disabled
+    
+    Configured with EMS_CACHE_ENABLED (default 1), EMS_CACHE_PATH,
+    EMS_CACHE_MAX_ENTRIES (default 5000), EMS_CACHE_MAX_BYTES (default 512 MB)
+    and EMS_CACHE_MAX_AGE_S (default 30 days)
+    """
+    global _cache
+    if os.environ.get('EMS_CACHE_ENABLED', '1') != '1':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GradingCache(
+                    path=os.environ.get('EMS_CACHE_PATH', DEFAULT_CACHE_PATH),
+                    max_entries=int(os.environ.get('EMS_CACHE_MAX_ENTRIES', '5000')),
+                    max_bytes=int(os.environ.get('EMS_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+                    max_age=float(os.environ.get('EMS_CACHE_MAX_AGE_S', str(30 * 24 * 3600)))
+                )
+    return _cache
@@ -0,0 +1,351 @@
+"""
+Grading Job Queue Service
+Runs grading jobs on a bounded worker pool so HTTP requests don't wait on Ollama
+
+Job state lives in SQLite, so every worker process of a pre-forked server
+(gunicorn) can report the status of jobs that run in another worker
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Default location (next to the other backend data, ignored by git)
+DEFAULT_JOBS_PATH = Path(__file__).parent.parent.parent / "data" / "jobs" / "jobs.sqlite3"
+
+# Job fields stored as columns (result is stored as JSON)
+JOB_FIELDS = ('job_id', 'status', 'submitted_at', 'started_at', 'finished_at', 'http_status', 'result', 'callback_url')
+
+# Hosts a webhook callback may point at (callbacks stay on this machine)
+LOCAL_CALLBACK_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+
+def is_local_callback_url(url: str) -> bool:
+    """
+    Check that a webhook callback URL is http(s) and points at this machine
+
+    Args:
+        url: Callback URL supplied by the client
+
+    Returns:
+        True if the URL can be used as a callback
+    """
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and parsed.hostname in LOCAL_CALLBACK_HOSTS
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this PID still exists on this machine"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_token(pid: int) -> Optional[str]:
+    """
+    Identify one run of a process: the machine's boot ID plus the process start time,
+    so a PID handed out again (after a restart) doesn't match
+
+    Returns:
+        Token, or None if the process is gone or /proc isn't available
+    """
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            boot_id = f.read().strip()
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after the command name (which may contain spaces); start time is field 22
+    return f'{boot_id}:{stat.rsplit(")", 1)[1].split()[19]}'
+
+
+def worker_alive(pid: int, token: Optional[str]) -> bool:
+    """Whether the worker process that stored this PID and token is still running"""
+    if not process_alive(pid):
+        return False
+    return token is None or process_token(pid) == token
+
+
+class JobStore:
+    """
+    SQLite table of grading jobs, shared by every process that uses the same file
+
+    Each job records the PID and process token of the worker process running it; a
+    queued or running job whose worker has exited is reported as failed instead of
+    staying pending forever, also when its PID now belongs to another process.
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        """
+        Initialize the store
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, so forked workers reconnect)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript('''
+                        CREATE TABLE IF NOT EXISTS jobs (
+                            job_id        TEXT PRIMARY KEY,
+                            status        TEXT NOT NULL,
+                            submitted_at  REAL NOT NULL,
+                            started_at    REAL,
+                            finished_at   REAL,
+                            http_status   INTEGER,
+                            result        TEXT,
+                            callback_url  TEXT,
+                            worker_pid    INTEGER NOT NULL,
+                            worker_token  TEXT
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+                        CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+                    ''')
+                    # Job tables created before worker tokens were recorded
+                    columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+                    if 'worker_token' not in columns:
+                        try:
+                            conn.execute('ALTER TABLE jobs ADD COLUMN worker_token TEXT')
+                        except sqlite3.OperationalError:
+                            pass  # Added by another process in the meantime
+                    self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = {field: row[field] for field in JOB_FIELDS}
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def insert(self, job: Dict[str, Any], max_pending: int, finished_before: float):
+        """
+        Add a queued job, after dropping finished jobs older than finished_before
+
+        The pending count and the insert run in one write transaction, so the limit
+        holds across processes.
+
+        Raises:
+            QueueFullError: if max_pending jobs are already queued or running
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (finished_before,))
+            self._fail_orphans(conn)
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if pending >= max_pending:
+                raise QueueFullError(f'{pending} grading jobs already pending')
+            conn.execute(
+                'INSERT INTO jobs (job_id, status, submitted_at, callback_url, worker_pid, worker_token) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job['job_id'], job['status'], job['submitted_at'], job['callback_url'],
+                 os.getpid(), process_token(os.getpid()))
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def update(self, job_id: str, **fields):
+        """Set fields of a job (result is serialized to JSON)"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        assignments = ', '.join(f'{field} = ?' for field in fields if field in JOB_FIELDS)
+        values = [value for field, value in fields.items() if field in JOB_FIELDS]
+        self._connection().execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*values, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job, or None if unknown"""
+        conn = self._connection()
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row['status'] in ('queued', 'running') and not worker_alive(row['worker_pid'], row['worker_token']):
+            self._fail_orphans(conn)
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        counts = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0}
+        for row in self._connection().execute('SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status'):
+            counts[row['status']] = row['jobs']
+        return counts
+
+    def _fail_orphans(self, conn: sqlite3.Connection):
+        """Mark pending jobs whose worker process is gone as failed"""
+        rows = conn.execute(
+            "SELECT DISTINCT worker_pid, worker_token FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+        for row in rows:
+            if not worker_alive(row['worker_pid'], row['worker_token']):
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, http_status = 500, result = ? "
+                    "WHERE worker_pid = ? AND worker_token IS ? AND status IN ('queued', 'running')",
+                    (time.time(), json.dumps({'error': 'Grading failed: worker exited before the job finished'}),
+                     row['worker_pid'], row['worker_token'])
+                )
+
+
+class GradingJobQueue:
+    """
+    Bounded job queue for grading requests
+
+    Jobs run on a fixed-size thread pool in the process that accepted them; their
+    state is kept in a JobStore shared by all processes. Submitting fails fast with
+    QueueFullError once max_pending jobs are waiting or running (across processes),
+    and finished jobs are dropped after result_ttl seconds.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, result_ttl: float = 3600,
+                 store: Optional[JobStore] = None):
+        """
+        Initialize the job queue
+
+        Args:
+            max_workers: Number of grading jobs that run at the same time in this process
+            max_pending: Maximum number of queued + running jobs
+            result_ttl: Seconds a finished job's result is kept for polling
+            store: JobStore holding the job state (defaults to data/jobs/jobs.sqlite3)
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.store = store or JobStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='grading-job')
+
+    def submit(self, work: Callable[[], Tuple[Dict[str, Any], int]], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a grading job
+
+        Args:
+            work: Callable returning (response_body, http_status)
+            callback_url: Optional local URL that receives the finished job as a POST
+
+        Returns:
+            Snapshot of the new job
+
+        Raises:
+            QueueFullError: if max_pending jobs are already queued or running
+        """
+        job_id = uuid.uuid4().hex
+        self.store.insert(
+            {'job_id': job_id, 'status': 'queued', 'submitted_at': time.time(), 'callback_url': callback_url},
+            max_pending=self.max_pending,
+            finished_before=time.time() - self.result_ttl
+        )
+
+        self._executor.submit(self._run, job_id, work)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a job
+
+        Args:
+            job_id: ID returned by submit()
+
+        Returns:
+            Copy of the job (status, timestamps, result) or None if unknown/expired
+        """
+        return self.store.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        return self.store.stats()
+
+    def _run(self, job_id: str, work: Callable[[], Tuple[Dict[str, Any], int]]):
+        """Run one job on a worker thread and record its outcome"""
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            body, http_status = work()
+        except Exception as e:
+            body, http_status = {'error': f'Grading failed: {str(e)}'}, 500
+
+        self._update(
+            job_id,
+            status='completed' if http_status < 400 else 'failed',
+            finished_at=time.time(),
+            http_status=http_status,
+            result=body
+        )
+
+        job = self.get(job_id)
+        if job and job['callback_url']:
+            self._send_callback(job)
+
+    def _update(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+
+    @staticmethod
+    def _send_callback(job: Dict[str, Any]):
+        """POST the finished job to its callback URL, failures are only logged"""
+        payload = {key: value for key, value in job.items() if key != 'callback_url'}
+        request = urllib.request.Request(
+            job['callback_url'],
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        except Exception as e:
+            print(f"Job {job['job_id']}: callback to {job['callback_url']} failed: {e}")
+
+
+_job_queue: Optional[GradingJobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> GradingJobQueue:
+    """
+    Shared job queue for this process, created on first use
+
+    Configured with EMS_JOB_WORKERS (default 2), EMS_JOB_MAX_PENDING (default 32),
+    EMS_JOB_TTL_S (default 3600) and EMS_JOBS_PATH (job table shared by all workers)
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = GradingJobQueue(
+                    max_workers=int(os.environ.get('EMS_JOB_WORKERS', '2')),
+                    max_pending=int(os.environ.get('EMS_JOB_MAX_PENDING', '32')),
+                    result_ttl=float(os.environ.get('EMS_JOB_TTL_S', '3600')),
+                    store=JobStore(path=os.environ.get('EMS_JOBS_PATH', DEFAULT_JOBS_PATH))
+                )
+    return _job_queue
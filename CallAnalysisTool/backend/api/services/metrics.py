@@ -0,0 +1,178 @@
+"""
+Pipeline metrics (per-stage timings, gradings in flight, LLM and cache totals)
+Exported with prometheus_client for GET /api/metrics
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py sets it for more than one
+worker) every worker writes its values to files in that directory and a scrape
+adds up all workers. The variable must be set before prometheus_client is imported.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+import os
+import threading
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, disable_created_metrics, generate_latest
+)
+from prometheus_client import multiprocess
+
+import llm_client
+
+# Histogram buckets in seconds: sub-millisecond parsing up to multi-minute LLM generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# *_created series are not available in multiprocess mode, leave them out in both modes
+disable_created_metrics()
+
+# Metrics of this module (not prometheus_client's default registry with its process collectors)
+REGISTRY = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    'ems_grading_stage_seconds',
+    'Time spent in each grading stage (parse, detection, questions, fast_path, retrieval, llm, format)',
+    ['stage'], buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+STAGES_IN_FLIGHT = Gauge(
+    'ems_grading_stages_in_flight', 'Grading stages currently running', ['stage'],
+    registry=REGISTRY, multiprocess_mode='livesum'
+)
+GRADING_SECONDS = Histogram(
+    'ems_grading_seconds', 'End-to-end time to grade one transcript', ['mode'],
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+GRADINGS = Counter(
+    'ems_gradings', 'Transcripts graded, by mode (grade, stream, batch) and outcome', ['mode', 'outcome'],
+    registry=REGISTRY
+)
+GRADINGS_IN_FLIGHT = Gauge(
+    'ems_gradings_in_flight', 'Transcripts currently being graded', ['mode'],
+    registry=REGISTRY, multiprocess_mode='livesum'
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    'ems_llm_queue_wait_seconds', 'Time a generation waited for a free LLM slot',
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+LLM_GENERATION_SECONDS = Histogram(
+    'ems_llm_generation_seconds', 'Time Ollama spent on one generation',
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+LLM_CALLS = Counter('ems_llm_calls', 'Generations run by the LLM client', registry=REGISTRY)
+LLM_ERRORS = Counter('ems_llm_errors', 'Generations that failed', registry=REGISTRY)
+LLM_IN_FLIGHT = Gauge(
+    'ems_llm_in_flight', 'Generations currently running', registry=REGISTRY, multiprocess_mode='livesum'
+)
+LLM_WAITING = Gauge(
+    'ems_llm_waiting', 'Generations waiting for a free slot', registry=REGISTRY, multiprocess_mode='livesum'
+)
+CACHE_HITS = Counter('ems_cache_hits', 'Grading cache hits by namespace', ['namespace'], registry=REGISTRY)
+CACHE_MISSES = Counter('ems_cache_misses', 'Grading cache misses by namespace', ['namespace'], registry=REGISTRY)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared with the other worker processes (PROMETHEUS_MULTIPROC_DIR)"""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'))
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    All metrics in the Prometheus text format, summed over every worker in multiprocess mode
+
+    Returns:
+        Tuple of (body, content type)
+    """
+    registry = REGISTRY
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def stage_timings_enabled() -> bool:
+    """Whether per-stage timings are added to the response metadata (EMS_STAGE_TIMINGS=1)"""
+    return os.environ.get('EMS_STAGE_TIMINGS', '0') == '1'
+
+
+class StageTimer:
+    """
+    Per-stage time of one grading, also observed in ems_grading_stage_seconds
+
+    Every run of a stage is observed on its own. The metadata sums the runs per stage,
+    so stages that run concurrently (question groups, several nature codes, time
+    windows) can add up to more than the grading's wall time (total_s).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one run of the given stage"""
+        started = time.perf_counter()
+        with STAGES_IN_FLIGHT.labels(stage=name).track_inprogress():
+            try:
+                yield
+            finally:
+                self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float, observe: bool = True):
+        """Record a stage measured elsewhere (observe=False: metadata only, already observed)"""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if observe:
+            STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+    def metadata(self) -> Dict[str, float]:
+        """{"parse_s": ..., "detection_s": ..., "total_s": ...} for the response metadata"""
+        with self._lock:
+            timings = {f'{name}_s': round(seconds, 4) for name, seconds in self.stages.items()}
+        timings['total_s'] = round(time.perf_counter() - self.started, 4)
+        return timings
+
+
+@contextmanager
+def track_grading(mode: str) -> Iterator[None]:
+    """Count one grading as in flight, then record its duration and outcome"""
+    started = time.perf_counter()
+    outcome = 'error'
+    GRADINGS_IN_FLIGHT.labels(mode=mode).inc()
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        GRADINGS_IN_FLIGHT.labels(mode=mode).dec()
+        GRADINGS.labels(mode=mode, outcome=outcome).inc()
+        GRADING_SECONDS.labels(mode=mode).observe(time.perf_counter() - started)
+
+
+def observe_llm_call(stats: Optional[Dict[str, Any]]):
+    """Record one generation's queue wait and generation time (as filled in by LLMClient)"""
+    if not stats:
+        return
+    if 'queue_wait_s' in stats:
+        LLM_QUEUE_WAIT_SECONDS.observe(stats['queue_wait_s'])
+    if 'generation_s' in stats:
+        LLM_GENERATION_SECONDS.observe(stats['generation_s'])
+
+
+def record_llm_stats(changes: Dict[str, float]):
+    """Apply a change of an LLM client's counters (see llm_client.stats_listeners)"""
+    if changes.get('calls'):
+        LLM_CALLS.inc(changes['calls'])
+    if changes.get('errors'):
+        LLM_ERRORS.inc(changes['errors'])
+    if changes.get('in_flight'):
+        LLM_IN_FLIGHT.inc(changes['in_flight'])
+    if changes.get('waiting'):
+        LLM_WAITING.inc(changes['waiting'])
+
+
+def record_cache_lookup(namespace: str, hit: bool):
+    """Count one grading cache lookup"""
+    (CACHE_HITS if hit else CACHE_MISSES).labels(namespace=namespace).inc()
+
+
+llm_client.stats_listeners.append(record_llm_stats)
@@ -3,14 +3,21 @@ Question Loader Service
 Loads protocol questions from EMSQA.csv
 """
 
-import pandas as pd
 from pathlib import Path
 from typing import Dict
+import sys
+
+# Add parent backend directory to path for module imports
+backend_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_path))
+
+from question_catalog import get_catalog
 
 class QuestionLoader:
     """
     Loads EMS protocol questions from EMSQA.csv
     Questions are organized by Nature Code (e.g., Case Entry, Falls, Breathing Problems)
+    Backed by the shared QuestionCatalog, so the CSV is parsed once per process
     """
     
     def __init__(self, csv_path=None):
@@ -26,14 +33,13 @@ class QuestionLoader:
             csv_path = base_path / "data" / "EMSQA.csv"
         
         self.csv_path = Path(csv_path)
-        self.df = None
-        self._load_csv()
+        # The CSV itself is parsed on first use (or by warm-up), not at import time
+        self.catalog = get_catalog(self.csv_path)
     
     def _load_csv(self):
-        """Load the CSV file into a pandas DataFrame"""
+        """Make sure the shared catalog has loaded the CSV file (used for warm-up)"""
         try:
-            self.df = pd.read_csv(self.csv_path, encoding='utf-8')
-            print(f"Loaded {len(self.df)} questions from EMSQA.csv")
+            self.catalog.snapshot()
         except FileNotFoundError:
             raise FileNotFoundError(f"EMSQA.csv not found at: {self.csv_path}")
         except Exception as e:
@@ -48,20 +54,7 @@ class QuestionLoader:
             Dict mapping question_id to question_text
             Example: {"1": "What's the location of the emergency?", ...}
         """
-        # Filter for Case Entry (NC_ID = 0)
-        case_entry = self.df[self.df['NC_ID'] == 0]
-        
-        # Build question dictionary
-        questions = {}
-        for _, row in case_entry.iterrows():
-            q_id = str(row['Question_ID'])
-            q_text = str(row['Question_Text'])
-            
-            # Skip empty question IDs
-            if pd.isna(row['Question_ID']) or q_id == 'nan':
-                continue
-            
-            questions[q_id] = q_text
+        questions = self.catalog.case_entry_questions()
         
         print(f"Loaded {len(questions)} Case Entry questions")
         return questions
@@ -76,20 +69,7 @@ class QuestionLoader:
         Returns:
             Dict mapping question_id to question_text
         """
-        # Filter for the specific nature code
-        nature_questions = self.df[self.df['NatureCode'] == nature_code_name]
-        
-        # Build question dictionary
-        questions = {}
-        for _, row in nature_questions.iterrows():
-            q_id = str(row['Question_ID'])
-            q_text = str(row['Question_Text'])
-            
-            # Skip empty question IDs
-            if pd.isna(row['Question_ID']) or q_id == 'nan':
-                continue
-            
-            questions[q_id] = q_text
+        questions = self.catalog.questions_for(nature_code_name)
         
         print(f"Loaded {len(questions)} questions for {nature_code_name}")
         return questions
@@ -123,5 +103,4 @@ class QuestionLoader:
         Returns:
             List of nature code names
         """
-        return sorted(self.df['NatureCode'].unique().tolist())
-
+        return self.catalog.nature_codes()
@@ -0,0 +1,430 @@
+"""
+Results Store Service
+Persists every grading response in SQLite so records can be re-opened without re-grading
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Add parent backend directory to path for module imports
+backend_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_path))
+
+# Same code semantics as calculate_final_grade
+from AIGrader import EXCLUDED_CODES, is_missed
+
+# Default location (next to the other backend data, ignored by git)
+DEFAULT_RESULTS_PATH = Path(__file__).parent.parent.parent / "data" / "results" / "results.sqlite3"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+
+
+def encode_cursor(created_at: float, result_id: str) -> str:
+    """Opaque keyset cursor for the row (created_at, id)"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, result_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """
+    Decode a cursor returned by encode_cursor()
+
+    Raises:
+        InvalidCursorError: if the cursor is malformed
+    """
+    try:
+        created_at, result_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(created_at), str(result_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from e
+
+
+def result_day(created_at: float) -> str:
+    """UTC date (YYYY-MM-DD) a result is counted under in the daily rollup"""
+    return datetime.fromtimestamp(created_at, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def question_sections(response: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    """
+    Split a grading response into (nature_code, grades) sections for the question rollup
+    Case Entry questions are counted under "Case Entry", nature code questions under their code
+    """
+    grades = response.get('grades') or {}
+    yield 'Case Entry', {q_id: g for q_id, g in grades.items() if q_id.startswith('CE_')}
+
+    breakdown = response.get('nature_codes')
+    if breakdown:
+        for entry in breakdown:
+            yield entry['nature_code'], entry.get('grades') or {}
+    else:
+        yield response.get('detected_nature_code'), {q_id: g for q_id, g in grades.items() if not q_id.startswith('CE_')}
+
+
+class ResultsStore:
+    """
+    Embedded store for grading results
+
+    The full response is kept as JSON; result ID, filename, detected nature code,
+    grade percentage and creation time are columns with indexes so lookups and
+    filtered, keyset-paginated listings never scan the whole table.
+
+    QA analytics come from rollup tables that are updated in the same transaction
+    as each saved result, so analytics queries never scan the stored results.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        """
+        Initialize the store
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, so forked workers reconnect)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        """Create the results table, the analytics rollup tables and their indexes"""
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS results (
+                id               TEXT PRIMARY KEY,
+                created_at       REAL NOT NULL,
+                filename         TEXT,
+                nature_code      TEXT,
+                grade_percentage REAL,
+                body             TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_results_filename ON results (filename, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_results_nature_code ON results (nature_code, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_results_grade ON results (grade_percentage);
+
+            -- Results and grade totals per detected nature code
+            CREATE TABLE IF NOT EXISTS rollup_nature_code (
+                nature_code       TEXT PRIMARY KEY,
+                results           INTEGER NOT NULL,
+                grade_sum         REAL NOT NULL,
+                graded_questions  INTEGER NOT NULL,
+                missed_questions  INTEGER NOT NULL
+            );
+
+            -- Per question: how often it was graded (5/RC excluded) and missed (2/3)
+            CREATE TABLE IF NOT EXISTS rollup_question (
+                nature_code  TEXT NOT NULL,
+                question_id  TEXT NOT NULL,
+                label        TEXT,
+                graded       INTEGER NOT NULL,
+                missed       INTEGER NOT NULL,
+                PRIMARY KEY (nature_code, question_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_rollup_question_missed ON rollup_question (nature_code, missed);
+
+            -- Results and grade totals per UTC day and nature code
+            CREATE TABLE IF NOT EXISTS rollup_daily (
+                day          TEXT NOT NULL,
+                nature_code  TEXT NOT NULL,
+                results      INTEGER NOT NULL,
+                grade_sum    REAL NOT NULL,
+                PRIMARY KEY (day, nature_code)
+            );
+        ''')
+
+        # Results stored before the rollups existed are counted once
+        has_results = conn.execute('SELECT 1 FROM results LIMIT 1').fetchone()
+        has_rollups = conn.execute('SELECT 1 FROM rollup_nature_code LIMIT 1').fetchone()
+        if has_results and not has_rollups:
+            self._rebuild_rollups(conn)
+
+    def _update_rollups(self, conn: sqlite3.Connection, response: Dict[str, Any], created_at: float):
+        """Add one result to the rollup tables (caller holds the transaction)"""
+        nature_code = response.get('detected_nature_code') or 'Unknown'
+        percentage = response.get('grade_percentage') or 0.0
+
+        graded_total = 0
+        missed_total = 0
+        question_rows = []
+        for section_code, grades in question_sections(response):
+            for q_id, grade in grades.items():
+                code = grade.get('code', '2')
+                if code in EXCLUDED_CODES:
+                    continue
+                missed = 1 if is_missed(code) else 0
+                # The per-code totals cover the questions behind grade_percentage (Case Entry + primary code)
+                if section_code in ('Case Entry', response.get('detected_nature_code')):
+                    graded_total += 1
+                    missed_total += missed
+                question_rows.append((section_code or 'Unknown', q_id, grade.get('label'), missed))
+
+        conn.execute(
+            'INSERT INTO rollup_nature_code (nature_code, results, grade_sum, graded_questions, missed_questions) '
+            'VALUES (?, 1, ?, ?, ?) '
+            'ON CONFLICT (nature_code) DO UPDATE SET results = results + 1, grade_sum = grade_sum + excluded.grade_sum, '
+            'graded_questions = graded_questions + excluded.graded_questions, '
+            'missed_questions = missed_questions + excluded.missed_questions',
+            (nature_code, percentage, graded_total, missed_total)
+        )
+        conn.executemany(
+            'INSERT INTO rollup_question (nature_code, question_id, label, graded, missed) VALUES (?, ?, ?, 1, ?) '
+            'ON CONFLICT (nature_code, question_id) DO UPDATE SET graded = graded + 1, '
+            'missed = missed + excluded.missed, label = excluded.label',
+            question_rows
+        )
+        conn.execute(
+            'INSERT INTO rollup_daily (day, nature_code, results, grade_sum) VALUES (?, ?, 1, ?) '
+            'ON CONFLICT (day, nature_code) DO UPDATE SET results = results + 1, grade_sum = grade_sum + excluded.grade_sum',
+            (result_day(created_at), nature_code, percentage)
+        )
+
+    def _rebuild_rollups(self, conn: sqlite3.Connection):
+        """Recompute every rollup from the stored results (one full scan)"""
+        with conn:
+            conn.execute('DELETE FROM rollup_nature_code')
+            conn.execute('DELETE FROM rollup_question')
+            conn.execute('DELETE FROM rollup_daily')
+            for row in conn.execute('SELECT created_at, body FROM results ORDER BY created_at').fetchall():
+                self._update_rollups(conn, json.loads(row['body']), row['created_at'])
+
+    def save(self, response: Dict[str, Any]) -> str:
+        """
+        Store a grading response
+
+        Args:
+            response: Body returned by the grading endpoints
+
+        Returns:
+            The new result ID (also set as response['result_id'])
+        """
+        result_id = uuid.uuid4().hex
+        response['result_id'] = result_id
+        created_at = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT INTO results (id, created_at, filename, nature_code, grade_percentage, body) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    result_id,
+                    created_at,
+                    response.get('filename'),
+                    response.get('detected_nature_code'),
+                    response.get('grade_percentage'),
+                    json.dumps(response)
+                )
+            )
+            self._update_rollups(conn, response, created_at)
+        return result_id
+
+    def get(self, result_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored result
+
+        Returns:
+            The stored response, or None if the ID is unknown
+        """
+        row = self._connection().execute('SELECT body FROM results WHERE id = ?', (result_id,)).fetchone()
+        return json.loads(row['body']) if row else None
+
+    def list(self, limit: int = 20, cursor: Optional[str] = None, nature_code: Optional[str] = None,
+             filename: Optional[str] = None, min_grade: Optional[float] = None,
+             max_grade: Optional[float] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Dict[str, Any]:
+        """
+        List stored results, newest first, with keyset pagination
+
+        Args:
+            limit: Page size
+            cursor: next_cursor from the previous page
+            nature_code: Only results with this detected nature code
+            filename: Only results for this uploaded file name
+            min_grade / max_grade: Grade percentage range (inclusive)
+            since / until: Creation time range (unix seconds, inclusive)
+
+        Returns:
+            Dict with 'results' (summaries without grades) and 'next_cursor' (None on the last page)
+
+        Raises:
+            InvalidCursorError: if the cursor is malformed
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, operator, value in (
+            ('nature_code', '=', nature_code),
+            ('filename', '=', filename),
+            ('grade_percentage', '>=', min_grade),
+            ('grade_percentage', '<=', max_grade),
+            ('created_at', '>=', since),
+            ('created_at', '<=', until),
+        ):
+            if value is not None:
+                clauses.append(f'{column} {operator} ?')
+                params.append(value)
+
+        if cursor:
+            created_at, result_id = decode_cursor(cursor)
+            clauses.append('(created_at < ? OR (created_at = ? AND id < ?))')
+            params.extend([created_at, created_at, result_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'SELECT id, created_at, filename, nature_code, grade_percentage FROM results {where} '
+            'ORDER BY created_at DESC, id DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1]['created_at'], page[-1]['id']) if len(rows) > limit else None
+        return {
+            'results': [
+                {
+                    'result_id': row['id'],
+                    'created_at': row['created_at'],
+                    'filename': row['filename'],
+                    'detected_nature_code': row['nature_code'],
+                    'grade_percentage': row['grade_percentage']
+                }
+                for row in page
+            ],
+            'next_cursor': next_cursor
+        }
+
+    def nature_code_stats(self) -> List[Dict[str, Any]]:
+        """
+        Per detected nature code: number of results, average grade and question miss rate
+
+        Returns:
+            List sorted by number of results (most first)
+        """
+        rows = self._connection().execute(
+            'SELECT nature_code, results, grade_sum, graded_questions, missed_questions '
+            'FROM rollup_nature_code ORDER BY results DESC, nature_code'
+        ).fetchall()
+        return [
+            {
+                'nature_code': row['nature_code'],
+                'results': row['results'],
+                'average_grade': round(row['grade_sum'] / row['results'], 1) if row['results'] else 0.0,
+                'graded_questions': row['graded_questions'],
+                'missed_questions': row['missed_questions'],
+                'miss_rate': round(row['missed_questions'] / row['graded_questions'], 4) if row['graded_questions'] else 0.0
+            }
+            for row in rows
+        ]
+
+    def question_stats(self, nature_code: Optional[str] = None, limit: int = 50,
+                       min_graded: int = 1) -> List[Dict[str, Any]]:
+        """
+        Per question miss rates (codes 2/3 out of graded questions, 5/RC excluded)
+
+        Args:
+            nature_code: Only questions of this nature code ("Case Entry" for CE_ questions)
+            limit: Maximum number of questions
+            min_graded: Ignore questions graded fewer times than this
+
+        Returns:
+            List sorted by miss rate, then number of misses (most missed first)
+        """
+        clauses = ['graded >= ?']
+        params: List[Any] = [min_graded]
+        if nature_code is not None:
+            clauses.append('nature_code = ?')
+            params.append(nature_code)
+
+        rows = self._connection().execute(
+            'SELECT nature_code, question_id, label, graded, missed, CAST(missed AS REAL) / graded AS miss_rate '
+            f"FROM rollup_question WHERE {' AND '.join(clauses)} "
+            'ORDER BY miss_rate DESC, missed DESC, question_id LIMIT ?',
+            params + [limit]
+        ).fetchall()
+        return [
+            {
+                'nature_code': row['nature_code'],
+                'question_id': row['question_id'],
+                'label': row['label'],
+                'graded': row['graded'],
+                'missed': row['missed'],
+                'miss_rate': round(row['miss_rate'], 4)
+            }
+            for row in rows
+        ]
+
+    def grade_trend(self, nature_code: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Average grade percentage per UTC day
+
+        Args:
+            nature_code: Only results with this detected nature code
+            since / until: Day range, YYYY-MM-DD (inclusive)
+
+        Returns:
+            List of {"day", "results", "average_grade"} in date order
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, operator, value in (('nature_code', '=', nature_code), ('day', '>=', since), ('day', '<=', until)):
+            if value is not None:
+                clauses.append(f'{column} {operator} ?')
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        rows = self._connection().execute(
+            f'SELECT day, SUM(results) AS results, SUM(grade_sum) AS grade_sum FROM rollup_daily {where} '
+            'GROUP BY day ORDER BY day',
+            params
+        ).fetchall()
+        return [
+            {
+                'day': row['day'],
+                'results': row['results'],
+                'average_grade': round(row['grade_sum'] / row['results'], 1) if row['results'] else 0.0
+            }
+            for row in rows
+        ]
+
+
+_store: Optional[ResultsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_results_store() -> Optional[ResultsStore]:
+    """
+    Shared results store for this process, or None when storing is disabled
+
+    Configured with EMS_RESULTS_ENABLED (default 1) and EMS_RESULTS_PATH
+    """
+    global _store
+    if os.environ.get('EMS_RESULTS_ENABLED', '1') != '1':
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultsStore(path=os.environ.get('EMS_RESULTS_PATH', DEFAULT_RESULTS_PATH))
+    return _store
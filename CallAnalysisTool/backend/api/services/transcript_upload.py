@@ -0,0 +1,238 @@
+"""
+Streaming parser for uploaded transcript files
+
+Uploads are parsed straight from the request stream with an incremental JSON parser
+(ijson): no temp file and no json.load of the whole document. Segments are built one
+at a time, with only the fields the transcript formatter uses, and go straight into
+the formatter; word-level timings and other per-segment extras never get loaded.
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import ijson
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+# Add parent backend directory to path for module imports
+backend_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_path))
+
+from JSONTranscriptionParser import segments_to_text
+
+# Segment fields used by JSONTranscriptionParser.format_segment
+SEGMENT_FIELDS = ('start', 'end', 'speaker', 'text')
+
+# ijson prefix of a field inside a segment
+SEGMENT_PREFIX = 'segments.item.'
+
+# ijson events for JSON scalars
+SCALAR_EVENTS = ('string', 'number', 'boolean', 'null')
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 20000
+
+# Bytes read from the request per chunk
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds EMS_UPLOAD_MAX_BYTES or EMS_UPLOAD_MAX_SEGMENTS"""
+
+
+class InvalidUploadError(ValueError):
+    """Raised when an upload isn't a readable transcript (bad multipart body or JSON)"""
+
+
+def upload_limits() -> Tuple[int, int]:
+    """
+    Upload limits from the environment
+
+    Returns:
+        Tuple of (max_bytes, max_segments), EMS_UPLOAD_MAX_BYTES (default 50 MB)
+        and EMS_UPLOAD_MAX_SEGMENTS (default 20000)
+    """
+    max_bytes = int(os.environ.get('EMS_UPLOAD_MAX_BYTES', str(DEFAULT_MAX_BYTES)))
+    max_segments = int(os.environ.get('EMS_UPLOAD_MAX_SEGMENTS', str(DEFAULT_MAX_SEGMENTS)))
+    return max_bytes, max_segments
+
+
+class LimitedReader:
+    """
+    File-like wrapper that fails as soon as more than max_bytes have been read
+    (covers chunked uploads that have no Content-Length to check up front)
+    """
+
+    def __init__(self, stream, max_bytes: int):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def read(self, size: int = CHUNK_SIZE) -> bytes:
+        # ijson probes with read(0); werkzeug's request stream reads an empty chunk as a disconnect
+        if size == 0:
+            return b''
+        try:
+            chunk = self.stream.read(size)
+        except ClientDisconnected:
+            raise InvalidUploadError('Upload ended before the whole file was received')
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_bytes:
+            raise UploadTooLargeError(f'Upload is larger than {self.max_bytes} bytes')
+        return chunk
+
+
+class MultipartFileReader:
+    """
+    File-like reader over one file field of a multipart/form-data body
+
+    The body is decoded as it is read (werkzeug's sans-IO MultipartDecoder), so the
+    file's bytes go straight to the caller instead of being spooled to a temp file
+    the way request.files does.
+    """
+
+    def __init__(self, stream, boundary: bytes, field_name: str = 'file'):
+        self.stream = stream
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self._decoder = MultipartDecoder(boundary)
+        self._buffer = b''
+        self._in_file = False
+        self._file_done = False
+        self._body_done = False
+
+    def open(self) -> Optional[str]:
+        """
+        Skip ahead to the file field
+
+        Returns:
+            The file's name, or None if the body has no such field
+        """
+        while self.filename is None and not self._body_done:
+            self._handle(self._next_event())
+        return self.filename
+
+    def read(self, size: int = CHUNK_SIZE) -> bytes:
+        while len(self._buffer) < size and self._in_file and not self._file_done:
+            self._handle(self._next_event())
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    def _next_event(self):
+        event = self._decoder.next_event()
+        while isinstance(event, NeedData):
+            chunk = self.stream.read(CHUNK_SIZE)
+            self._decoder.receive_data(chunk or None)
+            try:
+                event = self._decoder.next_event()
+            except ValueError as e:
+                raise InvalidUploadError(f'Invalid multipart body: {e}')
+        return event
+
+    def _handle(self, event) -> None:
+        if isinstance(event, File) and event.name == self.field_name and self.filename is None:
+            self.filename = event.filename
+            self._in_file = True
+        elif isinstance(event, Data):
+            if self._in_file:
+                self._buffer += event.data
+                if not event.more_data:
+                    self._in_file = False
+                    self._file_done = True
+        elif isinstance(event, Epilogue):
+            self._body_done = True
+
+
+class TranscriptStreamParser:
+    """
+    Incremental parser for Group B's transcript format
+
+    segments() yields slim segment dicts ({start, end, speaker, text}) one at a time
+    while the stream is read, to_text() feeds them straight into the formatter;
+    top-level scalars such as "language" are collected in .fields along the way.
+    """
+
+    def __init__(self, stream, max_segments: int = DEFAULT_MAX_SEGMENTS):
+        self.stream = stream
+        self.max_segments = max_segments
+        self.fields: Dict[str, Any] = {}
+        self.has_segments = False
+        self.segment_count = 0
+
+    def segments(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the transcript's segments as they are parsed
+
+        Raises:
+            InvalidUploadError: if the stream isn't a JSON object
+            UploadTooLargeError: on the segment after the first max_segments
+        """
+        segment = None
+        try:
+            for prefix, event, value in ijson.parse(self.stream, use_float=True):
+                if prefix == 'segments.item':
+                    if event == 'start_map':
+                        segment = {}
+                    elif event == 'end_map':
+                        self.segment_count += 1
+                        if self.segment_count > self.max_segments:
+                            raise UploadTooLargeError(f'Transcript has more than {self.max_segments} segments')
+                        yield segment
+                        segment = None
+                elif prefix.startswith(SEGMENT_PREFIX):
+                    # Only the formatter's fields; nested extras (word timings...) are skipped
+                    field = prefix[len(SEGMENT_PREFIX):]
+                    if segment is not None and field in SEGMENT_FIELDS and event in SCALAR_EVENTS:
+                        segment[field] = value
+                elif prefix == 'segments':
+                    self.has_segments = self.has_segments or event == 'start_array'
+                elif prefix == '' and event not in ('start_map', 'end_map', 'map_key'):
+                    raise InvalidUploadError('Transcript must be a JSON object')
+                elif '.' not in prefix and prefix and event in SCALAR_EVENTS:
+                    self.fields[prefix] = value
+        except ijson.JSONError as e:
+            raise InvalidUploadError(f'Invalid JSON: {e}')
+
+    def to_text(self) -> str:
+        """
+        Parse the whole stream, formatting every segment as soon as it is parsed
+        (only the formatted text is kept, no list of segments)
+
+        Returns:
+            Transcript text (JSONTranscriptionParser format); afterwards .fields,
+            .has_segments and .segment_count describe the upload
+        """
+        return segments_to_text(self.segments())
+
+
+def open_transcript_upload(request, max_bytes: int) -> Tuple[Optional[str], Any]:
+    """
+    Open an uploaded transcript from a Flask request without touching request.files
+
+    Accepts multipart/form-data with a 'file' field, or the JSON file as the raw
+    request body (?filename=... names it). Nothing past the file field's headers is
+    read yet.
+
+    Returns:
+        Tuple of (filename, file-like stream of the JSON document); filename is None
+        if a multipart body has no 'file' field
+
+    Raises:
+        UploadTooLargeError: if Content-Length is over max_bytes (the stream raises it
+            too once more than max_bytes have been read)
+        InvalidUploadError: if the multipart body can't be decoded
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise UploadTooLargeError(f'Upload is larger than {max_bytes} bytes')
+
+    stream = LimitedReader(request.stream, max_bytes)
+    if request.mimetype != 'multipart/form-data':
+        return request.args.get('filename', ''), stream
+
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        raise InvalidUploadError('Missing multipart boundary')
+    reader = MultipartFileReader(stream, boundary.encode('latin-1'))
+    return reader.open(), reader
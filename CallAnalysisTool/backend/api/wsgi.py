@@ -0,0 +1,22 @@
+"""
+WSGI entry point for production serving (multi-worker, pre-fork)
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py api.wsgi:app
+
+With preload (the default in gunicorn.conf.py) this module is imported once in the
+parent process, so the embedding model, keyword index and question catalog are
+loaded before the workers are forked and shared with them copy-on-write.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path so imports work
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from api.app import create_app
+
+# Warm-up follows EMS_WARMUP (gunicorn.conf.py turns it on when preloading)
+app = create_app()
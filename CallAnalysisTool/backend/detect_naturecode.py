@@ -2,30 +2,189 @@
 # Detects NatureCodes using keyword matching and text embeddings
 # CS4273 Group G 
 
-import pandas as pd
+import numpy as np
 import json
 import re
+import hashlib
+import threading
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from datetime import datetime
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
 import argparse
 import os
 
-# Step 0: Load the EMS protocol questions
-df = pd.read_csv("data/EMSQA.csv")  # This has all our protocol questions
+import embedding_sidecar
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+KEYWORDS_PATH = os.path.join(BACKEND_DIR, "nature_keywords.json")
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Keyword embeddings are saved here so restarts don't have to re-encode them
+EMBEDDING_CACHE_DIR = os.path.join(BACKEND_DIR, "data", "embedding_cache")
 
 # Step 1: Load NatureCode keywords
-with open("nature_keywords.json") as f:
+with open(KEYWORDS_PATH) as f:
     NATURE_KEYWORDS = json.load(f)
 
-# Step 2: Organize protocol questions by NatureCode 
-protocol_questions = defaultdict(list)
-for _, row in df.iterrows():
-    protocol_questions[row["NatureCode"]].append((row["Question_ID"], row["Question_Text"]))
+# Step 2: Embedding model
+# Loaded on first use (or by warm_up()) so importing this module stays cheap
+_model = None
+_model_lock = threading.Lock()
+
+# Function for getting the selected embedding backend
+
+# Input: none
+# Output: "torch" (SentenceTransformer, default) or "onnx" (int8 ONNX export, see onnx_embedder.py)
+def embedding_backend():
+    backend = os.environ.get("EMS_EMBEDDING_BACKEND", "torch").lower()
+    if backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown EMS_EMBEDDING_BACKEND '{backend}' (expected 'torch' or 'onnx')")
+    return backend
+
+# Function for getting the embedding model, loading it on first use
+
+# Input: none
+# Output: the shared SentenceTransformer (or OnnxEmbedder with EMS_EMBEDDING_BACKEND=onnx)
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if embedding_backend() == "onnx":
+                    from onnx_embedder import OnnxEmbedder, DEFAULT_MODEL_DIR
+                    _model = OnnxEmbedder(
+                        os.environ.get("EMS_ONNX_MODEL_DIR") or DEFAULT_MODEL_DIR,
+                        quantized=os.environ.get("EMS_ONNX_QUANTIZED", "1") == "1",
+                        threads=int(os.environ.get("EMS_ONNX_THREADS", "0")) or None
+                    )
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+# Function for checking whether the embedding model is loaded yet
+
+# Input: none
+# Output: True once get_model() has loaded the model (always True with an embedding sidecar)
+def model_loaded():
+    return _model is not None or embedding_sidecar.get_client() is not None
+
+# Function for encoding text with the embedding model in this process
+
+# Input: a string or list of strings, optional encode batch size
+# Output: normalized numpy embedding(s)
+def local_encode(texts, batch_size=32):
+    return get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+# Function for encoding text, in the embedding sidecar if EMS_EMBEDDING_SOCKET is set
+
+# Input: a string or list of strings, optional encode batch size
+# Output: normalized numpy embedding(s)
+def encode(texts, batch_size=32):
+    client = embedding_sidecar.get_client()
+    if client is not None:
+        return client.encode(texts, batch_size=batch_size)
+    return local_encode(texts, batch_size=batch_size)
+
+# Step 3: Keyword embedding cache
+# The keyword embeddings only change when nature_keywords.json or the model changes,
+# so they are computed once, kept in memory and saved to disk keyed by both
+_keyword_lock = threading.Lock()
+_keyword_state = {"stat": None, "key": None, "names": None, "embeddings": None, "matcher": None}
+
+# Function for building the cache key of the keyword embeddings
+
+# Input: raw bytes of nature_keywords.json
+# Output: hex digest of the file contents plus the model name and backend
+def _keyword_cache_key(keyword_bytes):
+    digest = hashlib.sha256(keyword_bytes)
+    digest.update(MODEL_NAME.encode("utf-8"))
+    if embedding_backend() == "onnx":
+        # Quantized embeddings differ slightly, they get their own cache entries
+        digest.update(f"onnx:{os.environ.get('EMS_ONNX_QUANTIZED', '1')}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+# Function for loading keyword embeddings from disk, or encoding and saving them
+
+# Input: cache key, nature code names, keyword lists
+# Output: normalized embedding matrix (one row per nature code)
+def _load_or_encode_keyword_embeddings(cache_key, nature_names, keywords):
+    cache_path = os.path.join(EMBEDDING_CACHE_DIR, f"nature_embeddings_{cache_key}.npz")
+    try:
+        with np.load(cache_path) as cached:
+            if list(cached["names"]) == nature_names:
+                return cached["embeddings"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    nature_texts = [" ".join(keywords[n]) for n in nature_names]
+    embeddings = encode(nature_texts)
+
+    # Write to a temp file first so a concurrent reader never sees a partial cache
+    try:
+        os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, names=np.array(nature_names), embeddings=embeddings)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not save keyword embedding cache: {e}")
+    return embeddings
 
-# Step 3: Load embedding model 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Function for reloading NatureCode keywords when nature_keywords.json changes
+
+# Input: none
+# Output: current keyword state (names, embeddings, matcher)
+def _refresh_keywords():
+    global NATURE_KEYWORDS
+    stat = os.stat(KEYWORDS_PATH)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    if _keyword_state["stat"] == stat_key:
+        return _keyword_state
+
+    with _keyword_lock:
+        if _keyword_state["stat"] == stat_key:
+            return _keyword_state
+
+        with open(KEYWORDS_PATH, "rb") as f:
+            keyword_bytes = f.read()
+        cache_key = _keyword_cache_key(keyword_bytes)
+
+        if cache_key != _keyword_state["key"]:
+            keywords = json.loads(keyword_bytes)
+            nature_names = list(keywords.keys())
+            embeddings = _load_or_encode_keyword_embeddings(cache_key, nature_names, keywords)
+            NATURE_KEYWORDS = keywords
+            _keyword_state.update(
+                key=cache_key,
+                names=nature_names,
+                embeddings=embeddings,
+                matcher=KeywordMatcher(keywords),
+            )
+
+        _keyword_state["stat"] = stat_key
+        return _keyword_state
+
+# Function for getting the NatureCode keyword embeddings
+
+# Input: none
+# Output: (list of nature code names, embedding matrix), rebuilt if nature_keywords.json changed
+def get_nature_embeddings():
+    state = _refresh_keywords()
+    return state["names"], state["embeddings"]
+
+# Function for getting the version of the detection inputs
+
+# Input: none
+# Output: hash of nature_keywords.json plus the model name (changes when detection would)
+def keyword_version():
+    return _refresh_keywords()["key"]
+
+# Function for getting the compiled keyword matcher
+
+# Input: none
+# Output: KeywordMatcher for the current nature_keywords.json
+def get_keyword_matcher():
+    return _refresh_keywords()["matcher"]
 
 # Step 4: Detection setup 
 # Words that are super common and might trigger false positives
@@ -43,41 +202,184 @@ HIGH_PRIORITY_CODES = {
     "Cardiac or Respiratory Arrest / Death"
 }
 
-def run_detection(transcript_path, transcript_text, output_folder="keywordsOutput"):
-    # Split transcript into individual lines/segments
-    segment_texts = [line.strip() for line in transcript_text.split("\n") if line.strip()]
+# Keywords that are plain words separated by single spaces can be looked up by their first word
+PLAIN_KEYWORD_RE = re.compile(r"\w+(?: \w+)*")
+WORD_RE = re.compile(r"\w+")
+WORD_CHAR_RE = re.compile(r"\w")
+
+class KeywordMatcher:
+    """
+    Precompiled matcher for every NatureCode keyword.
+    Scans a segment once and returns the keyword hits per nature code, with the
+    same word-boundary and COMMON_WORDS rules as a per-keyword re.search.
+    """
+
+    def __init__(self, nature_keywords):
+        # first word -> list of (keyword, nature codes it counts for)
+        self._by_first_word = defaultdict(list)
+        # keywords that can't be split into words fall back to their own regex
+        self._fallback = []
+
+        natures_for_keyword = defaultdict(list)
+        for nature, keywords in nature_keywords.items():
+            for kw in keywords:
+                kw_low = kw.lower()
+                if kw_low in COMMON_WORDS and nature != "Sick Person (Specific Diagnosis)":
+                    continue
+                if nature not in natures_for_keyword[kw_low]:
+                    natures_for_keyword[kw_low].append(nature)
+
+        for kw_low, natures in natures_for_keyword.items():
+            if PLAIN_KEYWORD_RE.fullmatch(kw_low):
+                first_word = kw_low.split(" ", 1)[0]
+                self._by_first_word[first_word].append((kw_low, natures))
+            else:
+                pattern = re.compile(rf"\b{re.escape(kw_low)}\b")
+                self._fallback.append((pattern, kw_low, natures))
+
+    def match(self, segment_lower):
+        """
+        Find keyword hits in one lowercased segment
+
+        Returns:
+            Dict mapping nature code to the set of keywords found
+        """
+        hits = defaultdict(set)
+        for word in WORD_RE.finditer(segment_lower):
+            candidates = self._by_first_word.get(word.group())
+            if not candidates:
+                continue
+            start = word.start()
+            for kw_low, natures in candidates:
+                end = start + len(kw_low)
+                if end != word.end():
+                    # Multi-word keyword: rest must follow verbatim and end on a word boundary
+                    if not segment_lower.startswith(kw_low, start):
+                        continue
+                    if end < len(segment_lower) and WORD_CHAR_RE.match(segment_lower, end):
+                        continue
+                for nature in natures:
+                    hits[nature].add(kw_low)
+
+        for pattern, kw_low, natures in self._fallback:
+            if pattern.search(segment_lower):
+                for nature in natures:
+                    hits[nature].add(kw_low)
+        return hits
+
+@dataclass
+class NatureCodeMatch:
+    """
+    A triggered NatureCode with the evidence behind it
+    """
+    name: str
+    confidence: float
+    keywords: List[str]
+    similarity: float
+
+@dataclass
+class DetectionResult:
+    """
+    Result of nature code detection, triggered codes sorted by confidence (highest first)
+    """
+    nature_codes: List[NatureCodeMatch]
+    segment_texts: List[str] = field(default_factory=list, repr=False)
+    segment_embeddings: Optional[np.ndarray] = field(default=None, repr=False)
+    from_cache: bool = field(default=False, repr=False)
+
+    @property
+    def primary(self):
+        return self.nature_codes[0] if self.nature_codes else None
+
+    def as_tuples(self):
+        return [(n.name, n.confidence) for n in self.nature_codes]
+
+    def to_dict(self):
+        # Embeddings are not serialized, they are recomputed if needed
+        return {
+            "nature_codes": [asdict(n) for n in self.nature_codes],
+            "segment_texts": self.segment_texts,
+        }
+
+    @classmethod
+    def from_dict(cls, data, from_cache=False):
+        return cls(
+            nature_codes=[NatureCodeMatch(**n) for n in data["nature_codes"]],
+            segment_texts=data.get("segment_texts", []),
+            from_cache=from_cache,
+        )
+
+# Function for detecting nature codes in a transcript
+
+# Input: transcript text, optional path to write a human readable log to
+# Output: DetectionResult with the triggered nature codes
+def detect_nature_codes(transcript_text, log_path=None):
+    result = detect_nature_codes_batch([transcript_text])[0]
+
+    # Step 5: Save output (optional)
+    if log_path:
+        write_detection_log(result, log_path)
+
+    return result
+
+# Function for detecting nature codes in many transcripts at once
+
+# Input: list of transcript texts, encode batch size
+# Output: list of DetectionResult (same order as the input)
+def detect_nature_codes_batch(transcript_texts, batch_size=32):
+    if not transcript_texts:
+        return []
+
+    # Split every transcript into individual lines/segments
+    all_segments = [
+        [line.strip() for line in text.split("\n") if line.strip()]
+        for text in transcript_texts
+    ]
+
+    # Encode the segments of all transcripts in shared batches, then split them back up
+    flat_segments = [seg for segments in all_segments for seg in segments]
+    flat_embeddings = encode(flat_segments, batch_size=batch_size)
+    transcript_embeddings = encode(list(transcript_texts), batch_size=batch_size)
+
+    results = []
+    offset = 0
+    for text, segments, transcript_embedding in zip(transcript_texts, all_segments, transcript_embeddings):
+        segment_embeddings = flat_embeddings[offset:offset + len(segments)]
+        offset += len(segments)
+        results.append(_classify_transcript(text, segments, segment_embeddings, transcript_embedding))
+    return results
+
+# Function for applying keyword and trigger rules to one encoded transcript
+
+# Input: transcript text, its segments, segment embeddings, whole-transcript embedding
+# Output: DetectionResult
+def _classify_transcript(transcript_text, segment_texts, segment_embeddings, transcript_embedding):
     transcript_lower = transcript_text.lower()
 
-    # Prepare embeddings for similarity comparison
-    nature_names = list(NATURE_KEYWORDS.keys())
-    nature_texts = [" ".join(NATURE_KEYWORDS[n]) for n in nature_names]
-    nature_embeddings = model.encode(nature_texts, convert_to_numpy=True, normalize_embeddings=True)
-    segment_embeddings = model.encode(segment_texts, convert_to_numpy=True, normalize_embeddings=True)
-    transcript_embedding = model.encode(transcript_text, convert_to_numpy=True, normalize_embeddings=True)
-    sims_to_transcript = cosine_similarity([transcript_embedding], nature_embeddings)[0]
+    # Compare with the keyword embeddings (cached)
+    nature_names, nature_embeddings = get_nature_embeddings()
+    # Embeddings are normalized, so the dot product is the cosine similarity
+    sims_to_transcript = nature_embeddings @ transcript_embedding
+
+    # Scan each segment once for every keyword
+    matcher = get_keyword_matcher()
+    hits_by_nature = defaultdict(set)
+    for seg in segment_texts:
+        for nature, hits in matcher.match(seg.lower()).items():
+            hits_by_nature[nature].update(hits)
 
     triggered_naturecodes = set()
     match_details = {}
     confidence_scores = {}
+    similarity_scores = {}
 
     # Go through each NatureCode and see if it should be triggered
     for i, nature in enumerate(nature_names):
-        keywords = NATURE_KEYWORDS[nature]
-        strong_hits = []
-
-        for seg in segment_texts:
-            seg_lower = seg.lower()
-            for kw in keywords:
-                kw_low = kw.lower()
-                if re.search(rf"\b{re.escape(kw_low)}\b", seg_lower):
-                    if kw_low in COMMON_WORDS and nature != "Sick Person (Specific Diagnosis)":
-                        continue
-                    strong_hits.append(kw_low)
-
-        strong_hits = list(set(strong_hits))
+        strong_hits = list(hits_by_nature.get(nature, ()))
         sim_score = float(sims_to_transcript[i])
         confidence = round(sim_score + 0.1 * len(strong_hits), 3)
         confidence_scores[nature] = confidence
+        similarity_scores[nature] = round(sim_score, 3)
 
         # Trigger rules
         if nature == "Case Entry":
@@ -102,19 +404,55 @@ def run_detection(transcript_path, transcript_text, output_folder="keywordsOutpu
     # Sort by confidence
     triggered_naturecodes = sorted(triggered_naturecodes, key=lambda n: confidence_scores.get(n, 0), reverse=True)
 
-    # Step 5: Save output 
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    transcript_name = os.path.basename(transcript_path).replace(".json", "")
-    log_filename = os.path.join(output_folder, f"{transcript_name}_naturecodes.txt")
+    result = DetectionResult(
+        nature_codes=[
+            NatureCodeMatch(
+                name=n,
+                confidence=confidence_scores[n],
+                keywords=match_details.get(n, []),
+                similarity=similarity_scores.get(n, 0.0),
+            )
+            for n in triggered_naturecodes
+        ],
+        segment_texts=segment_texts,
+        segment_embeddings=segment_embeddings,
+    )
+    return result
 
-    with open(log_filename, "w") as log_file:
+# Function for writing detection results to a text log
+
+# Input: DetectionResult, path of the log file
+# Output: none, writes the log file
+def write_detection_log(result, log_path):
+    log_dir = os.path.dirname(log_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    with open(log_path, "w") as log_file:
         log_file.write("\nFiltered relevant NatureCodes (sorted by confidence):\n")
-        for n in triggered_naturecodes:
-            keywords_found = ", ".join(match_details.get(n, [])) or "None"
-            conf = confidence_scores[n]
-            log_file.write(f"- {n}\n   Keywords: {keywords_found}\n   Confidence: {conf:.3f}\n")
+        for n in result.nature_codes:
+            keywords_found = ", ".join(n.keywords) or "None"
+            log_file.write(f"- {n.name}\n   Keywords: {keywords_found}\n   Confidence: {n.confidence:.3f}\n")
+
+# Function for loading everything detection needs ahead of the first request
+
+# Input: none
+# Output: none, loads the model (unless an embedding sidecar is used), keyword embeddings and keyword matcher
+def warm_up():
+    if embedding_sidecar.get_client() is None:
+        get_model()
+    _refresh_keywords()
+    encode(["warm up"])
+
+# Function for running detection and saving the log to the output folder (CLI)
+
+# Input: path to the transcript, transcript text, output folder
+# Output: path of the written log file
+def run_detection(transcript_path, transcript_text, output_folder="keywordsOutput"):
+    transcript_name = os.path.basename(transcript_path).replace(".json", "")
+    log_filename = os.path.join(output_folder, f"{transcript_name}_naturecodes.txt")
 
+    detect_nature_codes(transcript_text, log_path=log_filename)
     print(f"Finished processing {transcript_path}, results saved to {log_filename}")
 
     return log_filename
@@ -127,4 +465,6 @@ if __name__ == "__main__":
     parser.add_argument("--output", default="keywordsOutput", help="Folder to save outputs")
     args = parser.parse_args()
 
-    run_detection(args.transcript, args.output)
+    with open(args.transcript) as f:
+        transcript_text = f.read()
+    run_detection(args.transcript, transcript_text, args.output)
@@ -0,0 +1,261 @@
+# Local embedding sidecar for EMS call analysis
+# One process holds the embedding model; API workers send it texts over a Unix socket and
+# get raw float32 embeddings back, so N workers share one model and one CPU thread pool
+# CS4273 Group G
+
+# Start it before the API (from the backend directory):
+#     python embedding_sidecar.py --socket /tmp/ems-embedding.sock
+# then point the API at it:
+#     EMS_EMBEDDING_SOCKET=/tmp/ems-embedding.sock gunicorn -c gunicorn.conf.py api.wsgi:app
+# Without EMS_EMBEDDING_SOCKET every process encodes in-process (detect_naturecode.local_encode)
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_SOCKET_PATH = "/tmp/ems-embedding.sock"
+
+# Request: 4-byte length + JSON {"texts": [...]}
+REQUEST_HEADER = struct.Struct("!I")
+# Response: status (0 ok, 1 error), rows, dim, body length; body is rows x dim
+# little-endian float32 (C order) or a UTF-8 error message
+RESPONSE_HEADER = struct.Struct("!BIII")
+STATUS_OK = 0
+STATUS_ERROR = 1
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+# Function for reading exactly n bytes from a socket
+
+# Input: connected socket, number of bytes
+# Output: bytearray of n bytes (raises ConnectionError if the peer closed early)
+def _recv_exact(sock, n):
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:], n - received)
+        if count == 0:
+            raise ConnectionError("Embedding sidecar connection closed")
+        received += count
+    return buffer
+
+
+class EmbeddingBatcher:
+    """
+    Collects the texts of concurrent requests and encodes them together
+
+    A batch is sent to the model once max_batch texts are waiting or max_wait seconds
+    have passed since the first one arrived, whichever comes first.
+    """
+
+    def __init__(self, encode_fn, max_batch=256, max_wait=0.005):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, texts):
+        """Encode texts as part of the next batch, blocks until done"""
+        item = {"texts": texts, "done": threading.Event(), "result": None, "error": None}
+        self._queue.put(item)
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        return item["result"]
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            count = len(items[0]["texts"])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                items.append(item)
+                count += len(item["texts"])
+
+            try:
+                embeddings = self.encode_fn([text for item in items for text in item["texts"]])
+                offset = 0
+                for item in items:
+                    item["result"] = embeddings[offset:offset + len(item["texts"])]
+                    offset += len(item["texts"])
+            except Exception as e:
+                for item in items:
+                    item["error"] = e
+            for item in items:
+                item["done"].set()
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until the client disconnects"""
+
+    def handle(self):
+        while True:
+            try:
+                (length,) = REQUEST_HEADER.unpack(_recv_exact(self.request, REQUEST_HEADER.size))
+                request = json.loads(_recv_exact(self.request, length))
+            except ConnectionError:
+                return
+
+            try:
+                texts = [str(text) for text in request["texts"]]
+                embeddings = self.server.batcher.submit(texts) if texts else np.zeros((0, self.server.dim))
+                body = np.ascontiguousarray(embeddings, dtype=EMBEDDING_DTYPE).tobytes()
+                header = RESPONSE_HEADER.pack(STATUS_OK, len(texts), self.server.dim, len(body))
+            except Exception as e:
+                body = f"{type(e).__name__}: {e}".encode("utf-8")
+                header = RESPONSE_HEADER.pack(STATUS_ERROR, 0, 0, len(body))
+            self.request.sendall(header + body)
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    # Every API worker thread keeps its own connection
+    request_queue_size = 128
+
+    def __init__(self, socket_path, batcher, dim):
+        self.batcher = batcher
+        self.dim = dim
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+
+class EmbeddingClient:
+    """
+    Client for the embedding sidecar, one persistent connection per thread (and process)
+
+    encode() matches detect_naturecode.local_encode: a string gives one vector,
+    a list gives a matrix of normalized float32 embeddings.
+    """
+
+    def __init__(self, socket_path, timeout=60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        # A connection inherited over fork() belongs to the parent
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            sock.settimeout(self.timeout)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _request(self, texts):
+        payload = json.dumps({"texts": texts}).encode("utf-8")
+        sock = self._connection()
+        sock.sendall(REQUEST_HEADER.pack(len(payload)) + payload)
+        status, rows, dim, length = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+        body = _recv_exact(sock, length)
+        if status != STATUS_OK:
+            raise RuntimeError(f"Embedding sidecar error: {body.decode('utf-8', 'replace')}")
+        return np.frombuffer(body, dtype=EMBEDDING_DTYPE).reshape(rows, dim)
+
+    def encode(self, texts, batch_size=None):
+        """
+        Embed texts in the sidecar (batch_size is decided by the sidecar, accepted for
+        compatibility with the in-process encode)
+        """
+        single = isinstance(texts, str)
+        text_list = [texts] if single else list(texts)
+        try:
+            embeddings = self._request(text_list)
+        except (ConnectionError, OSError):
+            # The sidecar may have restarted since this connection was opened; retry once
+            self._close()
+            embeddings = self._request(text_list)
+        return embeddings[0] if single else embeddings
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# Function for getting the shared sidecar client
+
+# Input: none
+# Output: EmbeddingClient for EMS_EMBEDDING_SOCKET, or None when no sidecar is configured
+def get_client():
+    global _client
+    socket_path = os.environ.get("EMS_EMBEDDING_SOCKET")
+    if not socket_path:
+        return None
+    if _client is None or _client.socket_path != socket_path:
+        with _client_lock:
+            if _client is None or _client.socket_path != socket_path:
+                _client = EmbeddingClient(socket_path, timeout=float(os.environ.get("EMS_EMBEDDING_TIMEOUT", "60")))
+    return _client
+
+# Function for running the sidecar
+
+# Input: command line arguments (socket path, batching, CPU threads)
+# Output: none, serves until interrupted
+def main():
+    parser = argparse.ArgumentParser(description="Embedding sidecar for the EMS Call Analysis API")
+    parser.add_argument("--socket", default=os.environ.get("EMS_EMBEDDING_SOCKET", DEFAULT_SOCKET_PATH),
+                        help="Unix socket path to listen on")
+    parser.add_argument("--max-batch", type=int, default=256, help="Most texts encoded in one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long to wait for more requests before encoding a batch")
+    parser.add_argument("--batch-size", type=int, default=64, help="model.encode batch size")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for the model (default: all)")
+    args = parser.parse_args()
+
+    # The sidecar itself always encodes in-process
+    os.environ.pop("EMS_EMBEDDING_SOCKET", None)
+    import detect_naturecode
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    model = detect_naturecode.get_model()
+    dim = model.get_sentence_embedding_dimension()
+    batcher = EmbeddingBatcher(
+        lambda texts: detect_naturecode.local_encode(texts, batch_size=args.batch_size),
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000
+    )
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = EmbeddingServer(args.socket, batcher, dim)
+    os.chmod(args.socket, 0o660)
+    print(f"Embedding sidecar ({detect_naturecode.MODEL_NAME}, dim {dim}) listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Deterministic pre-grader for questions the dispatcher read out word for word
+# Questions matched here get code "1" without going through the LLM
+# CS4273 Group G
+
+import re
+import numpy as np
+from JSONTranscriptionParser import parse_segment_line
+from transcript_retrieval import split_segments, question_embeddings
+from detect_naturecode import encode
+
+# A dispatcher sentence must reach both scores, and beat every other question
+# by MIN_MARGIN, before its question is graded without the LLM
+MIN_FUZZY = 0.85        # character n-gram cosine against the question (or an allowed variant)
+MIN_SIMILARITY = 0.75   # embedding cosine against the question text
+MIN_MARGIN = 0.1
+
+# A short alternative replaces the question's words only where it shares this much of their
+# character n-grams (cosine); otherwise it is matched on its own
+MIN_ALIGNMENT = 0.4
+
+SENTENCE_RE = re.compile(r"[^.?!]+[.?!]?")
+WORD_RE = re.compile(r"\w+(?:'\w+)?")
+
+# Function for finding the dispatcher's sentences in a transcript
+
+# Input: transcript text (one formatted segment per line)
+# Output: list of (segment index, sentence) spoken by the dispatcher, who is the first speaker of the call
+def dispatcher_sentences(transcript_text):
+    segments = [parse_segment_line(line) for line in split_segments(transcript_text)]
+    speakers = [segment["speaker"] for segment in segments if segment]
+    if not speakers:
+        return []
+
+    dispatcher = speakers[0]
+    sentences = []
+    for index, segment in enumerate(segments):
+        if segment and segment["speaker"] == dispatcher:
+            for sentence in SENTENCE_RE.findall(segment["text"]):
+                if WORD_RE.search(sentence):
+                    sentences.append((index, sentence.strip()))
+    return sentences
+
+# Function for listing the accepted wordings of a question
+
+# Input: question text, list of allowed alternative words/phrases
+# Output: the question itself plus one version per alternative: a short alternative (n words) replaces
+#         the n words starting at the question word it shares the most character n-grams with, e.g.
+#         "Heart pains" for "heart attack"; one that lines up with no word (a synonym such as
+#         "conscious" for "awake") or a long one (a whole rewording) is added as is
+def question_variants(question_text, alternatives=()):
+    variants = [question_text]
+    words = list(WORD_RE.finditer(question_text))
+    for alternative in alternatives:
+        replacement = alternative.rstrip("?").strip()
+        span = len(replacement.split())
+        if span >= 4 or not words or not replacement:
+            variants.append(alternative)
+            continue
+        vectors = ngram_vectors([replacement] + [word.group() for word in words])
+        overlap = (vectors[0] @ vectors[1:].T).toarray()[0]
+        first = int(np.argmax(overlap))
+        if overlap[first] < MIN_ALIGNMENT:
+            variants.append(alternative)
+            continue
+        first = min(first, max(len(words) - span, 0))
+        last = min(first + span, len(words)) - 1
+        variants.append(question_text[:words[first].start()] + replacement + question_text[words[last].end():])
+    return variants
+
+# Function for building character n-gram vectors
+
+# Input: list of texts
+# Output: L2-normalized sparse matrix of character 3-gram counts (lowercased, word-bounded)
+def ngram_vectors(texts):
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    vectorizer = HashingVectorizer(
+        analyzer="char_wb", ngram_range=(3, 3), lowercase=True,
+        alternate_sign=False, norm="l2", n_features=2 ** 18
+    )
+    return vectorizer.transform(texts)
+
+# Function for grading the questions that were asked verbatim
+
+# Input: transcript text, dict of questions, dict of question ID -> allowed alternatives
+# Output: dict of question ID -> {"code": "1", "segment": index, "sentence", "fuzzy", "similarity"}
+#         for every question with an unambiguous verbatim match
+def fast_path_grade(transcript_text, questions_dict, alternatives=None):
+    alternatives = alternatives or {}
+    sentences = dispatcher_sentences(transcript_text)
+    if not sentences or not questions_dict:
+        return {}
+
+    question_ids = list(questions_dict.keys())
+    sentence_texts = [sentence for _, sentence in sentences]
+
+    # Fuzzy score: best character n-gram match over all accepted wordings of a question
+    variant_owner = []
+    variant_texts = []
+    for column, qid in enumerate(question_ids):
+        for variant in question_variants(questions_dict[qid], alternatives.get(qid, ())):
+            variant_owner.append(column)
+            variant_texts.append(variant)
+
+    vectors = ngram_vectors(sentence_texts + variant_texts)
+    variant_scores = (vectors[:len(sentence_texts)] @ vectors[len(sentence_texts):].T).toarray()
+    fuzzy = np.zeros((len(sentence_texts), len(question_ids)))
+    np.maximum.at(fuzzy.T, np.array(variant_owner), variant_scores.T)
+
+    # Only sentences that are close to some question are embedded
+    candidates = np.flatnonzero(fuzzy.max(axis=1) >= MIN_FUZZY)
+    if len(candidates) == 0:
+        return {}
+    similarity = encode([sentence_texts[row] for row in candidates]) @ question_embeddings(
+        [questions_dict[qid] for qid in question_ids]
+    ).T
+
+    matches = {}
+    for position, row in enumerate(candidates):
+        ranked = np.argsort(-fuzzy[row])
+        best = ranked[0]
+        runner_up = fuzzy[row, ranked[1]] if len(ranked) > 1 else 0.0
+
+        # Unambiguous: close in wording and meaning, and clearly not another question
+        if similarity[position, best] < MIN_SIMILARITY or fuzzy[row, best] - runner_up < MIN_MARGIN:
+            continue
+
+        qid = question_ids[best]
+        if qid in matches and matches[qid]["fuzzy"] >= fuzzy[row, best]:
+            continue
+        matches[qid] = {
+            "code": "1",
+            "segment": sentences[row][0],
+            "sentence": sentence_texts[row],
+            "fuzzy": round(float(fuzzy[row, best]), 3),
+            "similarity": round(float(similarity[position, best]), 3),
+        }
+    return matches
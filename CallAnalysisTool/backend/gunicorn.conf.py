@@ -0,0 +1,81 @@
+"""
+Gunicorn settings for the EMS Call Analysis API
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py api.wsgi:app
+
+Environment variables:
+    EMS_BIND              Address to listen on (default 0.0.0.0:5001)
+    EMS_WORKERS           Worker processes (default 1; job state is shared through SQLite and
+                          with more than one worker /api/metrics adds up every worker's values
+                          in PROMETHEUS_MULTIPROC_DIR, default data/metrics)
+    EMS_THREADS           Threads per worker (default 8)
+    EMS_TIMEOUT           Seconds a request may take before its worker is restarted (default 300,
+                          LLM generations are slow)
+    EMS_GRACEFUL_TIMEOUT  Seconds workers get to finish requests on restart (default 30)
+    EMS_KEEPALIVE         Seconds to keep idle connections open (default 5)
+    EMS_MAX_REQUESTS      Restart a worker after this many requests, 0 = never (default 0)
+    EMS_PRELOAD           Load the app and models once in the parent (default 1)
+    EMS_TORCH_THREADS     CPU threads per worker for embeddings (default CPU count / workers)
+"""
+
+import gc
+import os
+import shutil
+import sys
+from pathlib import Path
+
+bind = os.environ.get('EMS_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('EMS_WORKERS', '1'))
+threads = int(os.environ.get('EMS_THREADS', '8'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('EMS_TIMEOUT', '300'))
+graceful_timeout = int(os.environ.get('EMS_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('EMS_KEEPALIVE', '5'))
+max_requests = int(os.environ.get('EMS_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get('EMS_PRELOAD', '1') == '1'
+
+accesslog = '-'
+errorlog = '-'
+
+# Workers write their metrics to files in one directory, /api/metrics reads them all
+# (prometheus_client multiprocess mode; set before the app imports prometheus_client).
+# Files left by an earlier run are removed, unless the directory was given by the caller.
+if workers > 1 and not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    metrics_dir = Path(__file__).parent / 'data' / 'metrics'
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    metrics_dir.mkdir(parents=True)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = str(metrics_dir)
+
+# Split the CPU between the workers instead of every worker starting a full-size thread pool
+torch_threads = int(os.environ.get('EMS_TORCH_THREADS') or max(1, (os.cpu_count() or 1) // workers))
+
+if preload_app:
+    # Load the models in the parent (api/wsgi.py -> create_app) ...
+    os.environ.setdefault('EMS_WARMUP', '1')
+    # ... single-threaded: OpenMP thread pools started before fork() are not usable in the
+    # workers, each worker sets its own thread count in post_fork
+    os.environ['OMP_NUM_THREADS'] = '1'
+
+
+def when_ready(server):
+    """Parent is done loading: keep the preloaded objects out of the workers' GC passes,
+    otherwise the collector touches (and copies) their pages"""
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Give each worker its share of CPU threads for embeddings"""
+    os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(torch_threads)
+
+
+def child_exit(server, worker):
+    """Drop the in-flight gauges of a worker that exited (its counters and histograms stay)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,200 @@
+# Long-lived Ollama client used for AI grading
+# Reuses HTTP connections, keeps the model loaded and caps concurrent generations
+# CS4273 Group G
+
+import os
+import threading
+import time
+
+DEFAULT_MODEL = "llama3.1:8b"
+
+# Context window requested from Ollama (num_ctx); without it Ollama uses its own default
+# (2048 or 4096 tokens depending on the version) and silently truncates longer prompts
+DEFAULT_NUM_CTX = 8192
+
+# Tokens of the context kept free for the model's answer (the grades JSON)
+RESPONSE_TOKENS = 512
+
+# Share of the remaining context a len/4 token estimate may use; transcript lines (timestamps,
+# speaker labels) tokenize denser than plain English, so the estimate gets some headroom
+ESTIMATE_HEADROOM = 0.75
+
+# Callables notified of every change of a client's counters, e.g. {"waiting": 1};
+# api/services/metrics.py exports them from here
+stats_listeners = []
+
+
+class LLMClient:
+    """
+    Pooled, persistent client for Ollama generations.
+
+    - one ollama.Client (httpx connection pool) is reused for every call
+    - keep_alive pins the model in Ollama's memory between calls
+    - a semaphore caps how many generations are in flight at once
+    - queue wait time is measured separately from generation time
+    - every generation asks for a num_ctx token context window
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, host=None, keep_alive="30m", timeout=300.0,
+                 max_concurrency=2, options=None, num_ctx=DEFAULT_NUM_CTX):
+        self.model = model
+        self.host = host
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.options = {"num_ctx": num_ctx, **(options or {})}
+        self.num_ctx = self.options["num_ctx"]
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "queue_wait_s_total": 0.0,
+            "generation_s_total": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a client from environment variables:
+        OLLAMA_HOST, EMS_LLM_MODEL, EMS_LLM_KEEP_ALIVE, EMS_LLM_TIMEOUT, EMS_LLM_MAX_CONCURRENCY,
+        EMS_LLM_NUM_CTX
+        """
+        return cls(
+            model=os.environ.get("EMS_LLM_MODEL", DEFAULT_MODEL),
+            host=os.environ.get("OLLAMA_HOST") or None,
+            keep_alive=os.environ.get("EMS_LLM_KEEP_ALIVE", "30m"),
+            timeout=float(os.environ.get("EMS_LLM_TIMEOUT", "300")),
+            max_concurrency=int(os.environ.get("EMS_LLM_MAX_CONCURRENCY", "2")),
+            num_ctx=int(os.environ.get("EMS_LLM_NUM_CTX", str(DEFAULT_NUM_CTX))),
+        )
+
+    def prompt_token_budget(self):
+        """
+        Largest estimated prompt (transcript_retrieval.estimate_tokens) that still fits the
+        num_ctx context together with the answer
+        """
+        return int(max(self.num_ctx - RESPONSE_TOKENS, 0) * ESTIMATE_HEADROOM)
+
+    @property
+    def client(self):
+        """The underlying ollama.Client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import ollama
+                    self._client = ollama.Client(host=self.host, timeout=self.timeout)
+        return self._client
+
+    def generate(self, prompt, **kwargs):
+        """
+        Run a generation, waiting for a free slot first
+
+        Returns:
+            dict with 'response' (text), 'queue_wait_s', 'generation_s'
+            and Ollama's token counts ('prompt_eval_count', 'eval_count') when available
+        """
+        queue_wait = self._acquire()
+        started = time.perf_counter()
+        try:
+            response = self.client.generate(
+                model=self.model,
+                prompt=prompt,
+                keep_alive=self.keep_alive,
+                options={**self.options, **kwargs.pop("options", {})} or None,
+                **kwargs
+            )
+        except Exception:
+            self._release(started, error=True)
+            raise
+        generation = self._release(started)
+
+        return {
+            "response": response["response"],
+            "queue_wait_s": round(queue_wait, 4),
+            "generation_s": round(generation, 4),
+            "prompt_eval_count": response.get("prompt_eval_count"),
+            "eval_count": response.get("eval_count"),
+        }
+
+    def stream_generate(self, prompt, timings=None, **kwargs):
+        """
+        Run a streaming generation, yielding text chunks as Ollama produces them
+
+        The generation slot is held until the stream is exhausted or closed.
+        If a timings dict is passed, 'queue_wait_s' and 'generation_s' are filled in.
+        """
+        queue_wait = self._acquire()
+        if timings is not None:
+            timings["queue_wait_s"] = round(queue_wait, 4)
+        started = time.perf_counter()
+        error = False
+        try:
+            chunks = self.client.generate(
+                model=self.model,
+                prompt=prompt,
+                stream=True,
+                keep_alive=self.keep_alive,
+                options={**self.options, **kwargs.pop("options", {})} or None,
+                **kwargs
+            )
+            for chunk in chunks:
+                yield chunk["response"]
+        except Exception:
+            error = True
+            raise
+        finally:
+            generation = self._release(started, error=error)
+            if timings is not None:
+                timings["generation_s"] = round(generation, 4)
+
+    def stats(self):
+        """Totals since start: calls, errors, in_flight, waiting, queue wait and generation seconds"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _acquire(self):
+        """Wait for a generation slot, returns seconds spent waiting"""
+        self._update_stats(waiting=1)
+        started = time.perf_counter()
+        self._semaphore.acquire()
+        waited = time.perf_counter() - started
+        self._update_stats(waiting=-1, in_flight=1, queue_wait_s_total=waited)
+        return waited
+
+    def _release(self, started, error=False):
+        """Free the generation slot, returns seconds spent generating"""
+        elapsed = time.perf_counter() - started
+        self._semaphore.release()
+        self._update_stats(in_flight=-1, calls=1, generation_s_total=elapsed, errors=1 if error else 0)
+        return elapsed
+
+    def _update_stats(self, **changes):
+        """Add to the counters in stats() and tell the stats_listeners"""
+        with self._stats_lock:
+            for name, change in changes.items():
+                self._stats[name] += change
+        for listener in stats_listeners:
+            listener(changes)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+# Function for getting the process-wide LLM client
+
+# Input: none
+# Output: LLMClient configured from the environment (created on first use)
+def get_default_client():
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = LLMClient.from_env()
+    return _default_client
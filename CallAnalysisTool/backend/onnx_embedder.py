@@ -0,0 +1,153 @@
+# ONNX embedding backend for nature code detection
+# Runs an int8-quantized ONNX export of all-MiniLM-L6-v2 through onnxruntime: no PyTorch
+# needed at runtime, less CPU per request and a much smaller process
+# CS4273 Group G
+
+# Export once (needs torch, sentence-transformers, onnx and onnxruntime), from the backend directory:
+#     python onnx_embedder.py --export
+# then select the backend:
+#     EMS_EMBEDDING_BACKEND=onnx python api/app.py
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_DIR = os.path.join(BACKEND_DIR, "data", "models", "all-MiniLM-L6-v2-onnx")
+
+# Files written by export_model()
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embedder.json"
+
+
+class OnnxEmbedder:
+    """
+    Sentence embeddings from an exported transformer: tokenize, run the ONNX graph,
+    mean-pool over the attention mask and L2-normalize (the all-MiniLM-L6-v2 pipeline)
+
+    encode() takes the same arguments detect_naturecode passes to SentenceTransformer.encode.
+    """
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, quantized=True, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config["max_seq_length"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dim"]
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        single = isinstance(texts, str)
+        text_list = [texts] if single else list(texts)
+        embeddings = np.zeros((len(text_list), self.config["dim"]), dtype=np.float32)
+
+        # Similar lengths share a batch so little padding is computed (as SentenceTransformer does)
+        order = sorted(range(len(text_list)), key=lambda i: -len(text_list[i]))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([text_list[i] for i in batch], normalize_embeddings)
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts, normalize):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+# Function for exporting the sentence-transformers model to ONNX (fp32 + int8)
+
+# Input: output directory, model name or local path
+# Output: output directory, holding model.onnx, model_int8.onnx, tokenizer.json, embedder.json
+def export_model(output_dir=DEFAULT_MODEL_DIR, model_name_or_path="sentence-transformers/all-MiniLM-L6-v2"):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name_or_path, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(["is the patient breathing", "what is the address"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+
+    # Weights to int8, activations quantized on the fly
+    quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump({
+            "model": model_name_or_path,
+            "dim": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, indent=2)
+    return output_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX embedding backend for nature code detection")
+    parser.add_argument("--export", action="store_true", help="Export and quantize the model")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Model name or path")
+    parser.add_argument("--output", default=DEFAULT_MODEL_DIR, help="Directory for the exported model")
+    args = parser.parse_args()
+
+    if args.export:
+        output_dir = export_model(args.output, args.model)
+        print(f"Exported {args.model} to {output_dir}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
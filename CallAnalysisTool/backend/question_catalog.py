@@ -0,0 +1,166 @@
+# Shared protocol question catalog for EMSQA.csv
+# Parses the CSV once, indexes questions by NatureCode and reloads when the file changes
+# CS4273 Group G
+
+import os
+import threading
+from collections import namedtuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV_PATH = os.path.join(BACKEND_DIR, "data", "EMSQA.csv")
+
+CASE_ENTRY = "Case Entry"
+
+# One immutable, fully built index per version of the CSV.
+# Readers grab the current snapshot and never see a half-built one.
+CatalogSnapshot = namedtuple("CatalogSnapshot", [
+    "version",          # mtime_ns of the CSV this snapshot was built from
+    "nature_codes",     # sorted list of NatureCode names
+    "questions",        # NatureCode -> {question_id: question_text}
+    "prefixed",         # NatureCode -> {CE_/NC_ prefixed question_id: question_text}
+    "rows",             # NatureCode -> [{"Question_ID", "Question_Text", "Allowed_Alternatives"}]
+    "case_entry",       # {question_id: question_text} for NC_ID 0
+])
+
+
+# Function for giving a question ID its grading prefix
+
+# Input: nature code, question ID
+# Output: "CE_<id>" for Case Entry questions, "NC_<id>" otherwise
+def prefix_question_id(nature_code, question_id):
+    if nature_code == CASE_ENTRY:
+        return f"CE_{question_id}"
+    return f"NC_{question_id}"
+
+
+class QuestionCatalog:
+    """
+    Load-once, indexed view of EMSQA.csv.
+    Every lookup is a dict access; the CSV is only parsed again when its mtime changes.
+    """
+
+    def __init__(self, csv_path=DEFAULT_CSV_PATH):
+        self.csv_path = str(csv_path)
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """True once the CSV has been parsed"""
+        return self._snapshot is not None
+
+    @property
+    def version(self):
+        """mtime of the CSV the current index was built from"""
+        return self.snapshot().version
+
+    def snapshot(self):
+        """
+        Current index, rebuilt atomically if EMSQA.csv changed on disk
+
+        Raises:
+            FileNotFoundError: if the CSV does not exist
+        """
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == mtime:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != mtime:
+                self._snapshot = self._build(mtime)
+            return self._snapshot
+
+    def _build(self, mtime):
+        """Parse the CSV and build every per-NatureCode index in one pass"""
+        import pandas as pd  # only needed when (re)loading the CSV
+
+        df = pd.read_csv(self.csv_path, encoding="utf-8")
+
+        questions = {}
+        prefixed = {}
+        rows = {}
+        case_entry = {}
+
+        for record in df.to_dict("records"):
+            qid = record.get("Question_ID")
+            text = record.get("Question_Text")
+            # Skip rows without an ID or question text
+            if pd.isna(qid) or pd.isna(text):
+                continue
+
+            nature_code = record["NatureCode"]
+            qid = str(qid)
+            text = str(text)
+            alternatives = record.get("Allowed_Alternatives")
+
+            questions.setdefault(nature_code, {})[qid] = text
+            prefixed.setdefault(nature_code, {})[prefix_question_id(nature_code, qid)] = text
+            rows.setdefault(nature_code, []).append({
+                "Question_ID": qid,
+                "Question_Text": text,
+                "Allowed_Alternatives": None if pd.isna(alternatives) else str(alternatives),
+            })
+            if record.get("NC_ID") == 0:
+                case_entry[qid] = text
+
+        print(f"Loaded {len(df)} questions from EMSQA.csv")
+        return CatalogSnapshot(
+            version=mtime,
+            nature_codes=sorted(df["NatureCode"].dropna().unique().tolist()),
+            questions=questions,
+            prefixed=prefixed,
+            rows=rows,
+            case_entry=case_entry,
+        )
+
+    def prefixed_questions(self, nature_code):
+        """Questions for a nature code keyed by CE_/NC_ prefixed IDs (as used for grading)"""
+        return dict(self.snapshot().prefixed.get(nature_code, {}))
+
+    def questions_for(self, nature_code):
+        """Questions for a nature code keyed by their plain Question_ID"""
+        return dict(self.snapshot().questions.get(nature_code, {}))
+
+    def case_entry_questions(self):
+        """Case Entry questions (NC_ID = 0) keyed by their plain Question_ID"""
+        return dict(self.snapshot().case_entry)
+
+    def rows_for(self, nature_code):
+        """Question rows (ID, text, allowed alternatives) for a nature code"""
+        return list(self.snapshot().rows.get(nature_code, []))
+
+    def alternatives(self, nature_code):
+        """Allowed_Alternatives (comma separated in the CSV) keyed by CE_/NC_ prefixed question ID"""
+        return {
+            prefix_question_id(nature_code, row["Question_ID"]): [
+                alt.strip() for alt in row["Allowed_Alternatives"].split(",") if alt.strip()
+            ]
+            for row in self.snapshot().rows.get(nature_code, [])
+            if row["Allowed_Alternatives"]
+        }
+
+    def nature_codes(self):
+        """All NatureCode names in the CSV"""
+        return list(self.snapshot().nature_codes)
+
+    def question_texts(self):
+        """Every distinct Question_Text in the CSV, in file order"""
+        snapshot = self.snapshot()
+        return list(dict.fromkeys(text for questions in snapshot.questions.values() for text in questions.values()))
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+# Function for getting the shared catalog for a CSV file
+
+# Input: path to EMSQA.csv (defaults to backend/data/EMSQA.csv)
+# Output: the process-wide QuestionCatalog for that file
+def get_catalog(csv_path=None):
+    path = os.path.abspath(str(csv_path or DEFAULT_CSV_PATH))
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(path, QuestionCatalog(path))
+    return catalog
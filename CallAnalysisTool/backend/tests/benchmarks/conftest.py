@@ -0,0 +1,137 @@
+"""
+Fixtures for the pipeline benchmarks: synthetic transcripts and a fake Ollama server
+
+Run from the backend directory (results are saved as JSON under tests/benchmarks/results):
+    pytest tests/benchmarks --benchmark-autosave --benchmark-storage=tests/benchmarks/results
+Compare against the previous run:
+    pytest tests/benchmarks --benchmark-compare --benchmark-storage=tests/benchmarks/results
+"""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fake_ollama import FakeOllama
+
+# Transcript sizes (segments) every size-dependent stage is measured at
+SIZES = [10, 100, 1000]
+
+DISPATCHER_LINES = [
+    "Norman 911, what is the address of the emergency?",
+    "What's the phone number you're calling from?",
+    "Okay, tell me exactly what happened.",
+    "Is she awake?",
+    "Is she breathing?",
+    "How old is she?",
+    "Did she fall from a height?",
+    "Is there any serious bleeding?",
+    "Stay on the line with me, help is on the way.",
+]
+
+CALLER_LINES = [
+    "It's 2817 Brompton Drive in Norman.",
+    "My mom fell down the stairs and she can't get up.",
+    "She is having trouble breathing and her chest hurts.",
+    "She's 67 years old.",
+    "Yes, she's awake but she's confused.",
+    "There's a little blood on her forehead.",
+    "I think she tripped on the rug.",
+    "Please hurry, she's wheezing really badly.",
+]
+
+
+def make_transcript(segment_count, seed=0):
+    """Synthetic transcript in Group B's format, dispatcher and caller taking turns"""
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    for index in range(segment_count):
+        dispatcher = index % 2 == 0
+        text = rng.choice(DISPATCHER_LINES if dispatcher else CALLER_LINES)
+        duration = round(1.5 + len(text) / 15, 1)
+        segments.append({
+            'start': start,
+            'end': round(start + duration, 1),
+            'text': text,
+            'confidence': -0.29,
+            'audio_quality': 0.737,
+            'speaker': 'SPEAKER_01' if dispatcher else 'SPEAKER_00',
+        })
+        start = round(start + duration + 0.3, 1)
+    return {'language': 'en', 'segments': segments}
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f'{size}seg')
+def transcript(request):
+    """Synthetic transcript at every benchmark size"""
+    return make_transcript(request.param)
+
+
+@pytest.fixture
+def transcript_file(transcript, tmp_path):
+    """The synthetic transcript written to a .json file"""
+    path = tmp_path / 'transcript.json'
+    path.write_text(json.dumps(transcript))
+    return path
+
+
+@pytest.fixture
+def transcript_text(transcript):
+    from JSONTranscriptionParser import transcript_to_text
+    return transcript_to_text(transcript)
+
+
+@pytest.fixture(scope='session')
+def real_embedding_model():
+    """The real embedding model, None if it can't be loaded (tried once per session)"""
+    import detect_naturecode
+    try:
+        return detect_naturecode.get_model()
+    except Exception as e:
+        print(f'Embedding model unavailable, benchmarking with the stub embedder: {e}')
+        return None
+
+
+@pytest.fixture
+def embedding_model(request, real_embedding_model, benchmark):
+    """
+    The real embedding model, or the stub embedder (tests/conftest.py) if it can't be loaded
+
+    With the stub the stage runs without model time; the benchmark's extra_info says
+    which embedder ran so the numbers aren't compared across the two.
+    """
+    if real_embedding_model is not None:
+        benchmark.extra_info['embedder'] = 'model'
+        return real_embedding_model
+    benchmark.extra_info['embedder'] = 'stub'
+    return request.getfixturevalue('stub_embedder')
+
+
+@pytest.fixture(scope='session')
+def fake_ollama():
+    """Fake Ollama server, latency from EMS_BENCH_OLLAMA_LATENCY_S (default 0.05s)"""
+    latency = float(os.environ.get('EMS_BENCH_OLLAMA_LATENCY_S', '0.05'))
+    with FakeOllama(latency=latency) as server:
+        yield server
+
+
+@pytest.fixture
+def llm_client(fake_ollama):
+    from llm_client import LLMClient
+    return LLMClient(host=fake_ollama.url, max_concurrency=4)
+
+
+@pytest.fixture
+def no_persistence(monkeypatch):
+    """Grading without the grading cache (every round really runs) and without the results store"""
+    monkeypatch.setenv('EMS_CACHE_ENABLED', '0')
+    monkeypatch.setenv('EMS_RESULTS_ENABLED', '0')
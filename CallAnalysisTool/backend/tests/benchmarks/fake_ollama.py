@@ -0,0 +1,112 @@
+"""
+Local stand-in for the Ollama HTTP API used by the benchmarks
+Answers /api/generate (streaming and non-streaming) with configurable latency, no network needed
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Question IDs as they appear in build_grading_prompt ("CE_1: ...", "NC_2a: ...")
+QUESTION_ID_RE = re.compile(r'^\s*((?:CE|NC)_[^:\s]+):', re.MULTILINE)
+
+
+def grade_every_question(prompt, code='1'):
+    """Default response: the same grade for every question ID in the prompt, as JSON"""
+    return json.dumps({qid: code for qid in QUESTION_ID_RE.findall(prompt)})
+
+
+class FakeOllama:
+    """
+    Fake Ollama server on 127.0.0.1 (random port)
+
+    Args:
+        latency: Seconds to wait before answering each generate request
+        response: Response text, or a callable prompt -> response text
+                  (defaults to grading every question in the prompt "1")
+        chunk_size: Characters per chunk for streaming responses
+    """
+
+    def __init__(self, latency=0.0, response=None, chunk_size=8):
+        self.latency = latency
+        self.response = response or grade_every_question
+        self.chunk_size = chunk_size
+        self.requests = []
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append(body)
+                time.sleep(fake.latency)
+
+                prompt = body.get('prompt', '')
+                text = fake.response(prompt) if callable(fake.response) else fake.response
+                if body.get('stream'):
+                    self._stream(body, text)
+                else:
+                    self._send_json(200, {
+                        'model': body.get('model'),
+                        'created_at': '2025-01-01T00:00:00Z',
+                        'response': text,
+                        'done': True,
+                        'prompt_eval_count': len(prompt) // 4,
+                        'eval_count': len(text) // 4,
+                    })
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body, text):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                chunks = [text[i:i + fake.chunk_size] for i in range(0, len(text), fake.chunk_size)]
+                for index, chunk in enumerate(chunks + ['']):
+                    line = json.dumps({
+                        'model': body.get('model'),
+                        'created_at': '2025-01-01T00:00:00Z',
+                        'response': chunk,
+                        'done': index == len(chunks),
+                    }).encode('utf-8') + b'\n'
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.write(b'0\r\n\r\n')
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
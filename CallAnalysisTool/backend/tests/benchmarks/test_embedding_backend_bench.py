@@ -0,0 +1,93 @@
+"""
+PyTorch vs int8 ONNX embedding backend: encode latency per transcript size, and
+load time + peak RSS of a fresh process (in the benchmark's extra_info)
+
+Run from the backend directory:
+    pytest tests/benchmarks/test_embedding_backend_bench.py --benchmark-group-by=param:transcript
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import detect_naturecode
+
+BACKENDS = ['torch', 'onnx']
+
+# Load the backend and embed 100 segments in a fresh interpreter, report time and peak RSS
+# (VmHWM, ru_maxrss on Linux would include the pytest process it was forked from)
+PROCESS_SCRIPT = """
+import json, resource, sys, time
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+started = time.perf_counter()
+import detect_naturecode
+model = detect_naturecode.get_model()
+loaded = time.perf_counter()
+model.encode(['Is she breathing? My mom fell down the stairs.'] * 100, batch_size=32,
+             convert_to_numpy=True, normalize_embeddings=True)
+print(json.dumps({
+    'load_s': round(loaded - started, 3),
+    'encode_100_s': round(time.perf_counter() - loaded, 3),
+    'peak_rss_mb': round(peak_rss_mb(), 1),
+}))
+"""
+
+
+def load_embedder(backend):
+    """The backend's model object, or skip if it isn't available here"""
+    try:
+        if backend == 'onnx':
+            from onnx_embedder import OnnxEmbedder, DEFAULT_MODEL_DIR
+            return OnnxEmbedder(os.environ.get('EMS_ONNX_MODEL_DIR') or DEFAULT_MODEL_DIR)
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(detect_naturecode.MODEL_NAME)
+    except Exception as e:
+        pytest.skip(f'{backend} backend unavailable: {e}')
+
+
+@pytest.fixture(scope='module', params=BACKENDS)
+def embedder(request):
+    return request.param, load_embedder(request.param)
+
+
+def test_encode_latency(benchmark, embedder, transcript_text):
+    backend, model = embedder
+    segments = [line.strip() for line in transcript_text.split('\n') if line.strip()]
+    benchmark.extra_info['backend'] = backend
+
+    embeddings = benchmark(
+        model.encode, segments, batch_size=32, convert_to_numpy=True, normalize_embeddings=True
+    )
+    assert embeddings.shape[0] == len(segments)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_process_load_and_rss(benchmark, backend):
+    env = {**os.environ, 'EMS_EMBEDDING_BACKEND': backend}
+    env.pop('EMS_EMBEDDING_SOCKET', None)
+
+    def run():
+        proc = subprocess.run(
+            [sys.executable, '-c', PROCESS_SCRIPT], cwd=detect_naturecode.BACKEND_DIR,
+            env=env, capture_output=True, text=True, timeout=600
+        )
+        if proc.returncode != 0:
+            pytest.skip(f'{backend} backend unavailable: {proc.stderr.strip().splitlines()[-1:]}')
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    stats = benchmark.pedantic(run, rounds=1, iterations=1)
+    benchmark.extra_info.update(backend=backend, **stats)
@@ -0,0 +1,144 @@
+"""
+Per-stage benchmarks for the grading pipeline
+Each stage is timed on its own so a regression points at the stage that caused it
+
+Run from the backend directory:
+    pytest tests/benchmarks --benchmark-autosave --benchmark-storage=tests/benchmarks/results
+"""
+
+import json
+
+import pytest
+
+import AIGrader
+import detect_naturecode
+from JSONTranscriptionParser import json_to_text
+from question_catalog import QuestionCatalog, get_catalog
+
+NATURE_CODE = 'Falls'
+
+
+@pytest.fixture(scope='module')
+def keyword_matcher():
+    with open(detect_naturecode.KEYWORDS_PATH, 'r', encoding='utf-8') as f:
+        return detect_naturecode.KeywordMatcher(json.load(f))
+
+
+@pytest.fixture(scope='module')
+def questions():
+    questions = AIGrader.load_nature_code_questions(NATURE_CODE)
+    assert questions, f'No questions for {NATURE_CODE}'
+    return questions
+
+
+def graded_response(questions, code='1'):
+    """Model output grading every question, the shape parse_grades receives"""
+    return json.dumps({qid: code for qid in questions})
+
+
+# ---- Transcript parsing ----
+
+def test_json_to_text(benchmark, transcript_file):
+    text = benchmark(json_to_text, str(transcript_file))
+    assert text
+
+
+# ---- Nature code detection ----
+
+def test_keyword_matching(benchmark, keyword_matcher, transcript_text):
+    segments = [line.strip().lower() for line in transcript_text.split('\n') if line.strip()]
+
+    def match_all():
+        return [keyword_matcher.match(segment) for segment in segments]
+
+    hits = benchmark(match_all)
+    assert len(hits) == len(segments)
+
+
+def test_segment_embeddings(benchmark, embedding_model, transcript_text):
+    segments = [line.strip() for line in transcript_text.split('\n') if line.strip()]
+    embeddings = benchmark(detect_naturecode.encode, segments)
+    assert len(embeddings) == len(segments)
+
+
+def test_detect_nature_codes(benchmark, embedding_model, transcript_text):
+    result = benchmark(detect_naturecode.detect_nature_codes, transcript_text)
+    assert result.primary is not None
+
+
+# ---- Question loading ----
+
+def test_load_questions_warm(benchmark):
+    get_catalog().snapshot()
+    questions = benchmark(AIGrader.load_nature_code_questions, NATURE_CODE)
+    assert questions
+
+
+def test_load_questions_cold(benchmark):
+    # A fresh catalog parses EMSQA.csv every round (startup / CSV changed)
+    def load():
+        return QuestionCatalog(get_catalog().csv_path).prefixed_questions(NATURE_CODE)
+
+    questions = benchmark(load)
+    assert questions
+
+
+# ---- Prompt building ----
+
+def test_build_grading_prompt(benchmark, transcript_text, questions):
+    prompt = benchmark(AIGrader.build_grading_prompt, transcript_text, questions, NATURE_CODE)
+    assert transcript_text[:50] in prompt
+
+
+# ---- Grade parsing ----
+
+def test_parse_grades(benchmark, questions):
+    response = 'Here are the grades:\n' + graded_response(questions)
+    grades = benchmark(AIGrader.parse_grades, response)
+    assert set(grades) == set(questions)
+
+
+def test_stream_parse_grades(benchmark, questions):
+    response = graded_response(questions)
+    chunks = [response[i:i + 8] for i in range(0, len(response), 8)]
+
+    def parse():
+        parser = AIGrader.GradeStreamParser()
+        grades = {}
+        for chunk in chunks:
+            grades.update(parser.feed(chunk))  # list of (question_id, code) pairs
+        return grades
+
+    grades = benchmark(parse)
+    assert set(grades) == set(questions)
+
+
+# ---- Final grade ----
+
+def test_calculate_final_grade(benchmark, questions):
+    codes = ['1', '2', '3', '4', '5', '6', 'RC']
+    grades = {qid: codes[index % len(codes)] for index, qid in enumerate(questions)}
+    result = benchmark(AIGrader.calculate_final_grade, grades, questions)
+    assert result is not None
+
+
+# ---- LLM round trip (fake Ollama) ----
+
+def test_ai_grade_transcript(benchmark, llm_client, transcript_text, questions):
+    grades = benchmark.pedantic(
+        AIGrader.ai_grade_transcript,
+        args=(transcript_text, questions, NATURE_CODE),
+        kwargs={'client': llm_client},
+        rounds=5, iterations=1, warmup_rounds=1
+    )
+    assert set(grades) == set(questions)
+
+
+# ---- End to end (detection, questions, LLM, final grade) ----
+
+def test_grade_end_to_end(benchmark, embedding_model, no_persistence, llm_client, transcript):
+    from api.services.ai_grader import AIGraderService
+
+    service = AIGraderService(llm_client=llm_client)
+    result = benchmark.pedantic(service.grade, args=(transcript,), rounds=3, iterations=1, warmup_rounds=1)
+    assert result.grades
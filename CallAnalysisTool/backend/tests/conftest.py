@@ -0,0 +1,63 @@
+"""
+Shared fixtures: a small deterministic embedder that stands in for the embedding model,
+so retrieval, fast-path matching, evidence and nature code detection run without it
+"""
+
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import detect_naturecode
+import fast_path_grader
+import transcript_retrieval
+
+
+class HashEmbedder:
+    """Bag-of-words embedding: every word is hashed into one of `dimensions` buckets"""
+
+    def __init__(self, dimensions=64):
+        self.dimensions = dimensions
+        self.encoded = []
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r'[a-z0-9]+', text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=32):
+        """Same contract as detect_naturecode.encode: a string gives one vector, a list a matrix"""
+        if isinstance(texts, str):
+            self.encoded.append(texts)
+            return self.embed(texts)
+        self.encoded.extend(texts)
+        return np.array([self.embed(text) for text in texts], dtype=np.float32).reshape(len(texts), self.dimensions)
+
+
+@pytest.fixture
+def stub_embedder(monkeypatch, tmp_path):
+    """
+    HashEmbedder in place of the embedding model for the duration of a test
+
+    Question and keyword embeddings of the real model are not reused, and the keyword
+    embeddings encoded with the stub are saved under tmp_path, not data/embedding_cache.
+    """
+    embedder = HashEmbedder()
+    for module in (detect_naturecode, transcript_retrieval, fast_path_grader):
+        monkeypatch.setattr(module, 'encode', embedder.encode)
+
+    monkeypatch.setitem(transcript_retrieval._question_state, 'version', None)
+    monkeypatch.setitem(transcript_retrieval._question_state, 'embeddings', {})
+
+    monkeypatch.setattr(detect_naturecode, 'EMBEDDING_CACHE_DIR', str(tmp_path / 'embedding_cache'))
+    for key in list(detect_naturecode._keyword_state):
+        monkeypatch.setitem(detect_naturecode._keyword_state, key, None)
+    return embedder
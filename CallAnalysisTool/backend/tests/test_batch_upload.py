@@ -0,0 +1,125 @@
+"""
+Zip batches for /api/grade/batch: entries that can't be read are reported per
+transcript (400) while the rest of the batch is still read
+
+Grading itself is replaced by a stub, no Ollama or model is needed.
+
+Run from the backend directory:
+    pytest tests/test_batch_upload.py
+"""
+
+import io
+import json
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.app import create_app
+from api.routes import grading
+
+TRANSCRIPT = {
+    'language': 'en',
+    'segments': [
+        {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_01', 'text': '911, what is the address of the emergency?'},
+    ],
+}
+
+
+def make_zip(*names, compression=zipfile.ZIP_STORED):
+    """Zip with one copy of TRANSCRIPT per name"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name in names:
+            archive.writestr(name, json.dumps(TRANSCRIPT))
+    return bytearray(buffer.getvalue())
+
+
+def central_header(data, name):
+    """Offset of the central directory header of an entry"""
+    offset = data.index(b'PK\x01\x02')
+    while True:
+        name_length = struct.unpack('<H', data[offset + 28:offset + 30])[0]
+        if data[offset + 46:offset + 46 + name_length] == name.encode():
+            return offset
+        offset = data.index(b'PK\x01\x02', offset + 4)
+
+
+def local_data(data, name):
+    """Offset of an entry's (compressed) data"""
+    offset = data.index(b'PK\x03\x04')
+    while True:
+        name_length, extra_length = struct.unpack('<HH', data[offset + 26:offset + 30])
+        start = offset + 30 + name_length + extra_length
+        if data[offset + 30:offset + 30 + name_length] == name.encode():
+            return start
+        offset = data.index(b'PK\x03\x04', offset + 4)
+
+
+def corrupt_data(data, name):
+    start = local_data(data, name)
+    for i in range(start + 2, start + 12):
+        data[i] ^= 0xFF
+    return data
+
+
+def set_encrypted(data, name):
+    data[central_header(data, name) + 8] |= 0x01
+    return data
+
+
+def set_compression(data, name, method):
+    offset = central_header(data, name)
+    data[offset + 10:offset + 12] = struct.pack('<H', method)
+    return data
+
+
+class StubGrader:
+    """Stands in for AIGraderService, grading nothing"""
+
+    def grade_batch(self, transcripts, show_evidence=False, max_concurrency=2):
+        return []
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(grading, 'AIGraderService', StubGrader)
+    return create_app(warm_up=False)
+
+
+def read_batch(app, data):
+    with app.test_request_context('/api/grade/batch', method='POST', content_type='multipart/form-data',
+                                  data={'file': (io.BytesIO(bytes(data)), 'calls.zip')}):
+        return {filename: error for filename, _, error in grading.read_batch_transcripts()}
+
+
+@pytest.mark.parametrize('damage, compression', [
+    (corrupt_data, zipfile.ZIP_STORED),                           # CRC mismatch
+    (corrupt_data, zipfile.ZIP_DEFLATED),                         # Invalid compressed data
+    (set_encrypted, zipfile.ZIP_STORED),                          # Password needed
+    (lambda data, name: set_compression(data, name, 99), zipfile.ZIP_STORED),  # AES, not supported
+])
+def test_unreadable_entry_is_reported_alone(app, damage, compression):
+    data = damage(make_zip('good.json', 'bad.json', compression=compression), 'bad.json')
+    errors = read_batch(app, data)
+
+    assert errors['good.json'] is None
+    status, body = errors['bad.json']
+    assert status == 400
+    assert body['error'] == 'Unreadable zip entry'
+
+
+def test_batch_with_unreadable_entry_is_not_a_server_error(app):
+    data = set_encrypted(make_zip('good.json', 'bad.json'), 'bad.json')
+    response = app.test_client().post('/api/grade/batch', content_type='multipart/form-data',
+                                      data={'file': (io.BytesIO(bytes(data)), 'calls.zip')})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{'index': 1, 'filename': 'bad.json', 'http_status': 400, 'result': lines[0]['result']}]
+    assert lines[0]['result']['error'] == 'Unreadable zip entry'
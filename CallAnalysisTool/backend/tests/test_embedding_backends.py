@@ -0,0 +1,191 @@
+"""
+Parity between the PyTorch and the int8 ONNX embedding backends
+Nature code similarities (sims_to_transcript) and triggered nature codes must match
+within EMS_PARITY_TOLERANCE
+
+The backend comparison needs the exported model (python onnx_embedder.py --export) and
+the PyTorch model, and is skipped when either is unavailable; the parity checks themselves
+also run against the stub embedder.
+
+Run from the backend directory:
+    pytest tests/test_embedding_backends.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import detect_naturecode
+from JSONTranscriptionParser import transcript_to_text
+
+# Largest allowed difference of a cosine similarity / confidence between the backends
+PARITY_TOLERANCE = float(os.environ.get('EMS_PARITY_TOLERANCE', '0.03'))
+
+# Detection in a fresh interpreter per backend; reads transcript texts on stdin
+DETECTION_SCRIPT = """
+import json, sys
+sys.path.insert(0, 'tests')
+from test_embedding_backends import detection_summary
+print(json.dumps(detection_summary(json.loads(sys.stdin.read()))))
+"""
+
+
+def detection_summary(texts):
+    """Keyword similarities and triggered nature codes of every text, with the current embedder"""
+    names, nature_embeddings = detect_naturecode.get_nature_embeddings()
+    transcripts = []
+    for text in texts:
+        result = detect_naturecode.detect_nature_codes(text)
+        transcripts.append({
+            'sims_to_transcript': (nature_embeddings @ detect_naturecode.encode(text)).tolist(),
+            'nature_codes': [(n.name, n.confidence) for n in result.nature_codes],
+        })
+    return {'names': names, 'transcripts': transcripts}
+
+
+# Short calls for nature codes the sample transcript doesn't cover
+EXTRA_CALLS = [
+    [
+        ("SPEAKER_01", "911, what is the address of the emergency?"),
+        ("SPEAKER_00", "My husband can't breathe, he's wheezing and turning blue."),
+        ("SPEAKER_01", "Is he able to talk to you? Does he have asthma?"),
+        ("SPEAKER_00", "He has asthma and his inhaler isn't helping."),
+    ],
+    [
+        ("SPEAKER_01", "911, what is the address of the emergency?"),
+        ("SPEAKER_00", "My grandmother fell down the stairs and hit her head."),
+        ("SPEAKER_01", "How far did she fall? Is there any serious bleeding?"),
+        ("SPEAKER_00", "About six steps, she's bleeding from her forehead."),
+    ],
+    [
+        ("SPEAKER_01", "911, what is the address of the emergency?"),
+        ("SPEAKER_00", "My dad's face is drooping and his speech is slurred."),
+        ("SPEAKER_01", "When did you first notice the weakness?"),
+        ("SPEAKER_00", "About twenty minutes ago, he can't lift his left arm."),
+    ],
+]
+
+
+def parity_transcripts():
+    with open(BACKEND_DIR / 'tests' / 'test_transcript.json') as f:
+        texts = [transcript_to_text(json.load(f))]
+    for call in EXTRA_CALLS:
+        segments = [
+            {'start': float(i * 4), 'end': float(i * 4 + 3), 'speaker': speaker, 'text': text}
+            for i, (speaker, text) in enumerate(call)
+        ]
+        texts.append(transcript_to_text({'segments': segments}))
+    return texts
+
+
+def run_detection(backend, texts):
+    env = {**os.environ, 'EMS_EMBEDDING_BACKEND': backend}
+    env.pop('EMS_EMBEDDING_SOCKET', None)
+    proc = subprocess.run(
+        [sys.executable, '-c', DETECTION_SCRIPT],
+        input=json.dumps(texts), cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=600
+    )
+    # Dependencies and the export were checked by the fixture, a crash here is a regression
+    if proc.returncode != 0:
+        pytest.fail(f'{backend} detection failed:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope='module')
+def detections():
+    pytest.importorskip('onnxruntime')
+    pytest.importorskip('sentence_transformers')
+    from onnx_embedder import DEFAULT_MODEL_DIR, INT8_FILE
+    model_dir = os.environ.get('EMS_ONNX_MODEL_DIR') or DEFAULT_MODEL_DIR
+    if not os.path.exists(os.path.join(model_dir, INT8_FILE)):
+        pytest.skip(f'No ONNX export in {model_dir} (python onnx_embedder.py --export)')
+
+    texts = parity_transcripts()
+    return run_detection('torch', texts), run_detection('onnx', texts)
+
+
+def assert_similarities_match(reference, candidate):
+    assert reference['names'] == candidate['names']
+
+    for reference_call, candidate_call in zip(reference['transcripts'], candidate['transcripts']):
+        differences = [
+            abs(a - b) for a, b in zip(reference_call['sims_to_transcript'], candidate_call['sims_to_transcript'])
+        ]
+        worst = max(range(len(differences)), key=differences.__getitem__)
+        assert differences[worst] <= PARITY_TOLERANCE, (
+            f"{reference['names'][worst]}: {reference_call['sims_to_transcript'][worst]:.4f} vs "
+            f"{candidate_call['sims_to_transcript'][worst]:.4f}"
+        )
+
+
+def assert_nature_codes_match(reference, candidate):
+    for reference_call, candidate_call in zip(reference['transcripts'], candidate['transcripts']):
+        reference_codes = dict(reference_call['nature_codes'])
+        candidate_codes = dict(candidate_call['nature_codes'])
+        assert set(reference_codes) == set(candidate_codes)
+        for name, confidence in reference_codes.items():
+            assert abs(confidence - candidate_codes[name]) <= PARITY_TOLERANCE, name
+        assert reference_call['nature_codes'][0][0] == candidate_call['nature_codes'][0][0]
+
+
+def test_similarities_match(detections):
+    assert_similarities_match(*detections)
+
+
+def test_triggered_nature_codes_match(detections):
+    assert_nature_codes_match(*detections)
+
+
+# ---- The parity checks themselves, with the stub embedder (tests/conftest.py), no model needed ----
+
+def quantized(encode):
+    """encode() with every component rounded to int8 and renormalized, like the int8 export's drift"""
+    def encode_int8(texts, batch_size=32):
+        embeddings = np.round(encode(texts, batch_size) * 127) / 127
+        return embeddings / np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return encode_int8
+
+
+def drifted(encode, scale=0.2):
+    """encode() with seeded noise, an export that no longer matches the model"""
+    def encode_noisy(texts, batch_size=32):
+        embeddings = encode(texts, batch_size)
+        embeddings = embeddings + np.random.default_rng(0).normal(0, scale, embeddings.shape)
+        return embeddings / np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return encode_noisy
+
+
+def stub_detection(monkeypatch, tmp_path, name, encode):
+    """detection_summary() as if run with another backend: its own encode and keyword embeddings"""
+    monkeypatch.setattr(detect_naturecode, 'encode', encode)
+    monkeypatch.setattr(detect_naturecode, 'EMBEDDING_CACHE_DIR', str(tmp_path / name))
+    for key in list(detect_naturecode._keyword_state):
+        monkeypatch.setitem(detect_naturecode._keyword_state, key, None)
+    return detection_summary(parity_transcripts())
+
+
+def test_int8_drift_is_within_tolerance(stub_embedder, monkeypatch, tmp_path):
+    reference = stub_detection(monkeypatch, tmp_path, 'reference', stub_embedder.encode)
+    candidate = stub_detection(monkeypatch, tmp_path, 'int8', quantized(stub_embedder.encode))
+
+    assert any(call['nature_codes'][1:] for call in reference['transcripts'])
+    assert reference != candidate
+    assert_similarities_match(reference, candidate)
+    assert_nature_codes_match(reference, candidate)
+
+
+def test_drifted_backend_fails_parity(stub_embedder, monkeypatch, tmp_path):
+    reference = stub_detection(monkeypatch, tmp_path, 'reference', stub_embedder.encode)
+    candidate = stub_detection(monkeypatch, tmp_path, 'drifted', drifted(stub_embedder.encode))
+
+    with pytest.raises(AssertionError):
+        assert_similarities_match(reference, candidate)
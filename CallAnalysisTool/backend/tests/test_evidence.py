@@ -0,0 +1,116 @@
+"""
+Evidence segments: the best-matching transcript segments per question, and segment
+embeddings reused across requests whose detection is served from the cache
+
+The embedding model is replaced by the stub embedder (tests/conftest.py), no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_evidence.py
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache
+from detect_naturecode import DetectionResult, NatureCodeMatch
+from JSONTranscriptionParser import segments_to_text
+from llm_client import LLMClient
+from transcript_retrieval import question_evidence, split_segments
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_00', 'text': '911, what is the address of the emergency?'},
+    {'start': 3.0, 'end': 6.0, 'speaker': 'SPEAKER_01', 'text': 'It is 2817 Brompton Drive.'},
+    {'start': 6.0, 'end': 9.0, 'speaker': 'SPEAKER_00', 'text': 'What is the phone number you are calling from?'},
+    {'start': 9.0, 'end': 12.0, 'speaker': 'SPEAKER_01', 'text': 'My father fell down the stairs.'},
+]
+TRANSCRIPT_TEXT = segments_to_text(SEGMENTS)
+QUESTIONS = {'CE_1': 'What is the address of the emergency?', 'CE_2': 'What is the phone number?'}
+
+
+def make_grader(tmp_path):
+    return AIGraderService(llm_client=LLMClient(), cache=GradingCache(tmp_path / 'cache.sqlite3'))
+
+
+def segments_encoded(embedder):
+    return [text for text in embedder.encoded if text in split_segments(TRANSCRIPT_TEXT)]
+
+
+def test_best_matching_segment_comes_first(stub_embedder):
+    evidence = question_evidence(TRANSCRIPT_TEXT, QUESTIONS, top_n=2)
+
+    assert evidence['CE_1'][0]['text'] == SEGMENTS[0]['text']
+    assert evidence['CE_1'][0]['start'] == 0.0
+    assert evidence['CE_2'][0]['text'] == SEGMENTS[2]['text']
+    assert all(len(matches) == 2 for matches in evidence.values())
+    assert evidence['CE_1'][0]['score'] >= evidence['CE_1'][1]['score']
+
+
+def test_detection_embeddings_are_reused(stub_embedder):
+    segment_embeddings = stub_embedder.encode(split_segments(TRANSCRIPT_TEXT))
+    stub_embedder.encoded.clear()
+
+    question_evidence(TRANSCRIPT_TEXT, QUESTIONS, segment_embeddings)
+    assert segments_encoded(stub_embedder) == []
+
+
+def test_cached_detection_does_not_encode_segments_again(stub_embedder, tmp_path):
+    # First request: detection ran, its embeddings are stored with the cache
+    fresh = DetectionResult(nature_codes=[], segment_embeddings=stub_embedder.encode(split_segments(TRANSCRIPT_TEXT)))
+    first = make_grader(tmp_path).find_evidence(TRANSCRIPT_TEXT, QUESTIONS, fresh)
+    stub_embedder.encoded.clear()
+
+    # Later request: detection comes from the cache, without embeddings
+    cached = DetectionResult(nature_codes=[], from_cache=True)
+    second = make_grader(tmp_path).find_evidence(TRANSCRIPT_TEXT, QUESTIONS, cached)
+
+    assert segments_encoded(stub_embedder) == []
+    assert second == first
+    np.testing.assert_array_equal(cached.segment_embeddings, fresh.segment_embeddings)
+
+
+def test_segments_are_encoded_once_for_cached_detections(stub_embedder, tmp_path):
+    for _ in range(3):
+        detection = DetectionResult(nature_codes=[], from_cache=True)
+        make_grader(tmp_path).find_evidence(TRANSCRIPT_TEXT, QUESTIONS, detection)
+
+    assert segments_encoded(stub_embedder) == split_segments(TRANSCRIPT_TEXT)
+
+
+def test_fast_path_segment_comes_first(stub_embedder, tmp_path):
+    # Fast path matched the phone number question to the caller's segment, not the best match
+    fast_grades = {'CE_2': {'code': '1', 'segment': 1, 'sentence': SEGMENTS[1]['text'], 'fuzzy': 0.9, 'similarity': 0.8}}
+    evidence = make_grader(tmp_path).find_evidence(TRANSCRIPT_TEXT, QUESTIONS, fast_grades=fast_grades)
+
+    assert [e['text'] for e in evidence['CE_2']] == [SEGMENTS[1]['text'], SEGMENTS[2]['text']]
+    assert evidence['CE_2'][0]['score'] == 0.8
+    assert evidence['CE_1'][0]['text'] == SEGMENTS[0]['text']
+
+
+class GradingOllama:
+    """Stands in for ollama.Client, grading every question of the prompt as Asked Correctly"""
+
+    def generate(self, prompt, **kwargs):
+        question_ids = dict.fromkeys(re.findall(r'\b(?:CE|NC)_\w+', prompt))
+        return {'response': json.dumps({q_id: '1' for q_id in question_ids})}
+
+
+def test_graded_result_carries_evidence(stub_embedder, tmp_path):
+    client = LLMClient()
+    client._client = GradingOllama()
+    grader = AIGraderService(llm_client=client, cache=GradingCache(tmp_path / 'cache.sqlite3'))
+    detection = DetectionResult(nature_codes=[NatureCodeMatch('Case Entry', 0.9, [], 0.9)])
+
+    result = grader.grade_detected({'segments': SEGMENTS}, TRANSCRIPT_TEXT, detection, show_evidence=True)
+
+    assert all(len(grade['evidence']) == 2 for grade in result.grades.values())
+    # CE_1 "What's the location of the emergency?", CE_2 "What's the phone number you're calling from?"
+    assert result.grades['CE_1']['evidence'][0]['text'] == SEGMENTS[0]['text']
+    assert result.grades['CE_2']['evidence'][0]['text'] == SEGMENTS[2]['text']
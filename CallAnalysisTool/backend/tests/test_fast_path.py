@@ -0,0 +1,118 @@
+"""
+Fast path: questions the dispatcher read out verbatim are graded "1" without the LLM,
+ambiguous or loose matches are left to the LLM
+
+The embedding model is replaced by the stub embedder (tests/conftest.py) and LLM grades
+come from a stub Ollama client, no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_fast_path.py
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache
+from fast_path_grader import dispatcher_sentences, fast_path_grade, question_variants
+from JSONTranscriptionParser import format_segment
+from llm_client import LLMClient
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_00', 'text': '911, what is the address of the emergency?'},
+    {'start': 3.0, 'end': 6.0, 'speaker': 'SPEAKER_01', 'text': 'What is the phone number? I forgot.'},
+    {'start': 6.0, 'end': 9.0, 'speaker': 'SPEAKER_00', 'text': 'Okay. Is he awake?'},
+    {'start': 9.0, 'end': 12.0, 'speaker': 'SPEAKER_01', 'text': 'He fell down the stairs.'},
+    {'start': 12.0, 'end': 15.0, 'speaker': 'SPEAKER_00', 'text': 'How far did he fall?'},
+]
+TRANSCRIPT_TEXT = ''.join(format_segment(segment) for segment in SEGMENTS)
+
+QUESTIONS = {
+    'CE_1': 'What is the address of the emergency?',
+    'CE_2': 'What is the phone number?',
+    'NC_1': 'Is he conscious?',
+    'NC_2': 'How far did he fall?',
+}
+
+
+class RecordingOllama:
+    """Stands in for ollama.Client, recording prompts and grading every question as Not Asked"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        question_ids = dict.fromkeys(re.findall(r'\b(?:CE|NC)_\w+', prompt))
+        return {'response': json.dumps({q_id: '2' for q_id in question_ids})}
+
+
+def test_dispatcher_is_the_first_speaker():
+    sentences = dispatcher_sentences(TRANSCRIPT_TEXT)
+
+    assert sentences == [
+        (0, '911, what is the address of the emergency?'),
+        (2, 'Okay.'),
+        (2, 'Is he awake?'),
+        (4, 'How far did he fall?'),
+    ]
+
+
+def test_question_variants():
+    variants = question_variants('Is he having a heart attack?', ['heart pains', 'conscious', 'Does he have chest pain at all?'])
+
+    assert variants == [
+        'Is he having a heart attack?',
+        'Is he having a heart pains?',
+        'conscious',
+        'Does he have chest pain at all?',
+    ]
+
+
+def test_verbatim_dispatcher_questions_are_graded(stub_embedder):
+    matches = fast_path_grade(TRANSCRIPT_TEXT, QUESTIONS)
+
+    # The phone number question was only said by the caller, "awake" isn't "conscious"
+    assert set(matches) == {'CE_1', 'NC_2'}
+    assert matches['CE_1']['code'] == '1'
+    assert matches['CE_1']['segment'] == 0
+    assert matches['NC_2']['sentence'] == 'How far did he fall?'
+    assert all(match['similarity'] >= 0.75 and match['fuzzy'] >= 0.85 for match in matches.values())
+
+
+def test_alternatives_count_as_verbatim(stub_embedder):
+    reworded = format_segment({**SEGMENTS[0], 'text': 'What is the location of the emergency?'})
+    assert fast_path_grade(reworded, QUESTIONS) == {}
+
+    matches = fast_path_grade(reworded, QUESTIONS, {'CE_1': ['What is the location of the emergency?']})
+    assert set(matches) == {'CE_1'}
+    assert matches['CE_1']['fuzzy'] == 1.0
+
+
+def test_ambiguous_sentence_is_left_to_the_llm(stub_embedder):
+    questions = {'NC_1': 'How far did he fall?', 'NC_2': 'How far did she fall?'}
+    assert fast_path_grade(TRANSCRIPT_TEXT, questions) == {}
+
+
+def test_fast_path_questions_skip_the_llm(stub_embedder, tmp_path):
+    ollama = RecordingOllama()
+    client = LLMClient()
+    client._client = ollama
+    grader = AIGraderService(llm_client=client, cache=GradingCache(tmp_path / 'cache.sqlite3'), fast_path=True)
+
+    graded = grader.grade_questions(TRANSCRIPT_TEXT, QUESTIONS, 'Falls')
+
+    assert set(graded['fast_grades']) == {'CE_1', 'NC_2'}
+    assert graded['ai_grades'] == {'CE_2': '2', 'NC_1': '2'}
+    assert len(ollama.prompts) == 1
+    assert 'CE_1' not in ollama.prompts[0] and 'NC_2' not in ollama.prompts[0]
+
+    formatted = grader.format_grades(graded['ai_grades'], QUESTIONS, graded['fast_grades'])
+    assert formatted['CE_1']['source'] == 'fast_path'
+    assert formatted['CE_2']['source'] == 'llm'
+    assert grader.fast_path_metadata(QUESTIONS, graded['fast_grades']) == {'questions': 4, 'graded': 2, 'sent_to_llm': 2}
@@ -0,0 +1,83 @@
+"""
+GradeStreamParser must return every grade once, whatever the chunk boundaries of the streamed response
+
+Run from the backend directory:
+    pytest tests/test_grade_stream_parser.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from AIGrader import GradeStreamParser, stream_grade_transcript
+from JSONTranscriptionParser import format_segment
+from llm_client import LLMClient
+
+RESPONSE = 'Here are the grades:\n{"CE_1": "1", "CE_2" : "RC",\n  "NC_2a": 4, "NC_\\"x\\"": "5"}\nDone.'
+GRADES = [('CE_1', '1'), ('CE_2', 'RC'), ('NC_2a', '4'), ('NC_"x"', '5')]
+
+
+def feed_all(chunks):
+    parser = GradeStreamParser()
+    pairs = []
+    for chunk in chunks:
+        pairs.extend(parser.feed(chunk))
+    return parser, pairs
+
+
+@pytest.mark.parametrize('split', range(1, len(RESPONSE)))
+def test_any_split_point(split):
+    parser, pairs = feed_all([RESPONSE[:split], RESPONSE[split:]])
+    assert pairs == GRADES
+    assert parser.done
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16])
+def test_fixed_size_chunks(size):
+    parser, pairs = feed_all([RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)])
+    assert pairs == GRADES
+    assert parser.done
+
+
+def test_pair_is_returned_once_complete():
+    parser = GradeStreamParser()
+    assert parser.feed('{"CE_1": "1') == []
+    assert parser.feed('"') == []           # may still be followed by more of the value
+    assert parser.feed(', "CE_2"') == [('CE_1', '1')]
+    assert parser.feed(': "2"}') == [('CE_2', '2')]
+    assert parser.feed(', "CE_3": "1"}') == []
+
+
+def test_incomplete_object():
+    parser, pairs = feed_all(['no grades yet ', '{"CE_1": "1", "CE_2": '])
+    assert pairs == [('CE_1', '1')]
+    assert not parser.done
+
+
+class StreamingOllama:
+    """Stands in for ollama.Client, streaming a fixed response in small chunks"""
+
+    def __init__(self, response, chunk_size):
+        self.response = response
+        self.chunk_size = chunk_size
+
+    def generate(self, stream=False, **kwargs):
+        assert stream
+        for start in range(0, len(self.response), self.chunk_size):
+            yield {'response': self.response[start:start + self.chunk_size], 'done': False}
+        yield {'response': '', 'done': True}
+
+
+def test_stream_grade_transcript_over_llm_client():
+    questions = {'CE_1': 'What is the address of the emergency?', 'CE_2': 'What is the phone number?'}
+    client = LLMClient(max_concurrency=1)
+    client._client = StreamingOllama(json.dumps({'CE_1': '1', 'CE_2': '2'}), chunk_size=3)
+    transcript = format_segment({'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_01',
+                                 'text': '911, what is the address?'})
+    grades = list(stream_grade_transcript(transcript, questions, 'Falls', client=client))
+    assert grades == [('CE_1', '1'), ('CE_2', '2')]
@@ -0,0 +1,162 @@
+"""
+Grading cache: hits and misses, expiry, LRU eviction, and the prompt version in the grades key
+
+LLM grades come from a stub Ollama client, no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_grading_cache.py
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.services import ai_grader
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache, content_key
+from JSONTranscriptionParser import format_segment
+from llm_client import LLMClient
+
+TRANSCRIPT_TEXT = format_segment({'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_01',
+                                  'text': '911, what is the address of the emergency?'})
+QUESTIONS = {'CE_1': 'What is the address of the emergency?', 'CE_2': 'What is the phone number?'}
+
+
+class RecordingOllama:
+    """Stands in for ollama.Client, answering every generation with a fixed response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def generate(self, **kwargs):
+        self.requests.append(kwargs)
+        return {'response': self.response}
+
+
+def stub_client(response):
+    client = LLMClient()
+    client._client = RecordingOllama(response)
+    return client
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GradingCache(path=tmp_path / 'cache.sqlite3', max_entries=3)
+
+
+def test_hit_and_miss(cache):
+    assert cache.get('grades', 'a') is None
+    cache.put('grades', 'a', {'CE_1': '1'})
+    assert cache.get('grades', 'a') == {'CE_1': '1'}
+    assert cache.get('detection', 'a') is None
+
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['namespaces']['grades'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    assert stats['namespaces']['detection'] == {'hits': 0, 'misses': 1, 'hit_rate': 0.0}
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = GradingCache(path=tmp_path / 'cache.sqlite3', max_age=0.05)
+    cache.put('grades', 'a', {'CE_1': '1'})
+    time.sleep(0.1)
+    assert cache.get('grades', 'a') is None
+    assert cache.evict() == 1
+
+
+def test_least_recently_used_are_evicted(cache):
+    for key in 'abcd':
+        cache.put('grades', key, key)
+        time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get('grades', 'a') == 'a'
+
+    assert cache.evict() == 1
+    assert cache.get('grades', 'b') is None
+    assert [cache.get('grades', key) for key in 'acd'] == ['a', 'c', 'd']
+
+
+def test_eviction_runs_on_writes(cache, monkeypatch):
+    monkeypatch.setattr(GradingCache, 'EVICT_EVERY', 2)
+    for key in 'abcdef':
+        cache.put('grades', key, key)
+    assert cache.stats()['entries'] <= cache.max_entries
+
+
+def test_least_recently_used_are_evicted_above_max_bytes(tmp_path):
+    cache = GradingCache(path=tmp_path / 'cache.sqlite3', max_bytes=250)
+    for key in 'abcd':
+        cache.put('grades', key, 'x' * 98)  # 100 bytes of JSON each
+        time.sleep(0.01)
+    assert cache.stats()['bytes'] == 400
+    assert cache.get('grades', 'a') is not None
+
+    assert cache.evict() == 2
+    assert [cache.get('grades', key) is not None for key in 'abcd'] == [True, False, False, True]
+    assert cache.stats()['bytes'] == 200
+
+
+def test_cache_without_value_sizes(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        'CREATE TABLE cache (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+        'created_at REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))'
+    )
+    # "é" as JSON is 4 bytes of UTF-8
+    conn.execute("INSERT INTO cache VALUES ('grades', 'a', '\"\u00e9\"', ?, ?)", (time.time(), time.time()))
+    conn.commit()
+    conn.close()
+
+    cache = GradingCache(path=path)
+    assert cache.get('grades', 'a') == '\u00e9'
+    assert cache.stats()['bytes'] == 4
+
+
+def test_content_key():
+    assert content_key('text', {'a': 1, 'b': 2}) == content_key('text', {'b': 2, 'a': 1})
+    assert content_key('text', {'a': 1}) != content_key('text ', {'a': 1})
+
+
+def test_grades_key_includes_prompt_version_and_model(cache, monkeypatch):
+    grader = AIGraderService(llm_client=LLMClient(model='llama3.1:8b'), cache=cache)
+    key = grader.grades_cache_key(TRANSCRIPT_TEXT, QUESTIONS, 'Falls')
+    assert key == grader.grades_cache_key(TRANSCRIPT_TEXT, dict(QUESTIONS), 'Falls')
+    assert key != grader.grades_cache_key(TRANSCRIPT_TEXT, QUESTIONS, 'Breathing Problems')
+
+    other_model = AIGraderService(llm_client=LLMClient(model='llama3.2:3b'), cache=cache)
+    assert key != other_model.grades_cache_key(TRANSCRIPT_TEXT, QUESTIONS, 'Falls')
+
+    monkeypatch.setattr(ai_grader, 'PROMPT_VERSION', ai_grader.PROMPT_VERSION + '-next')
+    assert key != grader.grades_cache_key(TRANSCRIPT_TEXT, QUESTIONS, 'Falls')
+
+
+def test_cached_grades_skip_the_llm(cache, monkeypatch):
+    client = stub_client(json.dumps({'CE_1': '1', 'CE_2': '2'}))
+    grader = AIGraderService(llm_client=client, cache=cache)
+
+    assert grader.ai_grade_prompt(TRANSCRIPT_TEXT, QUESTIONS, 'Falls') == ({'CE_1': '1', 'CE_2': '2'}, False)
+    assert grader.ai_grade_prompt(TRANSCRIPT_TEXT, QUESTIONS, 'Falls') == ({'CE_1': '1', 'CE_2': '2'}, True)
+    assert len(client.client.requests) == 1
+
+    # A new prompt version can't reuse grades made with the old prompt
+    monkeypatch.setattr(ai_grader, 'PROMPT_VERSION', ai_grader.PROMPT_VERSION + '-next')
+    assert grader.ai_grade_prompt(TRANSCRIPT_TEXT, QUESTIONS, 'Falls')[1] is False
+    assert len(client.client.requests) == 2
+
+
+def test_failed_grading_is_not_cached(cache):
+    client = stub_client('I cannot grade this call.')
+    grader = AIGraderService(llm_client=client, cache=cache)
+    assert grader.ai_grade_prompt(TRANSCRIPT_TEXT, QUESTIONS, 'Falls') == ({}, False)
+    assert grader.ai_grade_prompt(TRANSCRIPT_TEXT, QUESTIONS, 'Falls') == ({}, False)
+    assert len(client.client.requests) == 2
+    assert cache.stats()['entries'] == 0
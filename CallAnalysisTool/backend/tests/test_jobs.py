@@ -0,0 +1,221 @@
+"""
+Asynchronous grading jobs: submit, poll GET /api/jobs/<id>, callback URL check
+
+Grading itself is replaced by a canned result, no Ollama or model is needed.
+
+Run from the backend directory:
+    pytest tests/test_jobs.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.app import create_app
+from api.routes import grading
+from api.services import job_queue
+from api.services.job_queue import GradingJobQueue, JobStore, QueueFullError, is_local_callback_url
+
+TRANSCRIPT = {
+    'language': 'en',
+    'segments': [
+        {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_01', 'text': '911, what is the address of the emergency?'},
+        {'start': 3.0, 'end': 6.0, 'speaker': 'SPEAKER_00', 'text': '2817 Brompton Drive.'},
+    ],
+}
+
+GRADED = {'success': True, 'grades': {'CE_1': '1'}}
+
+# Seconds to wait for a job to finish
+POLL_TIMEOUT_S = 10
+
+
+def wait_for(get_job, job_id):
+    """Poll until the job is finished"""
+    deadline = time.monotonic() + POLL_TIMEOUT_S
+    while time.monotonic() < deadline:
+        job = get_job(job_id)
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return GradingJobQueue(max_workers=2, max_pending=4, result_ttl=60, store=JobStore(tmp_path / 'jobs.sqlite3'))
+
+
+@pytest.fixture
+def client(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, '_job_queue', queue)
+    monkeypatch.setattr(grading, 'run_grading', lambda *args, **kwargs: (GRADED, 200))
+    return create_app(warm_up=False).test_client()
+
+
+class CallbackServer:
+    """Local HTTP server that records the JSON bodies POSTed to it"""
+
+    def __init__(self):
+        self.bodies = []
+        self.received = threading.Event()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                outer.bodies.append(json.loads(self.rfile.read(length)))
+                self.send_response(204)
+                self.end_headers()
+                outer.received.set()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/done'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_submit_and_poll(queue):
+    job = queue.submit(lambda: (GRADED, 200))
+    assert job['status'] in ('queued', 'running', 'completed')
+
+    job = wait_for(queue.get, job['job_id'])
+    assert job['status'] == 'completed'
+    assert job['http_status'] == 200
+    assert job['result'] == GRADED
+    assert job['finished_at'] >= job['started_at'] >= job['submitted_at']
+
+
+def test_failing_job(queue):
+    def work():
+        raise RuntimeError('model not loaded')
+
+    job = wait_for(queue.get, queue.submit(work)['job_id'])
+    assert job['status'] == 'failed'
+    assert job['http_status'] == 500
+    assert 'model not loaded' in job['result']['error']
+
+
+def test_queue_full(queue):
+    release = threading.Event()
+
+    def work():
+        release.wait(POLL_TIMEOUT_S)
+        return GRADED, 200
+
+    for _ in range(queue.max_pending):
+        queue.submit(work)
+    try:
+        with pytest.raises(QueueFullError):
+            queue.submit(lambda: (GRADED, 200))
+    finally:
+        release.set()
+
+
+def test_job_of_dead_worker_fails(queue):
+    job_id = queue.submit(lambda: (GRADED, 200))['job_id']
+    wait_for(queue.get, job_id)
+    queue.store.update(job_id, status='running', finished_at=None)
+    # Above the largest PID Linux hands out
+    queue.store._connection().execute('UPDATE jobs SET worker_pid = ? WHERE job_id = ?', (2 ** 22 + 1, job_id))
+
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert 'worker exited' in job['result']['error']
+
+
+@pytest.mark.skipif(job_queue.process_token(os.getpid()) is None, reason='needs /proc')
+def test_job_of_reused_pid_fails(queue):
+    job_id = queue.submit(lambda: (GRADED, 200))['job_id']
+    wait_for(queue.get, job_id)
+    queue.store.update(job_id, status='running', finished_at=None)
+    # A live PID (this process) that belonged to another process when the job was stored
+    queue.store._connection().execute(
+        'UPDATE jobs SET worker_pid = ?, worker_token = ? WHERE job_id = ?', (os.getpid(), 'earlier-boot:1', job_id)
+    )
+
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert 'worker exited' in job['result']['error']
+
+
+def test_job_table_without_worker_tokens(tmp_path):
+    path = tmp_path / 'jobs.sqlite3'
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        'CREATE TABLE jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, submitted_at REAL NOT NULL, '
+        'started_at REAL, finished_at REAL, http_status INTEGER, result TEXT, callback_url TEXT, '
+        'worker_pid INTEGER NOT NULL)'
+    )
+    conn.close()
+
+    queue = GradingJobQueue(max_workers=1, store=JobStore(path))
+    job_id = queue.submit(lambda: (GRADED, 200))['job_id']
+    assert wait_for(queue.get, job_id)['status'] == 'completed'
+
+
+@pytest.mark.parametrize('url, allowed', [
+    ('http://localhost:9000/done', True),
+    ('https://127.0.0.1/hook', True),
+    ('http://[::1]:8080/', True),
+    ('http://example.com/hook', False),
+    ('http://localhost.example.com/hook', False),
+    ('ftp://localhost/hook', False),
+    ('file:///etc/passwd', False),
+    ('localhost:9000', False),
+])
+def test_is_local_callback_url(url, allowed):
+    assert is_local_callback_url(url) is allowed
+
+
+def test_callback_receives_finished_job(queue):
+    with CallbackServer() as callback:
+        queue.submit(lambda: (GRADED, 200), callback_url=callback.url)
+        assert callback.received.wait(POLL_TIMEOUT_S)
+
+    body = callback.bodies[0]
+    assert body['status'] == 'completed'
+    assert body['result'] == GRADED
+    assert 'callback_url' not in body
+
+
+def test_async_route_submit_and_poll(client):
+    response = client.post('/api/grade?async=true', json=TRANSCRIPT)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    job = wait_for(lambda job_id: client.get(f'/api/jobs/{job_id}').get_json(), job_id)
+    assert job['status'] == 'completed'
+    assert job['result'] == GRADED
+    assert 'callback_url' not in job
+
+
+def test_async_route_rejects_remote_callback(client, queue):
+    response = client.post('/api/grade?async=true&callback_url=http://example.com/hook', json=TRANSCRIPT)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid callback_url'
+    assert queue.stats()['queued'] == 0
+
+
+def test_unknown_job(client):
+    response = client.get('/api/jobs/does-not-exist')
+    assert response.status_code == 404
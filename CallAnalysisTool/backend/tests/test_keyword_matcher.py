@@ -0,0 +1,87 @@
+"""
+KeywordMatcher must find the same keyword hits as the per-keyword re.search loop it replaced
+
+Run from the backend directory:
+    pytest tests/test_keyword_matcher.py
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from detect_naturecode import COMMON_WORDS, KEYWORDS_PATH, KeywordMatcher
+
+SEGMENTS = [
+    "My husband can't breathe, he's wheezing and turning blue.",
+    "She fell down the stairs and hit her head, there's blood everywhere.",
+    "He has chest pain and his left arm is numb.",
+    "I think it's a heart attack, he's sweating and short of breath.",
+    "The car rolled over on the highway, two people are trapped.",
+    "She took a bunch of pills, I don't know how many.",
+    "He was stung by a bee and his throat is swelling up.",
+    "Is s/he awake? Is she breathing?",
+    "headache-free since Tuesday, no seizures, no fever",
+    "The baby is coming, her water broke and the contractions are 2 minutes apart.",
+    "heartattack",
+    "",
+    "...",
+]
+
+
+def load_keywords():
+    with open(KEYWORDS_PATH) as f:
+        return json.load(f)
+
+
+def regex_hits(nature_keywords, segment_lower):
+    """The per-keyword loop detect_nature_codes used before KeywordMatcher"""
+    hits = {}
+    for nature, keywords in nature_keywords.items():
+        found = set()
+        for kw in keywords:
+            kw_low = kw.lower()
+            if re.search(rf"\b{re.escape(kw_low)}\b", segment_lower):
+                if kw_low in COMMON_WORDS and nature != "Sick Person (Specific Diagnosis)":
+                    continue
+                found.add(kw_low)
+        if found:
+            hits[nature] = found
+    return hits
+
+
+@pytest.mark.parametrize('segment', SEGMENTS)
+def test_matcher_agrees_with_regex_loop(segment):
+    nature_keywords = load_keywords()
+    matcher = KeywordMatcher(nature_keywords)
+    segment_lower = segment.lower()
+    assert dict(matcher.match(segment_lower)) == regex_hits(nature_keywords, segment_lower)
+
+
+def test_matcher_agrees_on_every_keyword():
+    """Every keyword in nature_keywords.json, alone and inside a sentence"""
+    nature_keywords = load_keywords()
+    matcher = KeywordMatcher(nature_keywords)
+    for keywords in nature_keywords.values():
+        for kw in keywords:
+            for segment in (kw, f"caller says {kw}, then stops", f"x{kw}y"):
+                segment_lower = segment.lower()
+                assert dict(matcher.match(segment_lower)) == regex_hits(nature_keywords, segment_lower), segment
+
+
+def test_word_boundaries_and_common_words():
+    matcher = KeywordMatcher({
+        "Falls": ["fell", "fell down"],
+        "Other": ["pain"],
+        "Sick Person (Specific Diagnosis)": ["pain"],
+    })
+    assert matcher.match("she fell down") == {"Falls": {"fell", "fell down"}}
+    assert matcher.match("she fell downstairs") == {"Falls": {"fell"}}
+    assert matcher.match("fellow") == {}
+    # "pain" is a common word, it only counts for Sick Person (Specific Diagnosis)
+    assert matcher.match("chest pain") == {"Sick Person (Specific Diagnosis)": {"pain"}}
@@ -0,0 +1,175 @@
+"""
+GET /api/metrics: Prometheus text format, stage histograms, LLM and cache totals,
+and worker processes adding up in multiprocess mode
+
+No Ollama or model is needed.
+
+Run from the backend directory:
+    pytest tests/test_metrics.py
+"""
+
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.app import create_app
+from api.services import metrics
+from api.services.grading_cache import GradingCache
+from api.services.metrics import REGISTRY, StageTimer, track_grading
+from llm_client import LLMClient
+
+EXPECTED_TYPES = {
+    'ems_grading_stage_seconds': 'histogram',
+    'ems_grading_stages_in_flight': 'gauge',
+    'ems_grading_seconds': 'histogram',
+    'ems_gradings': 'counter',
+    'ems_gradings_in_flight': 'gauge',
+    'ems_llm_queue_wait_seconds': 'histogram',
+    'ems_llm_generation_seconds': 'histogram',
+    'ems_llm_calls': 'counter',
+    'ems_llm_errors': 'counter',
+    'ems_llm_in_flight': 'gauge',
+    'ems_llm_waiting': 'gauge',
+    'ems_cache_hits': 'counter',
+    'ems_cache_misses': 'counter',
+}
+
+
+def value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def scrape():
+    response = create_app(warm_up=False).test_client().get('/api/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    return {family.name: family for family in text_string_to_metric_families(response.get_data(as_text=True))}
+
+
+def test_metrics_endpoint_format():
+    with track_grading('grade'):
+        StageTimer().add('parse', 0.002)
+
+    families = scrape()
+    assert {name: families[name].type for name in EXPECTED_TYPES} == EXPECTED_TYPES
+
+    buckets = [s for s in families['ems_grading_stage_seconds'].samples
+               if s.name.endswith('_bucket') and s.labels['stage'] == 'parse']
+    assert buckets[-1].labels['le'] == '+Inf'
+    counts = [s.value for s in buckets]
+    assert counts == sorted(counts)
+
+
+def test_stage_histogram_observes_every_run():
+    before_count = value('ems_grading_stage_seconds_count', stage='llm')
+    before_fast = value('ems_grading_stage_seconds_bucket', stage='llm', le='0.5')
+    timer = StageTimer()
+
+    # Two concurrent runs of the same stage, e.g. two question groups
+    threads = [threading.Thread(target=timer.add, args=('llm', seconds)) for seconds in (0.2, 2.0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with timer.stage('format'):
+        assert value('ems_grading_stages_in_flight', stage='format') == 1
+    assert value('ems_grading_stages_in_flight', stage='format') == 0
+
+    assert value('ems_grading_stage_seconds_count', stage='llm') == before_count + 2
+    assert value('ems_grading_stage_seconds_bucket', stage='llm', le='0.5') == before_fast + 1
+    # The metadata sums the runs, which can exceed the wall time
+    timings = timer.metadata()
+    assert timings['llm_s'] == 2.2
+    assert timings['llm_s'] > timings['total_s']
+
+
+def test_grading_outcomes():
+    before = value('ems_gradings_total', mode='batch', outcome='error')
+    with pytest.raises(RuntimeError):
+        with track_grading('batch'):
+            raise RuntimeError('no nature codes')
+    assert value('ems_gradings_total', mode='batch', outcome='error') == before + 1
+    assert value('ems_gradings_in_flight', mode='batch') == 0
+
+
+class FailingOllama:
+    """Stands in for ollama.Client, failing every second generation"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, **kwargs):
+        self.calls += 1
+        if self.calls % 2 == 0:
+            raise ConnectionError('Ollama is not running')
+        return {'response': '{}'}
+
+
+def test_llm_client_totals():
+    client = LLMClient(max_concurrency=1)
+    client._client = FailingOllama()
+    calls, errors = value('ems_llm_calls_total'), value('ems_llm_errors_total')
+
+    client.generate('prompt')
+    with pytest.raises(ConnectionError):
+        client.generate('prompt')
+
+    assert value('ems_llm_calls_total') == calls + 2
+    assert value('ems_llm_errors_total') == errors + 1
+    assert value('ems_llm_in_flight') == 0
+    assert value('ems_llm_waiting') == 0
+
+
+def test_cache_lookups(tmp_path):
+    cache = GradingCache(path=tmp_path / 'cache.sqlite3')
+    hits, misses = value('ems_cache_hits_total', namespace='grades'), value('ems_cache_misses_total', namespace='grades')
+
+    cache.get('grades', 'a')
+    cache.put('grades', 'a', {'CE_1': '1'})
+    cache.get('grades', 'a')
+
+    assert value('ems_cache_hits_total', namespace='grades') == hits + 1
+    assert value('ems_cache_misses_total', namespace='grades') == misses + 1
+
+
+GRADE_IN_WORKER = '''
+from api.services.metrics import StageTimer, track_grading
+with track_grading("grade"):
+    StageTimer().add("parse", 0.01)
+'''
+
+SCRAPE_IN_WORKER = '''
+import json
+from prometheus_client.parser import text_string_to_metric_families
+from api.services.metrics import render
+body, _ = render()
+print(json.dumps({s.name: s.value for f in text_string_to_metric_families(body.decode())
+                  for s in f.samples if s.labels.get("mode", s.labels.get("stage")) in ("grade", "parse")}))
+'''
+
+
+def run_worker(code, metrics_dir):
+    env = {'PATH': '', 'PYTHONPATH': str(BACKEND_DIR), 'PROMETHEUS_MULTIPROC_DIR': str(metrics_dir)}
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_multiprocess_workers_add_up(tmp_path):
+    run_worker(GRADE_IN_WORKER, tmp_path)
+    run_worker(GRADE_IN_WORKER, tmp_path)
+
+    samples = json.loads(run_worker(SCRAPE_IN_WORKER, tmp_path))
+    assert samples['ems_gradings_total'] == 2
+    assert samples['ems_grading_seconds_count'] == 2
+    assert samples['ems_grading_stage_seconds_count'] == 2
+    assert samples['ems_gradings_in_flight'] == 0
@@ -0,0 +1,93 @@
+"""
+Which nature codes get graded: the primary code in single-code mode, the triggered
+codes other than Case Entry when EMS_MAX_NATURE_CODES is above 1
+
+LLM grades come from a stub Ollama client, no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_nature_code_selection.py
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache
+from detect_naturecode import DetectionResult, NatureCodeMatch
+from JSONTranscriptionParser import format_segment
+from llm_client import LLMClient
+
+TRANSCRIPT_DATA = {
+    'segments': [
+        {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_00', 'text': '911, what is the address of the emergency?'},
+        {'start': 3.0, 'end': 6.0, 'speaker': 'SPEAKER_01', 'text': 'My father fell down the stairs.'},
+    ]
+}
+TRANSCRIPT_TEXT = ''.join(format_segment(segment) for segment in TRANSCRIPT_DATA['segments'])
+
+
+class GradingOllama:
+    """Stands in for ollama.Client, grading every question of the prompt as Asked Correctly"""
+
+    def generate(self, prompt, **kwargs):
+        question_ids = dict.fromkeys(re.findall(r'\b(?:CE|NC)_\w+', prompt))
+        return {'response': json.dumps({q_id: '1' for q_id in question_ids})}
+
+
+def detection(*codes):
+    return DetectionResult(nature_codes=[NatureCodeMatch(name, confidence, [], confidence) for name, confidence in codes])
+
+
+@pytest.fixture
+def make_grader(tmp_path):
+    def make(max_nature_codes):
+        client = LLMClient()
+        client._client = GradingOllama()
+        return AIGraderService(llm_client=client, cache=GradingCache(tmp_path / 'cache.sqlite3'),
+                               max_nature_codes=max_nature_codes)
+    return make
+
+
+def test_single_code_mode_grades_the_primary_code(make_grader):
+    grader = make_grader(1)
+    assert grader.select_nature_codes(detection(('Case Entry', 0.9), ('Falls', 0.6))) == [('Case Entry', 0.9)]
+
+    result = grader.grade_detected(TRANSCRIPT_DATA, TRANSCRIPT_TEXT, detection(('Case Entry', 0.9), ('Falls', 0.6)))
+    assert result.nature_code == 'Case Entry'
+
+
+def test_one_triggered_code_besides_case_entry_is_graded(make_grader):
+    grader = make_grader(3)
+    assert grader.select_nature_codes(detection(('Case Entry', 0.9), ('Falls', 0.6))) == [('Falls', 0.6)]
+
+    result = grader.grade_detected(TRANSCRIPT_DATA, TRANSCRIPT_TEXT, detection(('Case Entry', 0.9), ('Falls', 0.6)))
+    assert result.nature_code == 'Falls'
+    assert any(q_id.startswith('NC_') for q_id in result.questions)
+    assert any(q_id.startswith('CE_') for q_id in result.questions)
+
+
+def test_several_triggered_codes_share_the_primary(make_grader):
+    grader = make_grader(3)
+    codes = detection(('Case Entry', 0.9), ('Falls', 0.6), ('Breathing Problems', 0.5))
+    assert [code for code, _ in grader.select_nature_codes(codes)] == ['Falls', 'Breathing Problems']
+
+    result = grader.grade_detected(TRANSCRIPT_DATA, TRANSCRIPT_TEXT, codes)
+    assert result.nature_code == 'Falls'
+    assert [entry['nature_code'] for entry in result.breakdown] == ['Falls', 'Breathing Problems']
+
+
+def test_stream_grades_the_selected_code(make_grader, monkeypatch):
+    grader = make_grader(3)
+    monkeypatch.setattr(grader, 'detect', lambda transcript_text: detection(('Case Entry', 0.9), ('Falls', 0.6)))
+
+    event, payload = next(grader.stream_grade(TRANSCRIPT_DATA))
+    assert event == 'nature_code'
+    assert payload['nature_code'] == 'Falls'
+    assert payload['confidence'] == 0.6
@@ -0,0 +1,247 @@
+"""
+Results store: keyset pagination of stored grading results, and analytics rollups that
+agree with the stored results
+
+Run from the backend directory:
+    pytest tests/test_results_store.py
+"""
+
+import random
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.app import create_app
+from api.services import results_store
+from api.services.results_store import InvalidCursorError, ResultsStore, question_sections, result_day
+from AIGrader import EXCLUDED_CODES, is_missed
+
+NATURE_CODES = ['Falls', 'Breathing Problems', 'Chest Pain']
+
+GRADE_CODES = ['1', '2', '3', '4', '5', '6', 'RC']
+
+# Fixed creation time (2025-01-01 UTC); several results share each timestamp to exercise the id tie-break
+START = 1735689600.0
+
+
+def make_response(index, nature_code=None, grades=None, percentage=None):
+    """Grading response shaped like the /api/grade body"""
+    return {
+        'success': True,
+        'filename': f'call_{index % 5}.json',
+        'detected_nature_code': nature_code or NATURE_CODES[index % len(NATURE_CODES)],
+        'grade_percentage': percentage if percentage is not None else float(index * 7 % 100),
+        'grades': grades or {},
+    }
+
+
+class Clock:
+    """time.time() stand-in for the store, every call returns the next preset timestamp"""
+
+    def __init__(self, times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(tmp_path / 'results.sqlite3')
+
+
+def save_all(store, monkeypatch, responses, times):
+    monkeypatch.setattr(results_store.time, 'time', Clock(times))
+    return [store.save(response) for response in responses]
+
+
+def all_pages(store, limit, **filters):
+    """Follow next_cursor to the last page"""
+    pages = []
+    cursor = None
+    while True:
+        page = store.list(limit=limit, cursor=cursor, **filters)
+        pages.append(page['results'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def saved(store, monkeypatch):
+    """25 results, three per timestamp"""
+    responses = [make_response(index) for index in range(25)]
+    save_all(store, monkeypatch, responses, [START + index // 3 for index in range(25)])
+    return responses
+
+
+def newest_first(rows):
+    return sorted(rows, key=lambda row: (row['created_at'], row['result_id']), reverse=True)
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 25, 100])
+def test_pages_cover_every_result_once(store, saved, limit):
+    pages = all_pages(store, limit)
+    rows = [row for page in pages for row in page]
+
+    assert len(rows) == len(saved)
+    assert len({row['result_id'] for row in rows}) == len(saved)
+    assert rows == newest_first(rows)
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_pages_with_filters(store, saved):
+    rows = [row for page in all_pages(store, 2, nature_code='Falls', min_grade=20) for row in page]
+    expected = [r for r in saved if r['detected_nature_code'] == 'Falls' and r['grade_percentage'] >= 20]
+
+    assert {row['result_id'] for row in rows} == {r['result_id'] for r in expected}
+    assert rows == newest_first(rows)
+
+
+def test_results_saved_while_paging_are_not_repeated(store, saved, monkeypatch):
+    first = store.list(limit=10)
+    # Newer results land before the cursor, they don't shift the next page
+    save_all(store, monkeypatch, [make_response(index) for index in range(25, 30)], [START + 100] * 5)
+    second = store.list(limit=10, cursor=first['next_cursor'])
+
+    older = newest_first([{'result_id': r['result_id'], 'created_at': START + i // 3} for i, r in enumerate(saved)])
+    assert [row['result_id'] for row in first['results'] + second['results']] == [
+        row['result_id'] for row in older[:20]
+    ]
+
+
+def test_last_page_has_no_cursor(store, saved):
+    assert store.list(limit=len(saved))['next_cursor'] is None
+    assert store.list(limit=len(saved) - 1)['next_cursor'] is not None
+
+
+def test_invalid_cursor(store):
+    with pytest.raises(InvalidCursorError):
+        store.list(cursor='not-a-cursor')
+
+
+def test_results_route_pages(store, saved, monkeypatch):
+    monkeypatch.setattr(results_store, '_store', store)
+    client = create_app(warm_up=False).test_client()
+
+    first = client.get('/api/results?limit=10').get_json()
+    second = client.get(f"/api/results?limit=10&cursor={first['next_cursor']}").get_json()
+    assert not {r['result_id'] for r in first['results']} & {r['result_id'] for r in second['results']}
+
+    assert client.get('/api/results?cursor=not-a-cursor').status_code == 400
+
+
+def graded_response(index, rng):
+    """Response with random Case Entry and nature code grades, some with a secondary nature code"""
+    primary = NATURE_CODES[index % len(NATURE_CODES)]
+    case_entry = {f'CE_{q}': {'code': rng.choice(GRADE_CODES), 'label': f'Case Entry {q}'} for q in range(1, 5)}
+    sections = [(primary, {f'NC_{q}': {'code': rng.choice(GRADE_CODES), 'label': f'{primary} {q}'} for q in range(1, 4)})]
+    if index % 4 == 0:
+        secondary = NATURE_CODES[(index + 1) % len(NATURE_CODES)]
+        sections.append((secondary, {f'NC_{q}': {'code': rng.choice(GRADE_CODES), 'label': f'{secondary} {q}'}
+                                     for q in range(1, 3)}))
+
+    response = make_response(index, nature_code=primary, percentage=round(rng.uniform(0, 100), 1),
+                             grades={**case_entry, **sections[0][1]})
+    if len(sections) > 1:
+        response['nature_codes'] = [{'nature_code': code, 'grades': grades} for code, grades in sections]
+    return response
+
+
+def expected_rollups(responses):
+    """Rollups recomputed from the responses the slow way"""
+    nature_codes = defaultdict(lambda: {'results': 0, 'grade_sum': 0.0, 'graded_questions': 0, 'missed_questions': 0})
+    questions = defaultdict(lambda: {'graded': 0, 'missed': 0})
+    for response in responses:
+        totals = nature_codes[response['detected_nature_code']]
+        totals['results'] += 1
+        totals['grade_sum'] += response['grade_percentage']
+        for section_code, grades in question_sections(response):
+            for q_id, grade in grades.items():
+                if grade['code'] in EXCLUDED_CODES:
+                    continue
+                missed = int(is_missed(grade['code']))
+                questions[(section_code, q_id)]['graded'] += 1
+                questions[(section_code, q_id)]['missed'] += missed
+                if section_code in ('Case Entry', response['detected_nature_code']):
+                    totals['graded_questions'] += 1
+                    totals['missed_questions'] += missed
+    return nature_codes, questions
+
+
+@pytest.fixture
+def graded(store, monkeypatch):
+    """40 graded results over 4 days"""
+    rng = random.Random(7)
+    responses = [graded_response(index, rng) for index in range(40)]
+    save_all(store, monkeypatch, responses, [START + (index % 4) * 86400 + index for index in range(40)])
+    return responses
+
+
+def test_nature_code_rollup_matches_results(store, graded):
+    nature_codes, _ = expected_rollups(graded)
+    stats = {row['nature_code']: row for row in store.nature_code_stats()}
+
+    assert set(stats) == set(nature_codes)
+    for code, totals in nature_codes.items():
+        assert stats[code]['results'] == totals['results']
+        assert stats[code]['average_grade'] == round(totals['grade_sum'] / totals['results'], 1)
+        assert stats[code]['graded_questions'] == totals['graded_questions']
+        assert stats[code]['missed_questions'] == totals['missed_questions']
+    assert sum(row['results'] for row in stats.values()) == len(graded)
+
+
+def test_question_rollup_matches_results(store, graded):
+    _, questions = expected_rollups(graded)
+    rows = store.question_stats(limit=1000)
+
+    assert {(row['nature_code'], row['question_id']): (row['graded'], row['missed']) for row in rows} == {
+        key: (counts['graded'], counts['missed']) for key, counts in questions.items()
+    }
+    assert [row['miss_rate'] for row in rows] == sorted((row['miss_rate'] for row in rows), reverse=True)
+
+    case_entry = store.question_stats(nature_code='Case Entry', limit=1000)
+    assert {row['question_id'] for row in case_entry} == {q for code, q in questions if code == 'Case Entry'}
+
+
+def test_daily_rollup_matches_results(store, graded):
+    days = defaultdict(list)
+    for index, response in enumerate(graded):
+        days[result_day(START + (index % 4) * 86400 + index)].append(response['grade_percentage'])
+
+    trend = store.grade_trend()
+    assert [row['day'] for row in trend] == sorted(days)
+    for row in trend:
+        assert row['results'] == len(days[row['day']])
+        assert row['average_grade'] == round(sum(days[row['day']]) / len(days[row['day']]), 1)
+
+    falls = store.grade_trend(nature_code='Falls', since=trend[1]['day'])
+    assert sum(row['results'] for row in falls) == sum(
+        1 for index, r in enumerate(graded)
+        if r['detected_nature_code'] == 'Falls' and index % 4 >= 1
+    )
+
+
+def test_rebuilt_rollups_match_incremental(store, graded):
+    before = (store.nature_code_stats(), store.question_stats(limit=1000), store.grade_trend())
+    conn = store._connection()
+    store._rebuild_rollups(conn)
+    assert (store.nature_code_stats(), store.question_stats(limit=1000), store.grade_trend()) == before
+
+
+def test_rollups_built_for_results_stored_before_them(store, graded):
+    """A database with results but empty rollups (saved before the rollups existed) is backfilled on open"""
+    before = (store.nature_code_stats(), store.question_stats(limit=1000), store.grade_trend())
+    conn = store._connection()
+    with conn:
+        for table in ('rollup_nature_code', 'rollup_question', 'rollup_daily'):
+            conn.execute(f'DELETE FROM {table}')
+
+    reopened = ResultsStore(store.path)
+    assert (reopened.nature_code_stats(), reopened.question_stats(limit=1000), reopened.grade_trend()) == before
@@ -0,0 +1,55 @@
+"""
+Startup budget for the API process
+create_app() must stay cheap: models are loaded on first use or by warm-up, not at import
+
+Run from the backend directory:
+    pytest tests/test_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Seconds allowed for importing the app and calling create_app() in a fresh interpreter
+STARTUP_BUDGET_S = float(os.environ.get('EMS_STARTUP_BUDGET_S', '2.0'))
+
+# Modules that mean a model (or its framework) was loaded during startup
+HEAVY_MODULES = ['torch', 'sentence_transformers', 'sklearn', 'onnxruntime']
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from api.app import create_app
+create_app(warm_up=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'elapsed': elapsed,
+    'heavy_modules': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_startup():
+    """Time create_app() in a fresh interpreter so earlier imports don't hide the cost"""
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), EMS_WARMUP='0')
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_create_app_does_not_load_models():
+    result = run_startup()
+    assert result['heavy_modules'] == []
+
+
+def test_create_app_within_budget():
+    result = run_startup()
+    assert result['elapsed'] < STARTUP_BUDGET_S, (
+        f"create_app() took {result['elapsed']:.2f}s, budget is {STARTUP_BUDGET_S:.2f}s"
+    )
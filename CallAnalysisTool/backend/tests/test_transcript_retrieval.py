@@ -0,0 +1,108 @@
+"""
+Retrieval pruning: each question group is graded against the transcript segments most
+similar to its questions, with the left-out stretches marked
+
+The embedding model is replaced by the stub embedder (tests/conftest.py) and LLM grades
+come from a stub Ollama client, no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_transcript_retrieval.py
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache
+from JSONTranscriptionParser import format_segment
+from llm_client import LLMClient
+from transcript_retrieval import OMITTED_MARKER, prune_transcript, select_segments, split_segments
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 3.0, 'speaker': 'SPEAKER_00', 'text': '911, what is the address of the emergency?'},
+    {'start': 3.0, 'end': 6.0, 'speaker': 'SPEAKER_01', 'text': 'It is 2817 Brompton Drive.'},
+    {'start': 6.0, 'end': 9.0, 'speaker': 'SPEAKER_00', 'text': 'Okay, tell me exactly what happened.'},
+    {'start': 9.0, 'end': 12.0, 'speaker': 'SPEAKER_01', 'text': 'My father fell down the stairs.'},
+    {'start': 12.0, 'end': 15.0, 'speaker': 'SPEAKER_00', 'text': 'Is he breathing normally?'},
+    {'start': 15.0, 'end': 18.0, 'speaker': 'SPEAKER_01', 'text': 'Yes, but he keeps asking where he is.'},
+    {'start': 18.0, 'end': 21.0, 'speaker': 'SPEAKER_00', 'text': 'Stay on the line with me.'},
+    {'start': 21.0, 'end': 24.0, 'speaker': 'SPEAKER_01', 'text': 'Okay, I will.'},
+]
+LINES = [format_segment(segment).strip() for segment in SEGMENTS]
+TRANSCRIPT_TEXT = ''.join(format_segment(segment) for segment in SEGMENTS)
+
+ADDRESS = {'CE_1': 'What is the address of the emergency?'}
+BREATHING = {'NC_1': 'Is he breathing normally?'}
+
+
+class RecordingOllama:
+    """Stands in for ollama.Client, recording prompts and grading every question as Asked Correctly"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        question_ids = dict.fromkeys(re.findall(r'\b(?:CE|NC)_\w+', prompt))
+        return {'response': json.dumps({q_id: '1' for q_id in question_ids})}
+
+
+def test_select_segments_keeps_hits_and_neighbours():
+    segment_embeddings = np.eye(6)
+
+    assert select_segments(segment_embeddings, segment_embeddings[[2]], top_k=1, window=1) == [1, 2, 3]
+    assert select_segments(segment_embeddings, segment_embeddings[[2]], top_k=1, window=0) == [2]
+    assert select_segments(segment_embeddings, segment_embeddings[[0, 5]], top_k=1, window=1) == [0, 1, 4, 5]
+    assert select_segments(np.empty((0, 6)), segment_embeddings[[2]]) == []
+
+
+def test_pruned_transcript_marks_left_out_segments(stub_embedder):
+    pruned, kept, total = prune_transcript(TRANSCRIPT_TEXT, ADDRESS, top_k=1, window=1)
+
+    assert (kept, total) == (2, len(SEGMENTS))
+    assert pruned.splitlines() == [LINES[0], LINES[1], OMITTED_MARKER]
+
+    pruned, kept, _ = prune_transcript(TRANSCRIPT_TEXT, BREATHING, top_k=1, window=0)
+    assert kept == 1
+    assert pruned.splitlines() == [OMITTED_MARKER, LINES[4], OMITTED_MARKER]
+
+
+def test_transcript_is_kept_whole_when_nothing_is_left_out(stub_embedder):
+    assert prune_transcript(TRANSCRIPT_TEXT, ADDRESS, top_k=len(SEGMENTS)) == (TRANSCRIPT_TEXT, len(SEGMENTS), len(SEGMENTS))
+
+
+def test_detection_embeddings_are_reused(stub_embedder):
+    segment_embeddings = stub_embedder.encode(split_segments(TRANSCRIPT_TEXT))
+    stub_embedder.encoded.clear()
+
+    prune_transcript(TRANSCRIPT_TEXT, ADDRESS, segment_embeddings, top_k=1, window=0)
+    assert not set(stub_embedder.encoded) & set(LINES)
+
+
+def test_each_question_group_gets_its_own_segments(stub_embedder, tmp_path):
+    ollama = RecordingOllama()
+    client = LLMClient()
+    client._client = ollama
+    grader = AIGraderService(llm_client=client, cache=GradingCache(tmp_path / 'cache.sqlite3'),
+                             question_grouping='nature', retrieval=True, retrieval_top_k=1, retrieval_window=0)
+
+    retrieval_stats = {}
+    grades, _ = grader.ai_grade(TRANSCRIPT_TEXT, {**ADDRESS, **BREATHING}, 'Falls', retrieval_stats=retrieval_stats)
+
+    assert grades == {'CE_1': '1', 'NC_1': '1'}
+    address_prompt = next(prompt for prompt in ollama.prompts if 'CE_1' in prompt)
+    breathing_prompt = next(prompt for prompt in ollama.prompts if 'NC_1' in prompt)
+    assert LINES[0] in address_prompt and LINES[4] not in address_prompt
+    assert LINES[4] in breathing_prompt and LINES[0] not in breathing_prompt
+    assert OMITTED_MARKER in address_prompt and OMITTED_MARKER in breathing_prompt
+
+    assert retrieval_stats['segments_kept'] == [1, 1]
+    assert retrieval_stats['segments_total'] == len(SEGMENTS)
+    assert retrieval_stats['prompt_tokens_after'] < retrieval_stats['prompt_tokens_before']
@@ -0,0 +1,169 @@
+"""
+Streaming transcript uploads (POST /api/upload): multipart and raw bodies, 413 and 400 paths
+
+Grading itself is replaced by a recorder, no Ollama or model is needed.
+
+Run from the backend directory:
+    pytest tests/test_transcript_upload.py
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from api.app import create_app
+from api.routes import grading
+from api.services.transcript_upload import TranscriptStreamParser
+from JSONTranscriptionParser import transcript_to_text
+
+SAMPLE_PATH = BACKEND_DIR / 'tests' / 'test_transcript.json'
+
+
+def load_sample():
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def graded(monkeypatch):
+    """Arguments of every run_grading call"""
+    calls = []
+
+    def run_grading(transcript_data, show_evidence=False, filename=None, error_label='Grading failed',
+                    transcript_text=None):
+        calls.append({'transcript_data': transcript_data, 'filename': filename, 'transcript_text': transcript_text})
+        return {'success': True}, 200
+
+    monkeypatch.setattr(grading, 'run_grading', run_grading)
+    return calls
+
+
+@pytest.fixture
+def client(graded):
+    return create_app(warm_up=False).test_client()
+
+
+def upload(client, body, filename='call.json', query='', **form):
+    data = {**form, 'file': (io.BytesIO(body), filename)}
+    return client.post(f'/api/upload{query}', data=data, content_type='multipart/form-data')
+
+
+def test_multipart_upload(client, graded):
+    transcript = load_sample()
+    # Fields before the file and per-segment extras (word timings) must not get in the way
+    transcript['segments'][0]['words'] = [{'word': 'Norman', 'start': 0.0, 'end': 0.4}]
+    response = upload(client, json.dumps(transcript).encode(), filename='../call 1.json', notes='first call')
+
+    assert response.status_code == 200
+    call = graded[0]
+    assert call['filename'] == 'call_1.json'
+    assert call['transcript_text'] == transcript_to_text(load_sample())
+    assert call['transcript_data']['segment_count'] == len(transcript['segments'])
+    assert call['transcript_data']['language'] == transcript['language']
+    assert 'segments' not in call['transcript_data']
+
+
+def test_raw_body_upload(client, graded):
+    body = SAMPLE_PATH.read_bytes()
+    response = client.post('/api/upload?filename=call.json', data=body, content_type='application/json')
+
+    assert response.status_code == 200
+    assert graded[0]['filename'] == 'call.json'
+    assert graded[0]['transcript_text'] == transcript_to_text(load_sample())
+
+
+def test_upload_over_content_length_limit(client, graded, monkeypatch):
+    monkeypatch.setenv('EMS_UPLOAD_MAX_BYTES', '1000')
+    response = upload(client, SAMPLE_PATH.read_bytes())
+
+    assert response.status_code == 413
+    assert response.get_json()['error'] == 'Upload too large'
+    assert graded == []
+
+
+def test_chunked_upload_over_limit(client, graded, monkeypatch):
+    """No Content-Length to check up front, the limit is enforced while reading"""
+    monkeypatch.setenv('EMS_UPLOAD_MAX_BYTES', '1000')
+    # The server de-chunks the body and marks the input as terminated (as gunicorn does)
+    response = client.post(
+        '/api/upload', input_stream=io.BytesIO(SAMPLE_PATH.read_bytes()), content_type='application/json',
+        headers={'Transfer-Encoding': 'chunked'}, environ_overrides={'wsgi.input_terminated': True}
+    )
+
+    assert response.status_code == 413
+    assert graded == []
+
+
+def test_upload_over_segment_limit(client, graded, monkeypatch):
+    monkeypatch.setenv('EMS_UPLOAD_MAX_SEGMENTS', '3')
+    response = upload(client, SAMPLE_PATH.read_bytes())
+
+    assert response.status_code == 413
+    assert 'more than 3 segments' in response.get_json()['message']
+    assert graded == []
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'{"language": "en", "segments": [{"start": 0.0,', 'Invalid JSON file'),
+    (b'not json', 'Invalid JSON file'),
+    (b'[{"start": 0.0}]', 'Invalid JSON file'),
+    (b'{"language": "en"}', 'Invalid transcript format: missing "segments" field'),
+])
+def test_invalid_transcript(client, graded, body, error):
+    response = upload(client, body)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert graded == []
+
+
+def test_multipart_without_file(client, graded):
+    response = client.post('/api/upload', data={'notes': 'no file'}, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No file provided'
+
+
+def test_multipart_without_filename(client, graded):
+    response = upload(client, SAMPLE_PATH.read_bytes(), filename='')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No file selected'
+
+
+def test_wrong_file_type(client, graded):
+    response = upload(client, SAMPLE_PATH.read_bytes(), filename='call.txt')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid file type'
+
+
+def test_multipart_without_boundary(client, graded):
+    response = client.post('/api/upload', data=b'--x\r\n', content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid JSON file'
+
+
+def test_truncated_multipart_body(client, graded):
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="call.json"\r\n'
+        b'Content-Type: application/json\r\n\r\n{"segments": [{"start": 0.0, "end"'
+    )
+    response = client.post('/api/upload', data=body, content_type='multipart/form-data; boundary=b')
+    assert response.status_code == 400
+    assert graded == []
+
+
+def test_stream_parser_keeps_only_formatter_fields():
+    transcript = load_sample()
+    for segment in transcript['segments']:
+        segment['words'] = [{'word': 'x', 'start': 0.0, 'end': 0.1}]
+    parser = TranscriptStreamParser(io.BytesIO(json.dumps(transcript).encode()))
+
+    segments = list(parser.segments())
+    assert {key for segment in segments for key in segment} <= {'start', 'end', 'speaker', 'text'}
+    assert parser.fields == {'language': transcript['language'], 'lang_confidence': transcript['lang_confidence']}
+    assert parser.segment_count == len(transcript['segments'])
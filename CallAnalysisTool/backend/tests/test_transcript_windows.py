@@ -0,0 +1,172 @@
+"""
+Map-reduce grading of long transcripts: time windows always move forward and cover the call,
+and window grades reduce as 1 > 4 > 3 > 6 > RC, with 5 only when every window says 5
+
+Window grades come from the fake Ollama server used by the benchmarks, no model is needed.
+
+Run from the backend directory:
+    pytest tests/test_transcript_windows.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / 'tests' / 'benchmarks'))
+
+from api.services.ai_grader import AIGraderService
+from api.services.grading_cache import GradingCache
+from fake_ollama import FakeOllama
+from JSONTranscriptionParser import segments_to_text
+from llm_client import LLMClient
+from transcript_retrieval import estimate_tokens, split_segments
+from transcript_windows import reduce_question_grades, reduce_window_grades, segment_times, split_windows
+
+# Dispatcher line only the last window hears
+ADDRESS_LINE = "Ma'am, what is the address where you are?"
+
+
+def make_transcript(segment_count, seconds=10.0, text='Okay, stay on the line with me.'):
+    """Transcript text with one segment every `seconds`, speakers taking turns"""
+    return segments_to_text(
+        {'start': index * seconds, 'end': (index + 1) * seconds,
+         'speaker': f'SPEAKER_0{index % 2}', 'text': f'{text} ({index})'}
+        for index in range(segment_count)
+    )
+
+
+def window_segments(window):
+    return split_segments(window['text'])
+
+
+def assert_covers_in_order(transcript_text, windows):
+    """Every segment is in some window, windows start later and later and never skip a segment"""
+    segments = split_segments(transcript_text)
+    seen = 0
+    previous_start = None
+    for window in windows:
+        lines = window_segments(window)
+        first = segments.index(lines[0])
+        assert segments[first:first + len(lines)] == lines
+        assert first <= seen, 'a segment fell between two windows'
+        assert previous_start is None or window['start'] > previous_start
+        previous_start = window['start']
+        seen = first + len(lines)
+    assert seen == len(segments)
+
+
+@pytest.mark.parametrize('segment_count, window_s, overlap_s', [
+    (100, 240.0, 30.0),
+    (100, 60.0, 0.0),
+    (37, 240.0, 120.0),
+    (100, 60.0, 60.0),
+    (100, 60.0, 600.0),
+    (5, 10.0, 0.0),
+])
+def test_windows_cover_the_call_and_move_forward(segment_count, window_s, overlap_s):
+    transcript_text = make_transcript(segment_count)
+    windows = split_windows(transcript_text, window_s, overlap_s)
+
+    assert_covers_in_order(transcript_text, windows)
+    for window in windows:
+        assert window['segments'] == len(window_segments(window))
+        starts = [start for start, _ in segment_times(window_segments(window))]
+        assert starts[-1] - starts[0] < window_s
+
+    # Each window moves on by at least half of the one before it, so the overlap can't multiply windows
+    for before, after in zip(windows, windows[1:]):
+        assert after['start'] - before['start'] >= (before['segments'] // 2) * 10.0
+
+
+def test_windows_overlap():
+    windows = split_windows(make_transcript(60), window_s=120.0, overlap_s=30.0)
+    for before, after in zip(windows, windows[1:]):
+        shared = set(window_segments(before)) & set(window_segments(after))
+        assert len(shared) == 3
+
+
+def test_window_token_budget():
+    transcript_text = make_transcript(200)
+    windows = split_windows(transcript_text, window_s=10_000.0, overlap_s=0.0, max_tokens=300)
+
+    assert len(windows) > 1
+    assert_covers_in_order(transcript_text, windows)
+    assert all(estimate_tokens(window['text']) <= 300 for window in windows)
+
+
+def test_segment_over_token_budget_gets_its_own_window():
+    transcript_text = make_transcript(4, text='word ' * 400)
+    windows = split_windows(transcript_text, window_s=10_000.0, overlap_s=30.0, max_tokens=50)
+    assert [window['segments'] for window in windows] == [1, 1, 1, 1]
+
+
+def test_short_and_empty_transcripts():
+    transcript_text = make_transcript(5)
+    assert split_windows(transcript_text) == [{
+        'start': 0.0, 'end': 50.0, 'segments': 5, 'text': transcript_text
+    }]
+    assert split_windows('') == []
+
+
+def test_lines_without_times_take_the_previous_time():
+    lines = split_segments(make_transcript(3))
+    assert segment_times([lines[0], '[...]', lines[1]]) == [(0.0, 10.0), (0.0, 10.0), (10.0, 20.0)]
+
+
+@pytest.mark.parametrize('codes, reduced', [
+    (['2', '3', '4', '1'], '1'),
+    (['3', '4', '2'], '4'),
+    (['2', '3', '6'], '3'),
+    (['6', 'RC', '2'], '6'),
+    (['RC', '5', '2'], 'RC'),
+    (['5', '5', '5'], '5'),
+    (['5', '5', '2'], '2'),
+    (['5', None], '2'),
+    ([None, None], '2'),
+    (['2', '2'], '2'),
+    ([1, 4], '1'),
+    ([], '2'),
+])
+def test_reduce_precedence(codes, reduced):
+    assert reduce_question_grades(codes) == reduced
+
+
+def test_reduce_window_grades():
+    questions = {'CE_1': 'Address?', 'CE_2': 'Phone number?', 'CE_3': 'What happened?', 'CE_4': 'Age?'}
+    window_grades = [
+        {'CE_1': '2', 'CE_2': '5', 'CE_3': 'RC'},
+        {'CE_1': '1', 'CE_2': '5'},
+        {'CE_1': '3', 'CE_2': '5', 'CE_3': '2'},
+    ]
+    assert reduce_window_grades(window_grades, questions) == {'CE_1': '1', 'CE_2': '5', 'CE_3': 'RC'}
+
+
+def test_long_transcript_graded_per_window(tmp_path):
+    """Only one window hears the address question, yet the call gets a 1 for it"""
+    questions = {'CE_1': 'What is the address of the emergency?', 'CE_2': 'Is the patient pregnant?'}
+    transcript_text = make_transcript(120)
+    transcript_text += segments_to_text([{
+        'start': 1200.0, 'end': 1205.0, 'speaker': 'SPEAKER_00', 'text': ADDRESS_LINE
+    }])
+
+    def grade_window(prompt):
+        return f'{{"CE_1": "{"1" if ADDRESS_LINE in prompt else "2"}", "CE_2": "5"}}'
+
+    with FakeOllama(response=grade_window) as fake:
+        grader = AIGraderService(
+            llm_client=LLMClient(host=fake.url), cache=GradingCache(tmp_path / 'cache.sqlite3'),
+            long_transcript_tokens=600, window_seconds=240.0, window_overlap_seconds=30.0
+        )
+        assert grader.is_long_transcript(transcript_text, questions, 'Falls')
+        windows = grader.transcript_windows(transcript_text, questions, 'Falls')
+
+        grades, cached = grader.ai_grade_group(transcript_text, questions, 'Falls')
+
+    assert len(windows) > 1
+    assert len(fake.requests) == len(windows)
+    assert all(request['options']['num_ctx'] == grader.llm_client.num_ctx for request in fake.requests)
+    assert grades == {'CE_1': '1', 'CE_2': '5'}
+    assert cached is False
@@ -0,0 +1,149 @@
+# Retrieval of the transcript segments relevant to a group of grading questions
+# Used to shrink the transcript that goes into each grading prompt and to find evidence for grades
+# CS4273 Group G
+
+import math
+import threading
+import numpy as np
+from detect_naturecode import encode
+from JSONTranscriptionParser import parse_segment_line
+from question_catalog import get_catalog
+
+# Marks the places where segments were left out of a pruned transcript
+OMITTED_MARKER = "[...]"
+
+# Question embeddings only change when EMSQA.csv changes, so the whole catalog is encoded once per version
+_question_lock = threading.Lock()
+_question_state = {"version": None, "embeddings": {}}
+
+# Function for estimating how many tokens a prompt uses
+
+# Input: prompt text
+# Output: approximate token count (Llama tokenizers average about 4 characters per token)
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4)
+
+# Function for splitting a transcript into its segments
+
+# Input: transcript text (one formatted segment per line)
+# Output: list of segment lines, split the same way nature code detection splits them
+def split_segments(transcript_text):
+    return [line.strip() for line in transcript_text.split("\n") if line.strip()]
+
+# Function for getting the embeddings of every question in the catalog
+
+# Input: none
+# Output: dict of question text -> normalized embedding for every question in EMSQA.csv, encoded in
+#         one batch the first time it is needed after the CSV changes (or by warm-up)
+def catalog_question_embeddings():
+    catalog = get_catalog()
+    version = catalog.version
+    if _question_state["version"] == version:
+        return _question_state["embeddings"]
+
+    with _question_lock:
+        if _question_state["version"] != version:
+            texts = catalog.question_texts()
+            embeddings = dict(zip(texts, encode(texts))) if texts else {}
+            # Readers check the version first, so it is only switched once the embeddings are in place
+            _question_state["embeddings"] = embeddings
+            _question_state["version"] = version
+        return _question_state["embeddings"]
+
+# Function for getting the embeddings of question texts
+
+# Input: list of question texts
+# Output: normalized embedding matrix (one row per question), cached until EMSQA.csv changes;
+#         texts that aren't in the catalog are encoded on first use and cached with it
+def question_embeddings(question_texts):
+    cached = catalog_question_embeddings()
+    missing = [text for text in dict.fromkeys(question_texts) if text not in cached]
+
+    if missing:
+        new_embeddings = dict(zip(missing, encode(missing)))
+        with _question_lock:
+            if _question_state["embeddings"] is cached:
+                cached.update(new_embeddings)
+        cached = {**cached, **new_embeddings}
+
+    return np.array([cached[text] for text in question_texts])
+
+# Function for picking the segments that matter for a set of questions
+
+# Input: segment embeddings, question embeddings, segments kept per question, neighbours kept around each hit
+# Output: sorted list of segment indices to keep
+def select_segments(segment_embeddings, question_embeddings, top_k=3, window=1):
+    segment_count = len(segment_embeddings)
+    if segment_count == 0 or len(question_embeddings) == 0:
+        return list(range(segment_count))
+
+    # Embeddings are normalized, so the dot product is the cosine similarity
+    similarities = question_embeddings @ segment_embeddings.T
+    k = min(top_k, segment_count)
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+    keep = set()
+    for index in np.unique(top):
+        keep.update(range(max(0, index - window), min(segment_count, index + window + 1)))
+    return sorted(keep)
+
+# Function for building the pruned transcript for a group of questions
+
+# Input: transcript text, dict of questions, optional segment embeddings (e.g. from nature code
+#        detection, computed on the same segments), segments per question, window size
+# Output: (pruned transcript text, number of segments kept, total number of segments)
+def prune_transcript(transcript_text, questions_dict, segment_embeddings=None, top_k=3, window=1):
+    segments = split_segments(transcript_text)
+    if not segments or not questions_dict:
+        return transcript_text, len(segments), len(segments)
+
+    if segment_embeddings is None or len(segment_embeddings) != len(segments):
+        segment_embeddings = encode(segments)
+
+    keep = select_segments(segment_embeddings, question_embeddings(list(questions_dict.values())), top_k, window)
+    if len(keep) == len(segments):
+        return transcript_text, len(segments), len(segments)
+
+    # Gaps between kept runs are marked so the model knows the call continued there
+    lines = []
+    previous = -1
+    for index in keep:
+        if index != previous + 1:
+            lines.append(OMITTED_MARKER)
+        lines.append(segments[index])
+        previous = index
+    if previous != len(segments) - 1:
+        lines.append(OMITTED_MARKER)
+
+    return "\n".join(lines) + "\n", len(keep), len(segments)
+
+# Function for finding the segments that best support each question's grade
+
+# Input: transcript text, dict of questions, optional segment embeddings (e.g. from nature code
+#        detection, computed on the same segments), number of segments per question
+# Output: dict of question ID -> list of {"start", "end", "speaker", "text", "score"}, best first
+def question_evidence(transcript_text, questions_dict, segment_embeddings=None, top_n=2):
+    segments = split_segments(transcript_text)
+    if not segments or not questions_dict:
+        return {qid: [] for qid in questions_dict}
+
+    if segment_embeddings is None or len(segment_embeddings) != len(segments):
+        segment_embeddings = encode(segments)
+
+    # One question x segment similarity matrix for the whole transcript
+    question_ids = list(questions_dict.keys())
+    similarities = question_embeddings([questions_dict[qid] for qid in question_ids]) @ segment_embeddings.T
+    n = min(top_n, len(segments))
+    top = np.argsort(-similarities, axis=1)[:, :n]
+
+    parsed = [parse_segment_line(segment) for segment in segments]
+    evidence = {}
+    for row, qid in enumerate(question_ids):
+        evidence[qid] = [
+            {
+                **(parsed[index] or {"start": None, "end": None, "speaker": None, "text": segments[index]}),
+                "score": round(float(similarities[row, index]), 3),
+            }
+            for index in top[row]
+        ]
+    return evidence
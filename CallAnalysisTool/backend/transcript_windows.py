@@ -0,0 +1,99 @@
+# Map-reduce grading support for very long calls
+# Transcripts whose grading prompt won't fit the model's context are split into overlapping time
+# windows, every window is graded on its own and the per-window grades are reduced to one grade per question
+# CS4273 Group G
+
+from JSONTranscriptionParser import parse_segment_line
+from transcript_retrieval import estimate_tokens, split_segments
+
+# Codes for a question that was asked, best first (Asked Correctly, Not As Scripted, Asked Incorrectly)
+ASKED_PRECEDENCE = ("1", "4", "3")
+
+# Function for getting the start/end time of every segment line
+
+# Input: list of segment lines
+# Output: list of (start, end) in seconds; lines that aren't segments (e.g. the "[...]" marker
+#         of a pruned transcript) take the time of the segment before them
+def segment_times(segments):
+    times = []
+    previous = (0.0, 0.0)
+    for segment in segments:
+        parsed = parse_segment_line(segment)
+        if parsed is not None:
+            previous = (parsed["start"], parsed["end"])
+        times.append(previous)
+    return times
+
+# Function for splitting a transcript into overlapping time windows
+
+# Input: transcript text, window length and overlap in seconds, optional token budget per window
+#        (a window is also closed once its text would go over the budget)
+# Output: list of {"start", "end", "segments", "text"} in call order; a transcript that fits in one
+#         window comes back as a single window
+def split_windows(transcript_text, window_s=240.0, overlap_s=30.0, max_tokens=None):
+    segments = split_segments(transcript_text)
+    if not segments:
+        return []
+    times = segment_times(segments)
+    tokens = [estimate_tokens(segment + "\n") for segment in segments]
+
+    windows = []
+    first = 0
+    while True:
+        last = first
+        window_tokens = tokens[first]
+        while last + 1 < len(segments):
+            if times[last + 1][0] - times[first][0] >= window_s:
+                break
+            if max_tokens is not None and window_tokens + tokens[last + 1] > max_tokens:
+                break
+            last += 1
+            window_tokens += tokens[last]
+
+        windows.append({
+            "start": times[first][0],
+            "end": max(end for _, end in times[first:last + 1]),
+            "segments": last - first + 1,
+            "text": "\n".join(segments[first:last + 1]) + "\n",
+        })
+        if last == len(segments) - 1:
+            return windows
+
+        # The next window starts overlap_s before the first segment this one left out, but moves
+        # on by at least half of this window so the overlap can't multiply the number of windows
+        following = last + 1
+        overlap_from = times[following][0] - overlap_s
+        while following - 1 > first + (last - first) // 2 and times[following - 1][0] >= overlap_from:
+            following -= 1
+        first = following
+
+# Function for reducing one question's grades across windows
+
+# Input: list of grade codes, one per window (None where a window didn't grade the question)
+# Output: grade code for the whole call:
+#         asked in any window -> best of 1 > 4 > 3; otherwise 6 (Obvious) if any window saw it answered,
+#         then RC (Recorded Correctly); 5 (N/A) only if every window said N/A; otherwise 2 (Not Asked)
+def reduce_question_grades(codes):
+    codes = [str(code) if code is not None else "2" for code in codes]
+    for code in ASKED_PRECEDENCE:
+        if code in codes:
+            return code
+    if "6" in codes:
+        return "6"
+    if "RC" in codes:
+        return "RC"
+    if codes and all(code == "5" for code in codes):
+        return "5"
+    return "2"
+
+# Function for reducing the grades of every window to one set of grades
+
+# Input: list of per-window grade dicts (question ID -> code), dict of the questions that were graded
+# Output: dict of question ID -> code for the whole call (questions no window graded are left out)
+def reduce_window_grades(window_grades, questions_dict):
+    reduced = {}
+    for qid in questions_dict:
+        codes = [grades.get(qid) for grades in window_grades]
+        if any(code is not None for code in codes):
+            reduced[qid] = reduce_question_grades(codes)
+    return reduced